@@ -6,12 +6,17 @@ from .__version__ import __author__, __author_email__, __license__
 from .__version__ import __copyright__
 
 __all__ = [
+    'aliasSampler',
+    'backoffChain',
     'characterCollector',
     'characterCollectorRunner',
+    'chainCounts',
+    'chainSampler',
     'collector',
     'collectorProducer',
     'environment',
     'geometry',
+    'internedChain',
     'markovChain',
     'producer',
     'ruleSet',
@@ -26,12 +31,17 @@ __all__ = [
     'wordProducerRunner'
 ]
 
+from .aliasSampler import AliasSampler
+from .backoffChain import BackoffChain
 from .characterCollector import CharacterCollector
 from .characterCollectorRunner import CharacterCollectorRunner
+from .chainCounts import ChainCounts
+from .chainSampler import ChainSampler
 from .collector import Collector
 from .collectorProducer import CollectorProducer
 from .environment import Environment
 from .geometry import Geometry
+from .internedChain import InternedChain
 from .markovChain import MarkovChain
 from .producer import Producer
 from .ruleSet  import RuleSet
@@ -0,0 +1,123 @@
+# ------------------------------------------------------------------------------
+# Name:          aliasSampler.py
+# Purpose:       AliasSampler class.
+#
+#                AliasSampler is a ChainSampler that picks the next token
+#                in constant time using per-key Walker/Vose alias tables.
+#
+# Authors:      Donald Bacon
+#
+# Copyright:    Copyright 2026 Donald Bacon
+# License:      BSD, see license.txt
+# ------------------------------------------------------------------------------
+
+from common.markovChain import MarkovChain
+from common.chainSampler import ChainSampler
+import numpy as np
+import pandas as pd
+
+class AliasSampler(ChainSampler):
+    """A ChainSampler that uses an alias table for each key instead of a binary search.
+
+    The n rows of a key are n equally likely columns. Column i holds row i with probability
+    thresholds[i] and otherwise its alias row. Picking a token is an array index
+    and a comparison, regardless of the number of next tokens a key has.
+    The tables are built once with Vose's method.
+
+    A single random probability u in [0,1) supplies both random numbers:
+    the column is floor(u*n) and the fraction that remains is the coin toss.
+    The probabilities are the same as the cumulative ChainSampler,
+    but the token picked for a given u is not.
+    """
+
+    def __init__(self, chain_df:pd.DataFrame, key_column='key', token_column='word', prob_column='prob'):
+        super().__init__(chain_df, key_column, token_column, prob_column)
+        self._create_tables()
+
+    @staticmethod
+    def from_markov_chain(markovChain:MarkovChain) -> 'AliasSampler':
+        return AliasSampler.from_sampler(ChainSampler.from_markov_chain(markovChain))
+
+    @staticmethod
+    def from_sampler(sampler:ChainSampler) -> 'AliasSampler':
+        """Creates an AliasSampler from the arrays of a cumulative ChainSampler
+
+        """
+        aliasSampler = AliasSampler.__new__(AliasSampler)
+        aliasSampler.__dict__.update(sampler.__dict__)
+        aliasSampler._create_tables()
+        return aliasSampler
+
+    def __repr__(self):
+        return f"AliasSampler keys={len(self.keys)} rows={len(self.tokens)}"
+
+    def _create_tables(self):
+        """Creates the thresholds and alias arrays, aligned with the tokens array
+
+        """
+        probs = np.asarray(self.probs, dtype=np.float64)
+        nrows = len(probs)
+        self.thresholds = np.ones(nrows, dtype=np.float64)
+        self.aliases = np.arange(nrows, dtype=np.int64)
+        self.counts = np.diff(self.offsets)
+        if nrows == 0:
+            return
+        #
+        # per-row probabilities from the cumulative probabilities, normalized as the last may not be exactly 1
+        #
+        row_states = self.get_row_states()
+        starts = self.offsets[:-1]
+        previous = np.concatenate(([0.0], probs[:-1]))
+        previous[starts[self.counts > 0]] = 0.0
+        totals = probs[np.maximum(self.offsets[1:] - 1, 0)]
+        scaled = (probs - previous) / totals[row_states] * self.counts[row_states]
+        for state in np.flatnonzero(self.counts > 1):
+            start = self.offsets[state]
+            end = self.offsets[state+1]
+            p = scaled[start:end].tolist()
+            small = [i for i in range(end-start) if p[i] < 1.0]
+            large = [i for i in range(end-start) if p[i] >= 1.0]
+            while small and large:
+                s = small.pop()
+                l = large[-1]
+                self.thresholds[start+s] = p[s]
+                self.aliases[start+s] = start + l
+                p[l] = (p[l] + p[s]) - 1.0
+                if p[l] < 1.0:
+                    small.append(large.pop())
+            # whatever remains has probability 1 within rounding, and keeps its own row
+
+    def sample(self, key, prob:float) -> dict:
+        """Pick the next token for a key given a random probability.
+
+        Returns:
+            a dict with keys 'next_token' and 'prob' (the cumulative probability of the token selected)
+            The values are None if the key is not present.
+        """
+        ind = self._index.get(key)
+        if ind is None:
+            return dict([ ('next_token', None), ('prob', None)])
+        pos = self.sample_row(ind, prob)
+        return dict([ ('next_token', self.tokens[pos]), ('prob', self.probs[pos])])
+
+    def sample_row(self, state:int, prob:float) -> int:
+        n = self.counts[state]
+        column = prob * n
+        i = min(int(column), n - 1)
+        pos = self.offsets[state] + i
+        if column - i >= self.thresholds[pos]:
+            pos = self.aliases[pos]
+        return pos
+
+    def sample_rows(self, states:np.ndarray, probs:np.ndarray) -> np.ndarray:
+        """Vectorized sample(): picks a row for each of a number of states at once.
+
+        """
+        n = self.counts[states]
+        columns = probs * n
+        i = np.minimum(columns.astype(np.int64), n - 1)
+        rows = self.offsets[states] + i
+        return np.where(columns - i < self.thresholds[rows], rows, self.aliases[rows])
+
+if __name__ == '__main__':
+    print(AliasSampler.__doc__)
@@ -0,0 +1,290 @@
+# ------------------------------------------------------------------------------
+# Name:          backoffChain.py
+# Purpose:       BackoffChain and BackoffSampler classes.
+#
+#                BackoffChain is a variable-order MarkovChain, orders 0 through n,
+#                stored in a single n-gram trie.
+#                BackoffSampler picks the next token from the longest matching context.
+#
+# Authors:      Donald Bacon
+#
+# Copyright:    Copyright 2026 Donald Bacon
+# License:      BSD, see license.txt
+# ------------------------------------------------------------------------------
+
+import json
+from collections import Counter
+import numpy as np
+from common.chainCounts import ChainCounts
+from common.chainSampler import ChainSampler
+from common.markovChain import MarkovChain
+
+class BackoffChain(object):
+    """The counts of every MarkovChain order from 0 through max_order collected in one pass.
+
+    The contexts (keys) are nodes of a trie read from the most recent token back,
+    so the parent of a context is the context less its oldest token, its longest proper suffix.
+    A context of order n shares its trie path with all its suffixes, the same contexts
+    of orders 1 through n-1, and every token is stored once in the vocabulary.
+    Node 0, the root, is the empty context, the order 0 counts of the tokens that follow another token.
+
+    The next token counts of all nodes are held in CSR form: offsets by node, next token ids and counts.
+    A BackoffChain is built with add_sequence() and compiled to arrays by compile(),
+    which save() and the other accessors do as needed. A loaded BackoffChain is read-only.
+    """
+
+    def __init__(self, max_order:int, key_separator=' '):
+        """Create an empty BackoffChain
+
+        Parameters:
+            max_order - the highest MarkovChain order collected
+            key_separator - the str used to join the tokens of a key, '' for characters
+        """
+        self.order = max_order
+        self.key_separator = key_separator
+        self.vocabulary = None      # np.ndarray of tokens, the position of a token is its id
+        self.parents = None         # int32 array, the node of the longest proper suffix of each node, -1 for the root
+        self.node_tokens = None     # int32 array, the oldest token id of each node's context, -1 for the root
+        self.depths = None          # int8 array, the order (number of tokens) of each node's context
+        self.offsets = None         # int64 array, the next token rows of node i are offsets[i]:offsets[i+1]
+        self.next_tokens = None     # int32 array, the next token ids
+        self.counts = None          # int64 array, the next token counts
+        #
+        # used while building
+        #
+        self._token_ids = {}
+        self._children = {}                 # (node, token id) : child node
+        self._parents = [-1]
+        self._node_tokens = [-1]
+        self._depths = [0]
+        self._counts = Counter()            # (node, next token id) : count
+        self._tails = {}                    # sequence name : the last max_order token ids of the sequence
+
+    def __repr__(self):
+        self.compile()
+        return f"BackoffChain order={self.order} nodes={len(self.parents)} vocabulary={len(self.vocabulary)} transitions={len(self.counts)}"
+
+    @property
+    def nbytes(self) -> int:
+        """The number of bytes used by the compiled arrays, the vocabulary tokens excluded
+
+        """
+        self.compile()
+        return sum(a.nbytes for a in [self.parents, self.node_tokens, self.depths, self.offsets, self.next_tokens, self.counts])
+
+    def _get_node(self, parent:int, token_id:int) -> int:
+        node = self._children.get((parent, token_id))
+        if node is None:
+            node = len(self._parents)
+            self._children[(parent, token_id)] = node
+            self._parents.append(parent)
+            self._node_tokens.append(token_id)
+            self._depths.append(self._depths[parent] + 1)
+        return node
+
+    def add_sequence(self, tokens, name=''):
+        """Counts the next token of every context of orders 0 through max_order in a sequence of str tokens
+
+        Parameters:
+            tokens - an iterable of str
+            name - the name of the sequence, as in ChainCounts. Tokens added with the same name are
+                   a continuation of that sequence. If None the tokens are an independent sequence.
+        """
+        if self._children is None:
+            raise ValueError("a compiled BackoffChain is read-only")
+        self.offsets = None     # compile() again
+        ids = [] if name is None else list(self._tails.get(name, []))
+        start = len(ids)
+        ids += [self._token_ids.setdefault(t, len(self._token_ids)) for t in tokens]
+        for i in range(max(start, 1), len(ids)):
+            token_id = ids[i]
+            node = 0
+            self._counts[(0, token_id)] += 1
+            for k in range(1, min(self.order, i) + 1):
+                node = self._get_node(node, ids[i-k])
+                self._counts[(node, token_id)] += 1
+        if name is not None and self.order > 0:
+            self._tails[name] = ids[-self.order:]
+
+    def compile(self):
+        """Creates the node and CSR count arrays from what has been added
+
+        """
+        if self.offsets is not None:
+            return
+        self.vocabulary = np.array(list(self._token_ids), dtype=object)
+        self.parents = np.array(self._parents, dtype=np.int32)
+        self.node_tokens = np.array(self._node_tokens, dtype=np.int32)
+        self.depths = np.array(self._depths, dtype=np.int8)
+        pairs = np.array(list(self._counts.keys()), dtype=np.int64).reshape(-1, 2)
+        counts = np.fromiter(self._counts.values(), dtype=np.int64, count=len(self._counts))
+        order = np.lexsort((pairs[:,1], pairs[:,0]))
+        self.next_tokens = pairs[order, 1].astype(np.int32)
+        self.counts = counts[order]
+        self.offsets = np.zeros(len(self.parents)+1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum(np.bincount(pairs[:,0], minlength=len(self.parents)))
+
+    def get_keys(self) -> list:
+        """Returns the key of every node, the tokens of its context joined by the key_separator
+
+        The key of the root is an empty str.
+        """
+        self.compile()
+        keys = ['']
+        for node in range(1, len(self.parents)):
+            parent = self.parents[node]
+            token = self.vocabulary[self.node_tokens[node]]
+            keys.append(token if parent == 0 else token + self.key_separator + keys[parent])
+        return keys
+
+    def get_counts(self, order:int) -> ChainCounts:
+        """Returns the counts of the keys of a single order, 1 through max_order
+
+        The result is identical to a ChainCounts collected from the same sequences.
+        """
+        self.compile()
+        keys = self.get_keys()
+        counts = ChainCounts(order, self.key_separator)
+        for node in np.flatnonzero(self.depths == order):
+            for j in range(self.offsets[node], self.offsets[node+1]):
+                counts.add(keys[node], self.vocabulary[self.next_tokens[j]], int(self.counts[j]))
+        return counts
+
+    def to_markov_chain(self, order:int, myname:str=None) -> MarkovChain:
+        """Creates the MarkovChain of a single order
+
+        """
+        counts_df = self.get_counts(order).to_dataframe()
+        counts_df.sort_values(by=['key','word'], ignore_index=True, inplace=True)
+        return MarkovChain(order, counts_df, myname=myname)
+
+    def get_sampler(self, order:int=None) -> 'BackoffSampler':
+        """Creates a BackoffSampler using contexts of up to order tokens, the default is max_order
+
+        """
+        return BackoffSampler(self, order)
+
+    def save(self, filename:str) -> bool:
+        """Saves the compiled arrays to an uncompressed .npz file
+
+        """
+        self.compile()
+        header = {'order':self.order, 'key_separator':self.key_separator}
+        vocabulary = np.array(list(self.vocabulary), dtype=str) if len(self.vocabulary) > 0 else np.array([], dtype='<U1')
+        with open(filename, 'wb') as f:
+            np.savez(f, header=np.array(json.dumps(header)), vocabulary=vocabulary, parents=self.parents, \
+                     node_tokens=self.node_tokens, depths=self.depths, offsets=self.offsets, \
+                     next_tokens=self.next_tokens, counts=self.counts)
+        return True
+
+    @staticmethod
+    def load(filename:str) -> 'BackoffChain':
+        """Loads a BackoffChain saved with save()
+
+        """
+        with np.load(filename, allow_pickle=False) as arrays:
+            header = json.loads(str(arrays['header']))
+            backoffChain = BackoffChain(header['order'], header['key_separator'])
+            backoffChain.vocabulary = arrays['vocabulary'].astype(object)
+            for name in ['parents', 'node_tokens', 'depths', 'offsets', 'next_tokens', 'counts']:
+                setattr(backoffChain, name, arrays[name])
+        backoffChain._children = None
+        return backoffChain
+
+class BackoffSampler(ChainSampler):
+    """A ChainSampler of the nodes of a BackoffChain that backs off to the longest matching context
+
+    A key that is not a node of the chain resolves to the node of its longest suffix,
+    down to the root (order 0) if need be, so a key always has a next token.
+    """
+
+    def __init__(self, backoffChain:BackoffChain, order:int=None):
+        backoffChain.compile()
+        self.backoffChain = backoffChain
+        self.key_separator = backoffChain.key_separator
+        self.order = backoffChain.order if order is None else min(order, backoffChain.order)
+        self.tokens = backoffChain.vocabulary[backoffChain.next_tokens]
+        self.offsets = backoffChain.offsets
+        self.keys = backoffChain.get_keys()
+        #
+        # cumulative probabilities within each node
+        #
+        cumulative = np.cumsum(backoffChain.counts, dtype=np.float64)
+        base = np.concatenate(([0.0], cumulative))
+        starts = base[self.offsets[:-1]]
+        totals = base[self.offsets[1:]] - starts
+        row_states = self.get_row_states()
+        self.probs = (cumulative - starts[row_states]) / totals[row_states]
+        self._index = {k:i for i,k in enumerate(self.keys)}
+        self._state_probs = None
+
+    def __contains__(self, key):
+        return self.get_state(key) >= 0
+
+    def __repr__(self):
+        return f"BackoffSampler order={self.order} keys={len(self.keys)} rows={len(self.tokens)}"
+
+    def split_key(self, key) -> list:
+        """Splits a key into its tokens
+
+        A word that starts a sentence or line is prefixed with a space,
+        so an empty str between separators is joined to the word that follows.
+        """
+        if self.key_separator == '':
+            return list(key)
+        tokens = []
+        prefix = ''
+        for t in key.split(self.key_separator):
+            if t == '':
+                prefix = prefix + self.key_separator
+            else:
+                tokens.append(prefix + t)
+                prefix = ''
+        return tokens
+
+    def next_key(self, key, token) -> str:
+        """Returns the key that follows a key and its next token, up to max_order tokens long
+
+        """
+        tokens = self.split_key(key) + [token]
+        return self.key_separator.join(tokens[-self.order:])
+
+    def get_state(self, key) -> int:
+        """Returns the node of the longest suffix of a key, -1 if the chain is empty
+
+        """
+        ind = self._index.get(key)
+        if ind is not None and self.offsets[ind+1] > self.offsets[ind]:
+            return ind
+        tokens = self.split_key(key)
+        for k in range(min(len(tokens), self.order), -1, -1):
+            ind = self._index.get(self.key_separator.join(tokens[len(tokens)-k:]))
+            if ind is not None and self.offsets[ind+1] > self.offsets[ind]:
+                return ind
+        return -1
+
+    def get_states(self, keys) -> np.ndarray:
+        return np.array([self.get_state(k) for k in keys], dtype=np.int64)
+
+    def get_tokens(self, key) -> np.ndarray:
+        ind = self.get_state(key)
+        if ind < 0:
+            return self.tokens[0:0]
+        return self.tokens[self.offsets[ind]:self.offsets[ind+1]]
+
+    def sample(self, key, prob:float) -> dict:
+        """Pick the next token for a key, or its longest matching suffix, given a random probability.
+
+        Returns:
+            a dict with keys 'next_token', 'prob' and 'order', the order of the context used
+        """
+        ind = self.get_state(key)
+        if ind < 0:
+            return dict([ ('next_token', None), ('prob', None), ('order', None)])
+        start = self.offsets[ind]
+        end = self.offsets[ind+1]
+        pos = min(start + int(np.searchsorted(self.probs[start:end], prob, side='right')), end - 1)
+        return dict([ ('next_token', self.tokens[pos]), ('prob', self.probs[pos]), ('order', int(self.backoffChain.depths[ind]))])
+
+if __name__ == '__main__':
+    print(BackoffChain.__doc__)
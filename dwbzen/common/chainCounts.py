@@ -0,0 +1,145 @@
+# ------------------------------------------------------------------------------
+# Name:          chainCounts.py
+# Purpose:       ChainCounts class.
+#
+#                ChainCounts accumulates the (key, next token) counts
+#                of token sequences and can be merged with other ChainCounts.
+#
+# Authors:      Donald Bacon
+#
+# Copyright:    Copyright 2026 Donald Bacon
+# License:      BSD, see license.txt
+# ------------------------------------------------------------------------------
+
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+class ChainCounts(object):
+    """Mergeable MarkovChain counts.
+
+    The counts are a Counter of (key, next token) tuples where the key is order tokens
+    joined by the key_separator, for example ('the quick', 'brown') for an order 2 WordCollector.
+
+    Tokens are added a sequence at a time. A named sequence, such as the text of a source file
+    or the notes of a Part, can be added in pieces and the keys that span the pieces are counted.
+    That is done by keeping the first order+1 (head) and last order (tail) tokens of each named sequence.
+
+    The same information makes ChainCounts mergeable: counts collected from consecutive shards
+    of a source, in separate processes for example, and merged in shard order are identical
+    to the counts of the whole source collected at once. Merging is associative, so the shard
+    results can be reduced in any grouping as long as their order is retained.
+    """
+
+    def __init__(self, order:int, key_separator=' '):
+        """Create an empty ChainCounts
+
+        Parameters:
+            order - the MarkovChain order, the number of tokens in a key
+            key_separator - the str used to join the tokens of a key
+        """
+        self.order = order
+        self.key_separator = key_separator
+        self.counts = Counter()         # (key, next token) : count
+        self.token_counts = Counter()   # optional counts of individual tokens, informational only
+        self.heads = {}                 # sequence name : the first order+1 tokens of the sequence
+        self.tails = {}                 # sequence name : the last order tokens of the sequence
+        self.lengths = {}               # sequence name : the number of tokens in the sequence
+
+    def __repr__(self):
+        return f"ChainCounts order={self.order} keys={len(self.counts)} sequences={len(self.lengths)}"
+
+    def __len__(self):
+        return len(self.counts)
+
+    def _count(self, tokens:list, end:int=None):
+        """Counts the keys of tokens starting at positions < end, the default is every key
+
+        """
+        nkeys = len(tokens) - self.order
+        if end is not None:
+            nkeys = min(nkeys, end)
+        if nkeys > 0:
+            order = self.order
+            separator = self.key_separator
+            self.counts.update([ (separator.join(tokens[i:i+order]), tokens[i+order]) for i in range(0, nkeys) ])
+
+    def add_sequence(self, tokens, name=''):
+        """Counts the keys of a sequence of str tokens
+
+        Parameters:
+            tokens - an iterable of str
+            name - the name of the sequence. Tokens added with the same name are a continuation
+                   of that sequence. If None, the tokens are an independent sequence, a single word
+                   of a CharacterCollector for example.
+        """
+        tokens = list(tokens)
+        if name is None:
+            self._count(tokens)
+            return
+        carry = self.tails.get(name, [])
+        combined = carry + tokens
+        self._count(combined)
+        self.heads[name] = (self.heads.get(name, []) + tokens)[:self.order+1]
+        self.tails[name] = combined[-self.order:] if self.order > 0 else []
+        self.lengths[name] = self.lengths.get(name, 0) + len(tokens)
+
+    def add(self, key, token, count=1):
+        """Adds to (or, if count is < 0, subtracts from) the count of a single key and next token
+
+        """
+        self.counts[(key, token)] += count
+
+    def merge(self, other:'ChainCounts') -> 'ChainCounts':
+        """Merges the counts of other, which follow these counts, into this ChainCounts
+
+        The keys spanning the end of each named sequence of this and the start of the same sequence in other are counted.
+        Returns:
+            this ChainCounts, updated
+        """
+        for name, head in other.heads.items():
+            carry = self.tails.get(name, [])
+            self._count(carry + head[:self.order], end=len(carry))
+            self.heads[name] = (self.heads.get(name, []) + head)[:self.order+1]
+            self.tails[name] = (carry + other.tails[name])[-self.order:] if self.order > 0 else []
+            self.lengths[name] = self.lengths.get(name, 0) + other.lengths[name]
+        self.counts.update(other.counts)
+        self.token_counts.update(other.token_counts)
+        return self
+
+    def __add__(self, other:'ChainCounts') -> 'ChainCounts':
+        result = ChainCounts(self.order, self.key_separator)
+        return result.merge(self).merge(other)
+
+    def to_dataframe(self, layout='long') -> pd.DataFrame:
+        """Creates a counts DataFrame
+
+        Parameters:
+            layout - 'long' for the text collectors' form, 'key', 'word', and 'count' columns in descending count order
+                     the same as collecting the (key, word) tuples in a DataFrame and using value_counts().
+                     'wide' for the music collectors' form, a 'KEY' index, a column for each next token
+                     and float counts. Rows and columns are in order of first appearance.
+        Keys with a count <= 0 are not included.
+        """
+        counts = +self.counts       # drops the counts <= 0
+        if layout == 'long':
+            rows = [(k, w, c) for (k, w), c in counts.items()]
+            df = pd.DataFrame(data=rows, columns=['key','word','count'])
+            return df.sort_values(by='count', ascending=False, kind='stable', ignore_index=True)
+        keys = {}
+        tokens = {}
+        for k, w in counts.keys():
+            keys.setdefault(k, len(keys))
+            tokens.setdefault(w, len(tokens))
+        matrix = np.zeros((len(keys), len(tokens)), dtype=np.float64)
+        for (k, w), c in counts.items():
+            matrix[keys[k], tokens[w]] = c
+        columns = pd.Index(list(tokens))
+        if not pd.api.types.is_float_dtype(columns.dtype):   # durations are float tokens
+            columns = columns.astype(object)
+        df = pd.DataFrame(data=matrix, index=pd.Index(list(keys), dtype=object), columns=columns)
+        df.rename_axis('KEY', inplace=True)
+        return df
+
+if __name__ == '__main__':
+    print(ChainCounts.__doc__)
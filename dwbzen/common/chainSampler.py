@@ -0,0 +1,197 @@
+# ------------------------------------------------------------------------------
+# Name:          chainSampler.py
+# Purpose:       ChainSampler class.
+#
+#                ChainSampler is a compiled, read-only index of a MarkovChain
+#                used by Producer classes to pick the next token.
+#
+# Authors:      Donald Bacon
+#
+# Copyright:    Copyright 2026 Donald Bacon
+# License:      BSD, see license.txt
+# ------------------------------------------------------------------------------
+
+from common.markovChain import MarkovChain
+from common.internedChain import InternedChain
+import numpy as np
+import pandas as pd
+import bisect
+
+class ChainSampler(object):
+    """A compiled sampling index built once from a MarkovChain.
+
+    The rows of each key are stored contiguously in a pair of arrays, the next tokens and
+    their cumulative probabilities. A dict maps each key to its position, so picking
+    the next token for a seed is a dict lookup plus a binary search over that key's rows
+    instead of a scan of the whole chain_df.
+    """
+
+    def __init__(self, chain_df:pd.DataFrame, key_column='key', token_column='word', prob_column='prob'):
+        """Create a ChainSampler from a chain DataFrame in long format.
+
+        Parameters:
+            chain_df - a DataFrame with key, token and cumulative probability columns as created by MarkovChain
+            key_column - the name of the key column, default is 'key'
+            token_column - the name of the next token column, default is 'word'
+            prob_column - the name of the cumulative probability column, default is 'prob'
+        """
+        codes, uniques = pd.factorize(chain_df[key_column], sort=False)
+        order = np.argsort(codes, kind='stable')      # group rows by key, retaining the row order within a key
+        self.tokens = chain_df[token_column].to_numpy()[order]
+        self.probs = chain_df[prob_column].to_numpy(dtype=np.float64)[order]
+        self.offsets = np.zeros(len(uniques)+1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum(np.bincount(codes, minlength=len(uniques)))
+        self.keys = list(uniques)
+        self._index = {k:i for i,k in enumerate(self.keys)}
+        self._state_probs = None     # cumulative probabilities offset by state id, used by sample_rows()
+
+    @staticmethod
+    def from_markov_chain(markovChain:MarkovChain) -> 'ChainSampler':
+        """Compile a ChainSampler for all the keys of a MarkovChain.
+
+        The chain_df of a MarkovChain created by a Collector may include only the initial keys,
+        so if counts_df is available the probabilities of every key are computed from that.
+        A MarkovChain created from an InternedChain is compiled from its arrays directly.
+        """
+        interned = markovChain.interned
+        if interned is not None:
+            return ChainSampler.from_interned(interned)
+        counts_df = markovChain.counts_df
+        if counts_df is not None and 'key' in counts_df.columns and 'count' in counts_df.columns:
+            chain_df = MarkovChain.compute_probabilities(counts_df)
+        else:
+            chain_df = markovChain.chain_df
+        return ChainSampler(chain_df)
+
+    @staticmethod
+    def from_interned(interned:InternedChain) -> 'ChainSampler':
+        """Compile a ChainSampler from an InternedChain without creating a DataFrame
+
+        The CSR transitions already group the rows by key, so the offsets are the CSR indptr.
+        For the long layout the cumulative probabilities are used as is (a memory map if the InternedChain was loaded from a file).
+        For the wide layout the rows of a key are put in DataFrame column order and the probabilities summed,
+        the same rows as from_wide() of the chain DataFrame.
+        The keys are an InternedKeys sequence, a key is joined only when it's used.
+        """
+        probabilities = interned.probabilities
+        if probabilities is None:
+            probabilities = interned.compute_probabilities()
+        transitions = interned.transitions
+        sampler = ChainSampler.__new__(ChainSampler)
+        sampler.offsets = np.asarray(transitions.indptr, dtype=np.int64)
+        if interned.layout == 'wide':
+            row_states = np.repeat(np.arange(transitions.shape[0]), np.diff(sampler.offsets))
+            column_positions = np.zeros(len(interned.vocabulary), dtype=np.int64)
+            column_positions[interned.columns] = np.arange(len(interned.columns))
+            rows = np.lexsort((column_positions[transitions.indices], row_states))
+            sampler.tokens = interned.vocabulary[transitions.indices[rows]]
+            sampler.probs = pd.Series(np.asarray(probabilities, dtype=np.float64)[rows]).groupby(row_states, sort=False).cumsum().to_numpy()
+        else:
+            sampler.tokens = interned.vocabulary[transitions.indices]
+            sampler.probs = np.asarray(probabilities, dtype=np.float64)
+        sampler.keys = interned.get_key_sequence()
+        sampler._index = sampler.keys
+        sampler._state_probs = None
+        return sampler
+
+    @staticmethod
+    def from_wide(chain_df:pd.DataFrame) -> 'ChainSampler':
+        """Compile a ChainSampler from a chain DataFrame in wide (music) layout
+        
+        The chain_df index is the keys and there is a column for each next token.
+        The rows of a key are its non-zero probabilities in column order,
+        exactly the cumulative sum of the DataFrame row.
+        """
+        values = chain_df.to_numpy(dtype=np.float64)
+        nonzero = values > 0
+        states, columns = np.nonzero(nonzero)
+        sampler = ChainSampler.__new__(ChainSampler)
+        sampler.tokens = chain_df.columns.to_numpy()[columns]
+        sampler.offsets = np.zeros(len(chain_df)+1, dtype=np.int64)
+        sampler.offsets[1:] = np.cumsum(np.bincount(states, minlength=len(chain_df)))
+        sampler.probs = np.cumsum(np.where(nonzero, values, 0.0), axis=1)[states, columns]
+        sampler.keys = list(chain_df.index)
+        sampler._index = {k:i for i,k in enumerate(sampler.keys)}
+        sampler._state_probs = None
+        return sampler
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __repr__(self):
+        return f"ChainSampler keys={len(self.keys)} rows={len(self.tokens)}"
+
+    def get_state(self, key) -> int:
+        """Returns the state id (position) of a key, -1 if the key is not present
+
+        """
+        return self._index.get(key, -1)
+
+    def get_states(self, keys) -> np.ndarray:
+        """Returns the state ids of an iterable of keys, -1 for keys not present
+
+        """
+        return np.array([self._index.get(k, -1) for k in keys], dtype=np.int64)
+
+    def get_row_states(self) -> np.ndarray:
+        """Returns the state id of every row of the token and probability arrays
+
+        """
+        return np.repeat(np.arange(len(self.keys), dtype=np.int64), np.diff(self.offsets))
+
+    def get_tokens(self, key) -> np.ndarray:
+        """Returns the next tokens for a key, an empty array if the key is not present
+
+        """
+        ind = self._index.get(key)
+        if ind is None:
+            return self.tokens[0:0]
+        return self.tokens[self.offsets[ind]:self.offsets[ind+1]]
+
+    def sample(self, key, prob:float) -> dict:
+        """Pick the next token for a key given a random probability.
+
+        The token selected is the first one having a cumulative probability > prob.
+        Returns:
+            a dict with keys 'next_token' and 'prob' (the cumulative probability of the token selected)
+            The values are None if the key is not present.
+        """
+        ind = self._index.get(key)
+        if ind is None:
+            return dict([ ('next_token', None), ('prob', None)])
+        pos = self.sample_row(ind, prob)
+        return dict([ ('next_token', self.tokens[pos]), ('prob', self.probs[pos])])
+
+    def sample_row(self, state:int, prob:float) -> int:
+        """Picks the row of the tokens and probs arrays for a state id given a random probability
+        
+        The state must be valid (>= 0). This is sample() for callers that keep state ids instead of keys.
+        """
+        start = self.offsets[state]
+        end = self.offsets[state+1]
+        pos = bisect.bisect_right(self.probs, prob, start, end)
+        if pos >= end:      # guards against a final cumulative probability a bit < 1.0
+            pos = end - 1
+        return pos
+
+    def sample_rows(self, states:np.ndarray, probs:np.ndarray) -> np.ndarray:
+        """Vectorized sample(): picks a row for each of a number of states at once.
+
+        Adding the state id to the cumulative probabilities of its rows makes the whole probs array
+        sorted, so a single searchsorted call does the binary search for every state.
+        Parameters:
+            states - int array of state ids, all must be valid (>= 0)
+            probs - float array of random probabilities in [0,1), the same length as states
+        Returns:
+            int array of row positions in the tokens and probs arrays
+        """
+        if self._state_probs is None:
+            self._state_probs = self.probs + self.get_row_states()
+        rows = np.searchsorted(self._state_probs, states + probs, side='right')
+        return np.minimum(rows, self.offsets[states+1] - 1)
+
+if __name__ == '__main__':
+    print(ChainSampler.__doc__)
@@ -15,6 +15,8 @@
 
 from common.collector import Collector
 from common.textParser import TextParser
+from common.chainCounts import ChainCounts
+from common.backoffChain import BackoffChain
 import pandas as pd
 
 class CharacterCollector(Collector):
@@ -25,11 +27,15 @@ class CharacterCollector(Collector):
         self.ignore_case = ignore_case
         self.terminal_object = '~'
         self.initial_object = ' '
+        self.key_separator = ''
 
         self.countsFileName = '_charCounts' + '_0{}'.format(state_size)
         self.chainFileName = '_charsChain' + '_0{}'.format(state_size)
+        self.backoffFileName = '_charsBackoff' + '_0{}'.format(state_size)
         
         self._text_parser = None
+        self.streaming = False      # if True, count the source a line at a time
+                                    # if workers is set, count line ranges of the source in separate processes
 
     def __str__(self):
         return f"CharacterCollector order={self.order} verbose={self.verbose} name={self.name} format={self.format}, source={self.source}, text={self.text}, ignoreCase={self._ignore_case}"
@@ -37,6 +43,60 @@ class CharacterCollector(Collector):
     def process(self, keys, word):
         keys += [ (''.join(word[i:i+self.order]), word[i+self.order])  for i in range(0, len(word)-self.order)]
         
+    @staticmethod
+    def _count_lines(text_parser:TextParser, order:int, initial_object=' ', terminal_object='~') -> ChainCounts:
+        """Counts the keys of each line as it is read instead of collecting them all first
+        
+        """
+        counts = ChainCounts(order, '')
+        for line_words in text_parser.iter_words('lines'):
+            for w in line_words:
+                counts.add_sequence(initial_object + w.strip() + terminal_object, name=None)
+        counts.token_counts = text_parser._word_counts
+        return counts
+    
+    @staticmethod
+    def count_shard(shard) -> ChainCounts:
+        """Counts the keys in a range of source lines
+        
+        Parameters:
+            shard - a tuple of (source, (start, stop) line range, order, ignore_case, initial_object, terminal_object)
+        """
+        source, line_range, order, ignore_case, initial_object, terminal_object = shard
+        text_parser = TextParser(source=source, ignore_case=ignore_case, maxlines=None, remove_stop_words=False, stream=True)
+        text_parser.line_range = line_range
+        return CharacterCollector._count_lines(text_parser, order, initial_object, terminal_object)
+    
+    def get_shards(self) -> list:
+        line_ranges = TextParser.get_line_ranges(self.source, self.workers)
+        return [(self.source, line_range, self.order, self.ignore_case, self.initial_object, self.terminal_object) for line_range in line_ranges]
+    
+    def set_update_source(self, source):
+        """update() collects the new material from a source file
+        
+        """
+        self.source = source
+        self.text = None
+    
+    def _collect_backoff(self) -> ChainCounts:
+        """Collects the BackoffChain of the source or text words in one pass
+        
+        Returns:
+            the ChainCounts of self.order
+        """
+        self.backoffChain = BackoffChain(self.order, self.key_separator)
+        if self.source is not None:
+            self._text_parser = TextParser(source=self.source, ignore_case=self.ignore_case, maxlines=None, remove_stop_words=False, stream=True)
+            words = (w for line_words in self._text_parser.iter_words('lines') for w in line_words)
+        else:
+            words = TextParser.remove_punctuation(self.text).split(' ')
+        for w in words:
+            self.backoffChain.add_sequence(self.initial_object + w.strip() + self.terminal_object, name=None)
+        if self.source is not None:
+            self.word_counts = self._text_parser.get_word_counts(sort_counts=True, reverse=True)
+            self.words_df = self._text_parser.counts_df
+        return self.backoffChain.get_counts(self.order)
+    
     def _set_keys(self):
         #
         # create the keys 
@@ -55,7 +115,19 @@ class CharacterCollector(Collector):
         Returns MarkovChain result
         """
         word_keys = []
-        if self.source is not None:
+        counts = None
+        if self.backoff:
+            counts = self._collect_backoff()
+        elif self.source is not None and (self.streaming or self.workers is not None):
+            self._text_parser = TextParser(source=self.source, ignore_case=self.ignore_case, maxlines=None, remove_stop_words=False, stream=True)
+            if self.workers is not None:
+                counts = self.collect_shards(self.get_shards())
+                self._text_parser.update_word_counts(counts.token_counts)
+            else:
+                counts = CharacterCollector._count_lines(self._text_parser, self.order, self.initial_object, self.terminal_object)
+            self.word_counts = self._text_parser.get_word_counts(sort_counts=True, reverse=True)
+            self.words_df = self._text_parser.counts_df
+        elif self.source is not None:
             self._text_parser = TextParser(source=self.source, ignore_case=self.ignore_case, maxlines=None, remove_stop_words=False)
             #
             # word counts are informational only
@@ -79,10 +151,13 @@ class CharacterCollector(Collector):
         #
         # create the counts_df DataFrame
         #          
-        word_keys_df =  pd.DataFrame(data=word_keys, columns=['key','word'])
-        words_ser = word_keys_df.value_counts(ascending=False)
-        df = pd.DataFrame(words_ser, columns=['count'])
-        self.counts_df = df.reset_index()
+        if counts is not None:
+            self.counts_df = counts.to_dataframe()
+        else:
+            word_keys_df =  pd.DataFrame(data=word_keys, columns=['key','word'])
+            words_ser = word_keys_df.value_counts(ascending=False)
+            df = pd.DataFrame(words_ser, columns=['count'])
+            self.counts_df = df.reset_index()
         if self.sort_chain:
             self.counts_df.sort_values(by=['key','word'], ignore_index=True, inplace=True)
         
@@ -9,8 +9,14 @@
 # License:      BSD, see license.txt
 # ------------------------------------------------------------------------------
 
+import os
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
 from common.markovChain import MarkovChain
+from common.chainCounts import ChainCounts
+from common.internedChain import InternedChain
+from common.backoffChain import BackoffChain
 from common.utils import Utils
 from common.collectorProducer import CollectorProducer
 
@@ -53,6 +59,14 @@ class Collector(CollectorProducer):
         self._initial_keys = None        # unique list of key values of initial_keys_df
         self._keys = None                # unique key values of counts_df
         
+        self.workers = None              # number of worker processes for sharded collection, None to collect serially
+        self.layout = 'long'             # counts_df layout, 'long' (key, word, count) or 'wide' (KEY index, a column per token)
+        self.updating = False            # True while update() is collecting new material
+        self._chain_initial = True       # True if the chain_df was created from initial keys only
+        self.backoff = False             # if True, also collect a BackoffChain of orders 0 through order, in derived classes that support it
+        self.backoffChain = None         # the BackoffChain collected if backoff is True
+        self.backoffFileName = '_backoff'   # appended to self.name for the BackoffChain file, always .npz
+        
     def __repr__(self, *args, **kwargs):
         return "Collector"
     
@@ -64,10 +78,36 @@ class Collector(CollectorProducer):
         return self._keys
            
            
+    @staticmethod
+    def count_shard(shard) -> ChainCounts:
+        """Counts one shard of the source, implement in derived classes that support sharded collection
+        
+        This runs in a worker process, so it is a staticmethod and the shard must include everything
+        needed to collect it, for example a file name and line range.
+        """
+        return None
+    
+    def get_shards(self) -> list:
+        """Splits the source into shards for sharded collection, implement in derived classes
+        
+        """
+        return []
+    
+    def collect_shards(self, shards:list) -> ChainCounts:
+        """Counts each shard in a separate process and merges the results in shard order
+        
+        The merged ChainCounts are identical to counting the shards serially.
+        Parameters:
+            shards - a list of shards as created by get_shards()
+        """
+        if self.verbose > 0:
+            print(f"collecting {len(shards)} shards using {self.workers} workers")
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            results = executor.map(self.count_shard, shards)
+            return reduce(ChainCounts.merge, results, ChainCounts(self.order, self.key_separator))
+    
     def _add_counts_to_model(self, model: dict, countsdf: pd.DataFrame, akey: str):
-        key_df = countsdf[countsdf['key'] ==  akey]
-        s = (key_df['count']/key_df['count'].sum()).cumsum()
-        model[akey] = key_df.assign(prob=s )
+        model[akey] = MarkovChain.compute_probabilities(countsdf, [akey])
 
             
     def _create_chain(self, initial=True) -> MarkovChain:
@@ -82,17 +122,27 @@ class Collector(CollectorProducer):
             initial - if True (the default) create the MarkovChain from initial_keys only
         """
 
+        self._chain_initial = initial
         thekeys = self._initial_keys
         if not initial:
             thekeys = self._keys
         
         self.markovChain = MarkovChain(self.order, self.counts_df, keys=thekeys, chain_df=None,  myname=self.name)
+        self.chain_df = self.markovChain.chain_df
         if self.sort_chain:
             self.chain_df = self.markovChain.chain_df.sort_values(by=['key','word'], ignore_index=True, inplace=False)
             self.markovChain.chain_df = self.chain_df
         
         return self.markovChain
     
+    def get_interned_chain(self) -> InternedChain:
+        """Returns the collected counts as an InternedChain, None if nothing has been collected
+        
+        """
+        if self.markovChain is None:
+            return None
+        return self.markovChain.intern(self.key_separator)
+    
     def run(self):
         """Invokes the derived class's collect() function and invokes save()
         
@@ -117,6 +167,89 @@ class Collector(CollectorProducer):
             
         return {'collect_result' : collect_result, 'save_result' : save_result}
 
+    def set_update_source(self, source):
+        """Sets the source of the new material collected by update(), override in derived classes as needed
+        
+        """
+        self.source = source
+    
+    def load_counts(self) -> tuple:
+        """Loads the counts_df and chain_df saved for this collector's name, format and order
+        
+        Returns:
+            a tuple of (counts_df, chain_df), (None, None) if the files do not exist
+        """
+        chain_file = "{}/{}{}.{}".format(self.save_folder, self.name, self.chainFileName, self.format)
+        counts_file = "{}/{}{}.{}".format(self.save_folder, self.name, self.countsFileName, self.format)
+        if self.format == 'npz':
+            if not os.path.exists(chain_file):
+                return None, None
+            markovChain = MarkovChain.from_interned(InternedChain.load(chain_file, mmap_mode=None))
+            return markovChain.counts_df, markovChain.chain_df
+        if not (os.path.exists(chain_file) and os.path.exists(counts_file)):
+            return None, None
+        counts_df = CollectorProducer.read_df(counts_file, self.format, self.layout)
+        chain_df = CollectorProducer.read_df(chain_file, self.format, self.layout)
+        return counts_df, chain_df
+    
+    def merge_counts(self, counts_df:pd.DataFrame, chain_df:pd.DataFrame) -> MarkovChain:
+        """Adds previously saved counts to the counts_df of newly collected material
+        
+        Only the probabilities of keys in the new material are recomputed,
+        the chain_df rows of all other keys are used as is.
+        This implementation is for the long layout, derived classes having a wide layout override.
+        Parameters:
+            counts_df - the saved counts_df
+            chain_df - the saved chain_df
+        Returns:
+            the updated MarkovChain
+        """
+        changed_keys = set(self.counts_df['key'])
+        merged_df = pd.concat([counts_df, self.counts_df], ignore_index=True)
+        merged_df = merged_df.groupby(['key','word'], sort=False, as_index=False)['count'].sum()
+        self.counts_df = merged_df.sort_values(by='count', ascending=False, kind='stable', ignore_index=True)
+        self._set_keys()
+        thekeys = self._initial_keys if self._chain_initial else self._keys
+        
+        unchanged_df = chain_df[~chain_df['key'].isin(changed_keys)]
+        changed_df = MarkovChain.compute_probabilities(self.counts_df, changed_keys & thekeys)
+        self.chain_df = pd.concat([unchanged_df, changed_df], ignore_index=True)
+        if self.sort_chain:
+            self.chain_df.sort_values(by=['key','word'], ignore_index=True, inplace=True)
+        self.markovChain = MarkovChain(self.order, self.counts_df, keys=thekeys, chain_df=self.chain_df, myname=self.name)
+        return self.markovChain
+    
+    def update(self, source=None):
+        """Adds new material to a saved MarkovChain
+        
+        The saved counts are loaded, the new material (only) is collected and its counts added
+        to the saved counts. Probabilities are recomputed for the keys that changed
+        and the result is saved, replacing the previous files atomically.
+        If nothing has been saved under this name, update() is the same as run().
+        Parameters:
+            source - the new material, for example a text file or score. If None the source already set is used.
+        Returns:
+            a dict with keys 'collect_result' and 'save_result' as in run()
+        """
+        counts_df, chain_df = self.load_counts()
+        if counts_df is None:
+            return self.run()
+        if source is not None:
+            self.set_update_source(source)
+        self.counts_df = None
+        self.updating = True
+        try:
+            self.collect()
+        finally:
+            self.updating = False
+        save_result = False
+        collect_result = self.counts_df is not None and len(self.counts_df) > 0
+        if collect_result:
+            self.backoffChain = None    # a BackoffChain is not updated incrementally, collect it with run()
+            self.merge_counts(counts_df, chain_df)
+            save_result = self.save()
+        return {'collect_result' : collect_result, 'save_result' : save_result}
+
     def collect(self):
         """
         Override in subclass
@@ -124,7 +257,14 @@ class Collector(CollectorProducer):
         return None
 
     def save(self):
+        """Saves the MarkovChain and counts files and, if one was collected, the BackoffChain file
+        
+        """
         save_result = super().save()
+        if save_result and self.backoffChain is not None:
+            filename = "{}/{}{}.npz".format(self.save_folder, self.name, self.backoffFileName)
+            with CollectorProducer.atomic_file(filename) as backoff_file:
+                save_result = self.backoffChain.save(backoff_file)
         return save_result
     
     def get_json_output(self):
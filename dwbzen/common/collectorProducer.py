@@ -10,6 +10,8 @@
 
 from common.utils import Utils
 from common.environment import Environment
+from contextlib import contextmanager
+import os
 import sys
 import pandas as pd
 
@@ -22,13 +24,14 @@ class CollectorProducer(object):
         self.verbose = verbose
         self.source = source    # file input or DataFrame source
         self.name = None        # set by the user on the command line
-        self.format = None      # csv or json
+        self.format = None      # csv, json, xlsx or npz
         
         self.chain_filename = None          # MarkovChain.chain_df filename
         self.counts_filename = None         # MarkovChain.counts_df filename
         
         self.chain_df = None        # pd.DataFrame()
         self.counts_df = None       # pd.DataFrame()
+        self.key_separator = ' '    # joins the tokens of a MarkovChain key, set in derived classes
         #
         # update Environment to reflect your environment
         #
@@ -58,6 +61,69 @@ class CollectorProducer(object):
             print("Empty DataFrame(s)", sys.stderr)
         return result
     
+    @staticmethod
+    def read_df(filename, file_format, layout='long') -> pd.DataFrame:
+        """Reads a DataFrame file written by save_df()
+        
+        Parameters:
+            filename - the file to read
+            file_format - 'csv', 'json' or 'xlsx'. Use InternedChain.load() for 'npz'
+            layout - 'long' for the key, word, count (and prob) form of the text collectors,
+                     'wide' for the music collectors' form having a 'KEY' index and a column for each next token.
+        Keys and tokens are read as str.
+        """
+        if file_format=='csv':
+            if layout == 'long':
+                df = pd.read_csv(filename, index_col=0, dtype={'key':str, 'word':str}, keep_default_na=False)
+            else:
+                df = pd.read_csv(filename, index_col='KEY', dtype={'KEY':str}, keep_default_na=False)
+        elif file_format=='json':
+            df = pd.read_json(filename, orient='index', convert_axes=False, dtype=False)
+            if layout == 'wide':
+                df.rename_axis('KEY', inplace=True)
+        elif (file_format=='xlsx' or file_format=='excel') and layout == 'long':
+            df = pd.read_excel(filename, dtype={'key':str, 'word':str})
+        else:
+            raise ValueError(f"Can't read a {layout} {file_format} file")
+        if layout == 'long':
+            df.reset_index(drop=True, inplace=True)
+        return df
+    
+    @staticmethod
+    @contextmanager
+    def atomic_file(filename):
+        """Yields a temporary filename, in the same folder, that replaces filename when the with block completes
+        
+        os.replace() is atomic, so readers see either the previous file or the complete new one.
+        If the block raises an exception, or doesn't write the temporary file, filename is unchanged.
+        """
+        with CollectorProducer.atomic_files(filename) as temp_filenames:
+            yield temp_filenames[0]
+    
+    @staticmethod
+    @contextmanager
+    def atomic_files(*filenames):
+        """Yields a list of temporary filenames, one for each filename, that replace the filenames together when the with block completes
+        
+        The files are replaced only after all the temporary files are written, so a set of files that go together,
+        such as the chain and counts files, are all new or all unchanged. If the block raises an exception,
+        or doesn't write every temporary file, the filenames are unchanged.
+        """
+        temp_filenames = []
+        for filename in filenames:
+            folder, name = os.path.split(filename)
+            base, ext = os.path.splitext(name)
+            temp_filenames.append(os.path.join(folder, f".{base}.{os.getpid()}{ext}"))
+        try:
+            yield temp_filenames
+            if all(os.path.exists(temp_filename) for temp_filename in temp_filenames):
+                for temp_filename, filename in zip(temp_filenames, filenames):
+                    os.replace(temp_filename, filename)
+        finally:
+            for temp_filename in temp_filenames:
+                if os.path.exists(temp_filename):
+                    os.remove(temp_filename)
+    
     def save(self):
         """Saves the MarkovChain and counts DataFrame files
         
@@ -71,6 +137,11 @@ class CollectorProducer(object):
         Similarly, the counts_df DataFrame is saved using the self.countsFileName
         to create the save filename. For example, '_charsCounts'
         
+        The npz format saves a single binary file, the chainFileName, holding the interned
+        counts and probabilities of every key. That is loaded with InternedChain.load()
+        
+        The chain and counts files are written to temporary files first and both are replaced
+        only after the two are written, see atomic_files(), so an interrupted save leaves the previous files intact.
         """
         save_result = False
         if self.name is not None:   # format will always be set to something, even if name is None
@@ -80,8 +151,13 @@ class CollectorProducer(object):
             self.counts_file = "{}/{}{}.{}".format(self.save_folder, self.name, self.countsFileName, self.format)
             if self.verbose > 1:
                 print(f"output filenames '{self.filename}' counts: {self.counts_file}")
-            save_result = CollectorProducer.save_df(self.chain_df, self.filename, self.format)
-            save_result = save_result and CollectorProducer.save_df(self.counts_df, self.counts_file, self.format)
+            if self.format == 'npz':
+                with CollectorProducer.atomic_file(self.filename) as chain_file:
+                    save_result = self.markovChain.intern(self.key_separator).save(chain_file)
+                return save_result
+            with CollectorProducer.atomic_files(self.filename, self.counts_file) as (chain_file, counts_file):
+                save_result = CollectorProducer.save_df(self.chain_df, chain_file, self.format)
+                save_result = save_result and CollectorProducer.save_df(self.counts_df, counts_file, self.format)
             
         return save_result
     
\ No newline at end of file
@@ -0,0 +1,461 @@
+# ------------------------------------------------------------------------------
+# Name:          internedChain.py
+# Purpose:       InternedChain class.
+#
+#                InternedChain is a compact, integer-interned form
+#                of a MarkovChain counts or chain DataFrame.
+#
+# Authors:      Donald Bacon
+#
+# Copyright:    Copyright 2026 Donald Bacon
+# License:      BSD, see license.txt
+# ------------------------------------------------------------------------------
+
+import json
+import struct
+import zipfile
+from collections.abc import Sequence
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+class InternedChain(object):
+    """An integer-interned representation of a MarkovChain DataFrame.
+
+    Every distinct token, whether it appears in a key or as a next token, is stored once
+    in the vocabulary and referred to by its int32 id.
+    The n-gram states (the keys) are rows of an int32 array of token ids, padded with -1.
+    The transitions are held in a scipy.sparse CSR matrix having one row per state
+    and one column per vocabulary token, the values are the counts (or probabilities).
+
+    Two DataFrame layouts are supported and converted losslessly:
+        'long' - the text collectors' form with 'key', 'word' and 'count' columns and one row per transition.
+                 The rows of a key are stored in their DataFrame order, duplicate (key, word) rows included,
+                 and positions records where each DataFrame row is so to_dataframe() restores the original row order.
+        'wide' - the music collectors' form with the keys as the index and the next tokens as the columns.
+
+    The key_separator is what joins the tokens of a key, for example ' ' for a WordCollector key such as 'the quick',
+    ',' for a NoteCollector key such as 'A4,G4'. An empty string splits a key into individual characters
+    as in CharacterCollector keys.
+
+    An InternedChain can be saved to and loaded from a binary .npz file with save() and load().
+    Every array, the vocabulary included, is stored uncompressed with a fixed type
+    so load() can memory map the arrays instead of reading and parsing the file.
+    The token ids dict and the joined keys are created only when they are used, see get_state() and get_key_sequence().
+    """
+
+    layouts = ['long', 'wide']
+    token_types = {0:str, 1:int, 2:float}     # vocabulary token type codes used in saved files
+
+    def __init__(self, vocabulary:np.ndarray, states:np.ndarray, transitions:sparse.csr_matrix, order:int, \
+                 key_separator=' ', layout='long', columns:np.ndarray=None, index_name=None, \
+                 column_names=('key','word','count'), positions:np.ndarray=None):
+        """Create an InternedChain from its component parts. Typically created with from_dataframe()
+
+        Parameters:
+            vocabulary - object array of tokens, the position of a token is its id
+            states - int32 array of token ids, one row per state padded with -1
+            transitions - CSR matrix of shape (number of states, size of vocabulary)
+            order - the MarkovChain order
+            key_separator - the str used to join the tokens of a key
+            layout - 'long' or 'wide', the layout of the source DataFrame
+            columns - for the wide layout, the token ids of the DataFrame columns in their original order
+            index_name - for the wide layout, the name of the DataFrame index
+            column_names - for the long layout, the names of the key, next token and value columns
+            positions - for the long layout, the position in transitions.data of each DataFrame row.
+                        None if the rows are in transitions order
+        The probabilities attribute, aligned with transitions.data, is set by compute_probabilities()
+        """
+        self.vocabulary = vocabulary
+        self.states = states
+        self.transitions = transitions
+        self.order = order
+        self.key_separator = key_separator
+        self.layout = layout
+        self.columns = columns
+        self.index_name = index_name
+        self.column_names = column_names
+        self.positions = positions
+        self.probabilities = None
+        self._token_ids = None
+        self._keys = None
+        self._key_index = None
+
+    @property
+    def token_ids(self) -> dict:
+        """A dict of token : token id, created when first used
+
+        """
+        if self._token_ids is None:
+            self._token_ids = {t:i for i,t in enumerate(self.vocabulary.tolist())}
+        return self._token_ids
+
+    def __repr__(self):
+        return f"InternedChain order={self.order} layout={self.layout} states={self.states.shape[0]} vocabulary={len(self.vocabulary)} transitions={self.transitions.nnz}"
+
+    @staticmethod
+    def split_key(akey, key_separator=' ') -> tuple:
+        """Splits a key into a tuple of tokens. A key that is not a str (an order 1 durations key for example) is a single token
+
+        """
+        if not isinstance(akey, str):
+            return (akey,)
+        if key_separator == '':
+            return tuple(akey)
+        return tuple(akey.split(key_separator))
+
+    @staticmethod
+    def join_key(tokens:tuple, key_separator=' '):
+        """The inverse of split_key()
+
+        """
+        if len(tokens) == 1:
+            return tokens[0]
+        return key_separator.join(tokens)
+
+    @staticmethod
+    def _factorize(values) -> (np.ndarray, np.ndarray):
+        """Assigns integer ids to values. Ids are in sorted order if the values can be sorted.
+
+        """
+        values = np.asarray(values, dtype=object)
+        try:
+            codes, uniques = pd.factorize(values, sort=True, use_na_sentinel=False)
+        except TypeError:   # a mix of types that can't be compared, str and float for example
+            codes, uniques = pd.factorize(values, sort=False, use_na_sentinel=False)
+        return codes.astype(np.int32), np.asarray(uniques, dtype=object)
+
+    @staticmethod
+    def from_dataframe(df:pd.DataFrame, order:int, key_separator=' ', layout=None) -> 'InternedChain':
+        """Create an InternedChain from a counts or chain DataFrame
+
+        Parameters:
+            df - a DataFrame in long or wide layout
+            order - the MarkovChain order
+            key_separator - the str used to join the tokens of a key
+            layout - 'long' or 'wide'. If None the layout is 'long' if df has a 'key' column, otherwise 'wide'
+        Returns:
+            a new InternedChain
+        """
+        if layout is None:
+            layout = 'long' if 'key' in df.columns else 'wide'
+        if layout not in InternedChain.layouts:
+            raise ValueError(f"Invalid layout: {layout}")
+
+        columns = None
+        index_name = None
+        column_names = ('key','word','count')
+        if layout == 'long':
+            state_codes, state_keys = pd.factorize(df['key'].to_numpy(dtype=object), sort=False, use_na_sentinel=False)
+            next_tokens = df['word'].to_numpy(dtype=object)
+            values = df['count'].to_numpy()
+        else:
+            state_keys = df.index.to_numpy(dtype=object)
+            matrix = df.to_numpy()
+            state_codes, column_codes = np.nonzero(matrix)
+            values = matrix[state_codes, column_codes]
+            next_tokens = df.columns.to_numpy(dtype=object)
+            index_name = df.index.name
+
+        split_keys = [InternedChain.split_key(k, key_separator) for k in state_keys]
+        key_tokens = [t for tokens in split_keys for t in tokens]
+        token_codes, vocabulary = InternedChain._factorize(key_tokens + list(next_tokens))
+
+        width = max([len(tokens) for tokens in split_keys], default=order)
+        states = np.full((len(split_keys), width), -1, dtype=np.int32)
+        pos = 0
+        for i,tokens in enumerate(split_keys):
+            states[i, :len(tokens)] = token_codes[pos:pos+len(tokens)]
+            pos += len(tokens)
+        next_codes = token_codes[pos:]
+
+        positions = None
+        if layout == 'long':
+            rows = np.argsort(state_codes, kind='stable')      # group the rows by key, retaining the row order within a key
+            positions = np.empty(len(rows), dtype=np.int64)
+            positions[rows] = np.arange(len(rows))
+            indptr = np.zeros(len(split_keys)+1, dtype=np.int64)
+            indptr[1:] = np.cumsum(np.bincount(state_codes, minlength=len(split_keys)))
+            transitions = sparse.csr_matrix((values[rows], next_codes[rows], indptr), shape=(len(split_keys), len(vocabulary)))
+        else:
+            columns = next_codes
+            transitions = sparse.csr_matrix((values, (state_codes, columns[column_codes])), shape=(len(split_keys), len(vocabulary)))
+            transitions.sort_indices()
+        return InternedChain(vocabulary, states, transitions, order, key_separator=key_separator, layout=layout, \
+                             columns=columns, index_name=index_name, column_names=column_names, positions=positions)
+
+    def to_dataframe(self, values:np.ndarray=None) -> pd.DataFrame:
+        """Converts back to a DataFrame in the layout it was created from
+
+        Long layout rows are in their original order, or if positions is None grouped by key in transitions order.
+        Parameters:
+            values - optional array aligned with transitions.data to use in place of the counts,
+                     the probabilities for example
+        """
+        keys = self.get_keys()
+        transitions = self.transitions
+        if values is not None:
+            transitions = sparse.csr_matrix((values, transitions.indices, transitions.indptr), shape=transitions.shape)
+        if self.layout == 'long':
+            coo = transitions.tocoo()
+            key_name, token_name, value_name = self.column_names
+            df = pd.DataFrame(data={key_name:np.asarray(keys, dtype=object)[self.get_row_values(coo.row)], \
+                                    token_name:self.vocabulary[self.get_row_values(coo.col)], value_name:self.get_row_values(coo.data)})
+        else:
+            matrix = transitions[:, self.columns].toarray()
+            df = pd.DataFrame(data=matrix, index=pd.Index(keys, dtype=object), columns=pd.Index(self.vocabulary[self.columns], dtype=object))
+            df.rename_axis(self.index_name, inplace=True)
+        return df
+
+    def get_row_values(self, values:np.ndarray) -> np.ndarray:
+        """Returns an array aligned with transitions.data, the probabilities for example, in the long layout DataFrame row order
+
+        """
+        if self.positions is None:
+            return values
+        return np.asarray(values)[self.positions]
+
+    def get_keys(self) -> list:
+        """Returns the keys in their original (joined) form, in state id order
+
+        """
+        if self._keys is None:
+            vocabulary = self.vocabulary
+            self._keys = [InternedChain.join_key(tuple(vocabulary[row[row >= 0]].tolist()), self.key_separator) for row in self.states]
+        return self._keys
+
+    def get_key(self, state:int):
+        """Returns the key of a state id in its original (joined) form
+
+        """
+        row = self.states[state]
+        return InternedChain.join_key(tuple(self.vocabulary[row[row >= 0]].tolist()), self.key_separator)
+
+    def get_key_sequence(self, states:np.ndarray=None) -> 'InternedKeys':
+        """Returns a sequence of the keys of the given state ids, in increasing order, or all the states if None.
+        The keys are joined only when used
+
+        """
+        return InternedKeys(self, states)
+
+    def get_states_with_prefix(self, prefix:str) -> np.ndarray:
+        """Returns the ids of the states whose joined key starts with prefix
+
+        Only the first token of a key is checked, unless the prefix is longer than the token.
+        """
+        tokens = [str(t) for t in self.vocabulary.tolist()]
+        starts = np.array([t.startswith(prefix) for t in tokens] + [False], dtype=bool)     # -1 is an empty key
+        partial = np.array([len(t) < len(prefix) and prefix.startswith(t) for t in tokens] + [False], dtype=bool)
+        first = self.states[:, 0] if self.states.shape[1] > 0 else np.full(self.states.shape[0], -1, dtype=np.int32)
+        matched = starts[first]
+        for state in np.flatnonzero(partial[first]):     # a short first token, the joined key is checked
+            matched[state] = str(self.get_key(state)).startswith(prefix)
+        return np.flatnonzero(matched)
+
+    def get_state(self, akey) -> int:
+        """Returns the state id of a key, a joined key or a tuple of tokens. None if not present
+
+        """
+        if self._key_index is None:
+            rows = self.states.tolist()
+            if (np.asarray(self.states) < 0).any():     # padded keys
+                rows = [[t for t in row if t >= 0] for row in rows]
+            self._key_index = dict(zip(map(tuple, rows), range(len(rows))))
+        tokens = akey if isinstance(akey, tuple) else InternedChain.split_key(akey, self.key_separator)
+        ids = []
+        for t in tokens:
+            token_id = self.token_ids.get(t)
+            if token_id is None:
+                return None
+            ids.append(token_id)
+        return self._key_index.get(tuple(ids))
+
+    def get_transitions(self, akey) -> (np.ndarray, np.ndarray):
+        """Returns the next tokens and their values (counts or probabilities) for a key
+
+        """
+        state = self.get_state(akey)
+        if state is None:
+            return self.vocabulary[0:0], self.transitions.data[0:0]
+        start, end = self.transitions.indptr[state], self.transitions.indptr[state+1]
+        return self.vocabulary[self.transitions.indices[start:end]], self.transitions.data[start:end]
+
+    def get_probabilities(self) -> sparse.csr_matrix:
+        """Returns the transition matrix normalized so each row sums to 1
+
+        """
+        sums = np.asarray(self.transitions.sum(axis=1)).ravel().astype(np.float64)
+        sums[sums == 0] = 1.0
+        return sparse.diags(1.0/sums) @ self.transitions
+
+    def compute_probabilities(self) -> np.ndarray:
+        """Computes and sets the probabilities array, aligned with transitions.data
+
+        The probabilities are in the form the producers use. For the long layout that is
+        the cumulative probability within each key as in a MarkovChain chain_df 'prob' column,
+        for the wide layout the counts normalized by row.
+        """
+        transitions = self.transitions
+        row_states = np.repeat(np.arange(transitions.shape[0]), np.diff(transitions.indptr))
+        sums = np.asarray(transitions.sum(axis=1)).ravel().astype(np.float64)
+        probabilities = transitions.data / sums[row_states]
+        if self.layout == 'long':
+            probabilities = pd.Series(probabilities).groupby(row_states, sort=False).cumsum().to_numpy()
+        self.probabilities = probabilities
+        return probabilities
+
+    @staticmethod
+    def _encode_vocabulary(vocabulary:np.ndarray) -> (np.ndarray, np.ndarray):
+        """Encodes the vocabulary as a fixed width str array and an array of token type codes
+
+        """
+        types = np.zeros(len(vocabulary), dtype=np.int8)
+        text = []
+        for i,t in enumerate(vocabulary):
+            if isinstance(t, (float, np.floating)):
+                types[i] = 2
+                t = float(t)
+            elif isinstance(t, (int, np.integer)) and not isinstance(t, bool):
+                types[i] = 1
+                t = int(t)
+            text.append(str(t))
+        return np.array(text, dtype=str) if len(text) > 0 else np.array([], dtype='<U1'), types
+
+    @staticmethod
+    def _decode_vocabulary(text:np.ndarray, types:np.ndarray) -> np.ndarray:
+        """The inverse of _encode_vocabulary()
+
+        """
+        vocabulary = np.asarray(text).astype(object)
+        for code,token_type in InternedChain.token_types.items():
+            if code > 0:
+                mask = types == code
+                vocabulary[mask] = [token_type(t) for t in text[mask]]
+        return vocabulary
+
+    def save(self, filename:str) -> bool:
+        """Saves to an uncompressed .npz file
+
+        The file holds the token table (vocabulary), the key table (states), the CSR transition arrays
+        of counts, the probabilities and a small JSON header with the order, layout and column names.
+        """
+        if self.probabilities is None:
+            self.compute_probabilities()
+        text, types = InternedChain._encode_vocabulary(self.vocabulary)
+        header = {'order':self.order, 'key_separator':self.key_separator, 'layout':self.layout, \
+                  'index_name':self.index_name, 'column_names':list(self.column_names)}
+        columns = self.columns if self.columns is not None else np.array([], dtype=np.int32)
+        positions = self.positions if self.positions is not None else np.array([], dtype=np.int64)
+        with open(filename, 'wb') as f:
+            np.savez(f, header=np.array(json.dumps(header)), vocabulary=text, vocabulary_types=types, \
+                     states=self.states, indptr=self.transitions.indptr, indices=self.transitions.indices, \
+                     counts=self.transitions.data, probabilities=self.probabilities, columns=columns, positions=positions)
+        return True
+
+    @staticmethod
+    def _load_arrays(filename:str, mmap_mode='r') -> dict:
+        """Loads the arrays of an .npz file, memory mapping the ones stored uncompressed
+
+        numpy.load() ignores mmap_mode for .npz files, so the offset of each array's data
+        within the zip archive is found here and the data mapped with numpy.memmap.
+        """
+        arrays = {}
+        with zipfile.ZipFile(filename) as zf, open(filename, 'rb') as f:
+            for info in zf.infolist():
+                name = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+                if mmap_mode is None or info.compress_type != zipfile.ZIP_STORED:
+                    with zf.open(info) as member:
+                        arrays[name] = np.lib.format.read_array(member, allow_pickle=False)
+                    continue
+                f.seek(info.header_offset + 26)     # file name and extra field lengths in the local file header
+                name_length, extra_length = struct.unpack('<HH', f.read(4))
+                f.seek(info.header_offset + 30 + name_length + extra_length)
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+                else:
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+                if int(np.prod(shape)) == 0 or len(shape) == 0:
+                    arrays[name] = np.lib.format.read_array(zf.open(info), allow_pickle=False)
+                else:
+                    arrays[name] = np.memmap(filename, dtype=dtype, mode=mmap_mode, offset=f.tell(), shape=shape, \
+                                             order='F' if fortran_order else 'C')
+        return arrays
+
+    @staticmethod
+    def load(filename:str, mmap_mode='r') -> 'InternedChain':
+        """Loads an InternedChain saved with save()
+
+        Parameters:
+            filename - the .npz file name
+            mmap_mode - the numpy.memmap mode, default is 'r' (read-only). None reads the arrays into memory
+        """
+        arrays = InternedChain._load_arrays(filename, mmap_mode)
+        header = json.loads(str(arrays['header']))
+        vocabulary = arrays['vocabulary']
+        if np.asarray(arrays['vocabulary_types']).any():     # a str vocabulary is used as is
+            vocabulary = InternedChain._decode_vocabulary(vocabulary, arrays['vocabulary_types'])
+        counts = arrays['counts']
+        transitions = sparse.csr_matrix((counts, arrays['indices'], arrays['indptr']), \
+                                        shape=(arrays['states'].shape[0], len(vocabulary)), copy=False)
+        columns = arrays['columns'] if header['layout'] == 'wide' else None
+        positions = arrays.get('positions')     # not in files saved before the row order was kept
+        if positions is not None and len(positions) == 0:
+            positions = None
+        interned = InternedChain(vocabulary, arrays['states'], transitions, header['order'], \
+                                 key_separator=header['key_separator'], layout=header['layout'], columns=columns, \
+                                 index_name=header['index_name'], column_names=tuple(header['column_names']), positions=positions)
+        interned.probabilities = arrays['probabilities']
+        return interned
+
+    def memory_usage(self) -> int:
+        """Approximate number of bytes used by the arrays, not including the token objects themselves
+
+        """
+        nbytes = self.vocabulary.nbytes + self.states.nbytes
+        nbytes += self.transitions.data.nbytes + self.transitions.indices.nbytes + self.transitions.indptr.nbytes
+        if self.positions is not None:
+            nbytes += self.positions.nbytes
+        return nbytes
+
+class InternedKeys(Sequence):
+    """A read-only sequence of the keys of some or all of the states of an InternedChain.
+
+    A key is joined from its tokens when it is used, so a large chain loaded from a file
+    doesn't create a str for every key. get() and the in operator find the position of a key.
+    """
+
+    def __init__(self, interned:InternedChain, states:np.ndarray=None):
+        self.interned = interned
+        self.states = np.arange(interned.states.shape[0]) if states is None else np.asarray(states, dtype=np.int64)
+
+    def __repr__(self):
+        return f"InternedKeys keys={len(self.states)}"
+
+    def __len__(self):
+        return len(self.states)
+
+    def __getitem__(self, i):
+        return self.interned.get_key(int(self.states[i]))
+
+    def __iter__(self):
+        for state in self.states.tolist():
+            yield self.interned.get_key(state)
+
+    def get(self, akey, default=None):
+        """Returns the position of a key in this sequence, default if not present
+
+        """
+        state = self.interned.get_state(akey)
+        if state is None:
+            return default
+        pos = int(np.searchsorted(self.states, state))      # the states are in increasing order
+        if pos < len(self.states) and self.states[pos] == state:
+            return pos
+        return default
+
+    def __contains__(self, akey):
+        return self.get(akey) is not None
+
+if __name__ == '__main__':
+    print(InternedChain.__doc__)
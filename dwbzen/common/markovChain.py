@@ -22,10 +22,11 @@
 '''
 
 import pandas as pd
+from common.internedChain import InternedChain
 
 class MarkovChain(object):
 
-    def __init__(self, state_size, counts_df:pd.DataFrame, keys=None, chain_df:pd.DataFrame=None, myname:str=None):
+    def __init__(self, state_size, counts_df:pd.DataFrame, keys=None, chain_df:pd.DataFrame=None, myname:str=None, interned:InternedChain=None):
         """Create and initialize a MarkovChain from a DataFrame or dict
         
         Either chain_df or chain_dict must be not None.
@@ -35,16 +36,53 @@ class MarkovChain(object):
             chain_df - if not None, an existing chain DataFrame
             keys - keys to use. If None, keys are derived from counts_df 'key' column.
             myname - optional name to use when saving
+            interned - an InternedChain of counts. If not None counts_df and chain_df are created from it when first used
         """
         self.order = state_size
         self.counts_df = counts_df
         self.name = myname          # used when persisting to CSV, Excel, or JSON
         self._keys = keys
+        self.interned = interned    # the InternedChain this was created from, if any
         self.chain_df = chain_df
-        if chain_df is None:
+        if chain_df is None and interned is None:
             self._create_chain()        # create the chain_df DataFrame from the counts_df DataFrame
-        else:
-            self.chain_df = chain_df    # an existing chain_df is provided
+    
+    @property
+    def counts_df(self) -> pd.DataFrame:
+        """The counts DataFrame. For a MarkovChain created from an InternedChain this is created when first used
+
+        """
+        if self._counts_df is None and self.interned is not None:
+            self._counts_df = self.interned.to_dataframe()
+        return self._counts_df
+    
+    @counts_df.setter
+    def counts_df(self, counts_df:pd.DataFrame):
+        self._counts_df = counts_df
+    
+    @property
+    def chain_df(self) -> pd.DataFrame:
+        """The chain DataFrame. For a MarkovChain created from an InternedChain this is created when first used
+
+        For the wide (music) layout the chain_df probabilities are the counts normalized by row.
+        If the InternedChain has probabilities, as when loaded from an .npz file, they are used as is.
+        """
+        if self._chain_df is None and self.interned is not None:
+            interned = self.interned
+            if interned.layout == 'wide':
+                if interned.probabilities is not None:
+                    self._chain_df = interned.to_dataframe(values=interned.probabilities)
+                else:
+                    self._chain_df = self.counts_df.div(self.counts_df.sum(axis=1), axis=0)
+            elif interned.probabilities is not None:
+                self._chain_df = self.counts_df.assign(prob=interned.get_row_values(interned.probabilities))
+            else:
+                self._create_chain()
+        return self._chain_df
+    
+    @chain_df.setter
+    def chain_df(self, chain_df:pd.DataFrame):
+        self._chain_df = chain_df
 
     
     def __repr__(self, *args, **kwargs):
@@ -56,16 +94,44 @@ class MarkovChain(object):
     def _create_chain(self):
         if self._keys is None:
             self._keys = set(self.counts_df['key'].values.tolist())
+        self.chain_df = MarkovChain.compute_probabilities(self.counts_df, self._keys)
+
+    @staticmethod
+    def compute_probabilities(counts_df:pd.DataFrame, keys=None) -> pd.DataFrame:
+        """Computes the cumulative probabilities of a counts DataFrame in a single pass
         
-        for akey in self._keys:
-            key_df = self.counts_df[self.counts_df['key'] ==  akey]
-            s = (key_df['count']/key_df['count'].sum()).cumsum()
-            model = key_df.assign(prob=s )
-            if self.chain_df is None:
-                self.chain_df = pd.DataFrame(model)
-            else:
-                self.chain_df = pd.concat([self.chain_df, model], ignore_index= True)
+        The counts are normalized and summed within each key with a groupby,
+        so the cost is linear in the number of counts_df rows regardless of the number of keys.
+        Rows retain their order in counts_df.
+        Parameters:
+            counts_df - a counts DataFrame having 'key' and 'count' columns
+            keys - an iterable of keys to include. If None, all the keys in counts_df are used.
+        Returns:
+            a new DataFrame with the counts_df columns plus the cumulative probability column 'prob'
+        """
+        key_df = counts_df
+        if keys is not None:
+            key_df = counts_df[counts_df['key'].isin(keys)]
+        grouped = key_df.groupby('key', sort=False)['count']
+        probs = key_df['count'] / grouped.transform('sum')
+        return key_df.assign(prob=probs.groupby(key_df['key'], sort=False).cumsum()).reset_index(drop=True)
+
+    def intern(self, key_separator=' ') -> InternedChain:
+        """Creates an InternedChain from the counts_df DataFrame
         
+        Parameters:
+            key_separator - the str that joins the tokens of a key, for example ' ' for word keys, ',' for music keys
+        """
+        return InternedChain.from_dataframe(self.counts_df, self.order, key_separator=key_separator)
+    
+    @staticmethod
+    def from_interned(interned:InternedChain, myname:str=None) -> 'MarkovChain':
+        """Creates a MarkovChain from an InternedChain of counts
+        
+        The counts_df and chain_df DataFrames are created only if they are used.
+        Producers sample from the InternedChain arrays with ChainSampler.from_interned().
+        """
+        return MarkovChain(interned.order, None, myname=myname, interned=interned)
 
     def get_rows(self, key) -> pd.DataFrame:
         """Returns the rows of the chain DataFrame for a given key
@@ -10,18 +10,31 @@
 # License:      BSD, see license.txt
 # ------------------------------------------------------------------------------
 
-import random
+import random, time
+import numpy as np
 from common.markovChain import MarkovChain
+from common.chainSampler import ChainSampler
+from common.aliasSampler import AliasSampler
+from common.internedChain import InternedChain, InternedKeys
+from common.backoffChain import BackoffChain, BackoffSampler
 from common.collectorProducer import CollectorProducer
 import pandas as pd
 
 class Producer(CollectorProducer):
     
+    sampling_engines = ['cumulative', 'alias']
+    
     def __init__(self, state_size, markovChain:MarkovChain, source=None, min_size=0, max_size=0, num=20, verbose=0, domain='text', rand_seed=None):
         
         super().__init__(state_size, verbose=verbose, source=source, domain=domain)
         
-        self.markovChain = markovChain        # a MarkovChain instance, provided by a ProducerRunner
+        self.backoffChain = None
+        if isinstance(markovChain, BackoffChain):
+            self.backoffChain = markovChain     # the producer's order chain is used for seeds, the BackoffChain to sample
+            markovChain = markovChain.to_markov_chain(state_size)
+        if isinstance(markovChain, InternedChain):
+            markovChain = MarkovChain.from_interned(markovChain)
+        self.markovChain = markovChain        # a MarkovChain, InternedChain or BackoffChain instance, provided by a ProducerRunner
         self.min_size = min_size
         self.max_size = max_size
         self.num = num      # units defined in Producer subclass
@@ -30,9 +43,15 @@ class Producer(CollectorProducer):
         self.seed=None
         self.sort=None
         self.initial=True
-        self.chain_df = self.markovChain.chain_df
-        self.counts_df = self.markovChain.counts_df
+        if self.markovChain.interned is None:     # the DataFrames of an InternedChain are created only if used
+            self.chain_df = self.markovChain.chain_df
+            self.counts_df = self.markovChain.counts_df
         self.chain_updated = False
+        self.sampler = None     # a ChainSampler, created by compile_sampler() in derived classes that use one
+        self.sampling_engine = 'cumulative'     # 'cumulative' (binary search) or 'alias' (Walker/Vose alias tables), see set_sampling_engine()
+        self.batch_stats = None     # throughput of the last produce_batch()
+        self._successors = None     # the sampler state that follows each sampler row, -1 if none
+        self._terminal_rows = None  # True for sampler rows whose token ends an item
         
         #
         # initial keys and all keys
@@ -54,13 +73,41 @@ class Producer(CollectorProducer):
         return f"Producer {self.order}"
     
     def _add_key(self, key):
-        key_df = self.counts_df[self.counts_df['key']==key]
-        s = (key_df['count']/key_df['count'].sum()).cumsum()
-        key_df = key_df.assign(prob=s )
+        key_df = MarkovChain.compute_probabilities(self.counts_df, [key])
         self.chain_df = pd.concat([self.chain_df, key_df], ignore_index= True)
         self.chain_updated = True   # this will trigger a save
         return key_df
     
+    def compile_sampler(self) -> ChainSampler:
+        """Creates the ChainSampler used to pick the next token from the MarkovChain
+        
+        If the producer was created with a BackoffChain, the sampler is a BackoffSampler
+        that picks the next token of an unseen key from its longest matching suffix.
+        Otherwise the sampling_engine determines the sampler: a ChainSampler for 'cumulative', an AliasSampler for 'alias'.
+        """
+        if self.backoffChain is not None:
+            self.sampler = self.backoffChain.get_sampler(self.order)
+        else:
+            self.sampler = ChainSampler.from_markov_chain(self.markovChain)
+            if self.sampling_engine == 'alias':
+                self.sampler = AliasSampler.from_sampler(self.sampler)
+        if self.verbose > 1:
+            print(self.sampler)
+        return self.sampler
+    
+    def set_sampling_engine(self, engine:str) -> ChainSampler:
+        """Sets the sampling engine and compiles the sampler
+        
+        Parameters:
+            engine - 'cumulative' to binary search the cumulative probabilities of a key,
+                     'alias' to use precomputed alias tables, a constant time pick regardless of the number of next tokens
+        """
+        if engine not in Producer.sampling_engines:
+            raise ValueError(f"Invalid sampling engine '{engine}', must be one of {Producer.sampling_engines}")
+        self.sampling_engine = engine
+        self._successors = None
+        return self.compile_sampler()
+    
     def get_seed(self):  # override in derived class
         return None
     
@@ -85,6 +132,112 @@ class Producer(CollectorProducer):
         """
         return None
 
+    def next_seed(self, seed, next_token):   # override in derived class
+        """Returns the seed that follows a seed and its next token
+        
+        """
+        return None
+    
+    def is_terminal(self, token) -> bool:   # override in derived class
+        """Returns True if the token ends the item being produced
+        
+        """
+        return False
+    
+    def get_batch_max_steps(self) -> int:   # override in derived class
+        """Returns the maximum number of tokens produce_batch() draws for a single item
+        
+        """
+        return self.max_size
+    
+    def make_batch_item(self, seed, tokens):   # override in derived class
+        """Creates an item from a starting seed and the tokens drawn for it by produce_batch()
+        
+        Returns None if the tokens do not make an acceptable item.
+        """
+        return None
+    
+    def _compile_successors(self):
+        """For every row of the sampler, the state id of next_seed(key, token) and whether the token is terminal
+        
+        This is done once, so produce_batch() advances walks with array lookups only.
+        """
+        if self.sampler is None:
+            self.compile_sampler()
+        keys = self.sampler.keys
+        row_states = self.sampler.get_row_states()
+        tokens = self.sampler.tokens
+        next_seed = self.sampler.next_key if isinstance(self.sampler, BackoffSampler) else self.next_seed
+        self._successors = np.array([self.sampler.get_state(next_seed(keys[row_states[j]], tokens[j])) for j in range(len(tokens))], dtype=np.int64)
+        self._terminal_rows = np.array([self.is_terminal(t) for t in tokens], dtype=bool)
+    
+    def _walk(self, states:np.ndarray, rng:np.random.Generator) -> np.ndarray:
+        """Advances independent walks from the given start states until each reaches a terminal token,
+        a state with no next token, or the maximum number of steps.
+        
+        Returns:
+            an int array of sampler rows, shape (max_steps, number of walks), -1 after a walk ends
+        """
+        max_steps = self.get_batch_max_steps()
+        rows = np.full((max_steps, len(states)), -1, dtype=np.int64)
+        current = states.copy()
+        active = np.arange(len(states))
+        for step in range(max_steps):
+            if len(active) == 0:
+                break
+            step_rows = self.sampler.sample_rows(current[active], rng.random(len(active)))
+            rows[step, active] = step_rows
+            successors = self._successors[step_rows]
+            current[active] = successors
+            active = active[~(self._terminal_rows[step_rows] | (successors < 0))]
+        return rows
+    
+    def produce_batch(self, n:int, rand_seed=None, max_rounds=10) -> list:
+        """Produce n items by advancing n independent walks through the MarkovChain together.
+        
+        Each step samples the next token for all the active walks at once using a NumPy Generator
+        and the compiled ChainSampler, so the per-token cost is array operations instead of Python lookups.
+        Derived classes define the items by overriding next_seed(), is_terminal(), get_batch_max_steps() and make_batch_item().
+        Parameters:
+            n - the number of items to produce
+            rand_seed - seed for the NumPy random Generator. If None, fresh entropy is used
+            max_rounds - walks that don't make an acceptable item are replaced, for up to max_rounds rounds
+        Returns:
+            a list of up to n items. The throughput (items/sec) is saved in self.batch_stats
+        """
+        start_time = time.perf_counter()
+        rng = np.random.default_rng(rand_seed)
+        if self._successors is None:
+            self._compile_successors()
+        if self.seed is not None and self.seed in self.sampler:
+            start_states = self.sampler.get_states([self.seed])
+        else:
+            keys = self._initial_keys if self.initial else self._keys
+            if isinstance(keys, InternedKeys) and keys.interned is self.markovChain.interned and self.backoffChain is None:
+                start_states = keys.states      # the sampler states are the InternedChain states
+            else:
+                start_states = self.sampler.get_states(keys)
+            start_states = start_states[start_states >= 0]
+        
+        items = []
+        rounds = 0
+        while len(items) < n and rounds < max_rounds and len(start_states) > 0:
+            states = start_states[rng.integers(0, len(start_states), size=n-len(items))]
+            rows = self._walk(states, rng)
+            for i in range(len(states)):
+                walk_rows = rows[:, i]
+                item = self.make_batch_item(self.sampler.keys[states[i]], self.sampler.tokens[walk_rows[walk_rows >= 0]])
+                if item is not None:
+                    items.append(item)
+            rounds = rounds + 1
+        
+        elapsed = time.perf_counter() - start_time
+        items_per_sec = len(items)/elapsed if elapsed > 0 else float('inf')
+        self.batch_stats = {'items':len(items), 'seconds':elapsed, 'items_per_sec':items_per_sec}
+        if self.verbose > 0:
+            print(f"produced {len(items)} items in {elapsed:.3f} seconds, {items_per_sec:.1f} items/sec")
+        return items
+
     def save(self):
         save_result = super().save()
         return save_result
@@ -21,22 +21,29 @@ class SentenceProducer(Producer):
         self.initial=False
         self.pos=False
 
-        self.terminal_characters = '.?!'   # needs to match the WordCollector terminal_characters
+        self.terminal_characters = {'.', '?', '!'}   # needs to match the WordCollector terminal_characters
+        self.key_separator = ' '
         self.output_format = 'TC'          # title case, can also do UC = upper case, LC = lower case
 
         self._set_keys()
+        self.compile_sampler()
     
     def __str__(self):
         return f"SentenceProducer order={self.order} verbose={self.verbose}, source={self.source}, min/max={self.min_size},{self.max_size} seed={self.seed}, num={self.num}"
 
     def _set_keys(self):
         prefix = TextParser._prefix
-        self._initial_keys_df = self.counts_df[ [x.startswith(prefix) for x in self.counts_df['key']] ]
-        #
-        # initiial_keys and keys are both sets and so the values are unique
-        #
-        self._initial_keys = list(set(self._initial_keys_df['key'].values.tolist()))
-        self._keys = list(set(self.counts_df['key'].values.tolist()))
+        interned = self.markovChain.interned
+        if interned is not None:    # the keys of an InternedChain are joined only when used
+            self._initial_keys = interned.get_key_sequence(interned.get_states_with_prefix(prefix))
+            self._keys = interned.get_key_sequence()
+        else:
+            self._initial_keys_df = self.counts_df[ [x.startswith(prefix) for x in self.counts_df['key']] ]
+            #
+            # initiial_keys and keys are both sets and so the values are unique
+            #
+            self._initial_keys = list(set(self._initial_keys_df['key'].values.tolist()))
+            self._keys = list(set(self.counts_df['key'].values.tolist()))
         if self.verbose > 0:
             print(f'total number of keys: {len(self._keys)}')
             print(f'number of initial keys: {len(self._initial_keys)}')
@@ -68,26 +75,29 @@ class SentenceProducer(Producer):
         if self.verbose > 2:
             print(f"get_next_word(seed): '{seed}'")
 
-        if seed in self._keys:
-            df = self.chain_df[self.chain_df['key']==seed]
-            if len(df) == 0:  #  add to chain_df from counts_df
-                df = self._add_key(seed)
-    
-            # given a probability, pick the first word in the row_probs (cumulative probabilities)
-            # having a probability > the random probability
-            # for example:
+        if seed in self.sampler:
+            # given a probability, pick the first word having a cumulative probability > the random probability
             prob = random.random()
-            row = df[df['prob']>prob].iloc[0]
-            next_token = row['word'].lstrip()
+            row = self.sampler.sample(seed, prob)
+            next_token = row['next_token'].lstrip()
             p = row['prob']
             
-            new_seed = ' '.join(((seed + ' ' + next_token).split())[1:self.order+1])
+            new_seed = self.next_seed(seed, next_token)
             if self.verbose > 1:
                 print(f"random prob: {prob}, row prob: {p}, seed: '{seed}', next_token: '{next_token}', new_seed: '{new_seed}'")
                 
         return dict([ ('next_token', next_token), ('new_seed',new_seed)])
 
-    def add_sentence_to_set(self, sentence_set, asentence):
+    def next_seed(self, seed, next_token):
+        return ' '.join(((seed + ' ' + next_token.lstrip()).split())[1:self.order+1])
+    
+    def is_terminal(self, token) -> bool:
+        return token.lstrip() in self.terminal_characters
+    
+    def get_batch_max_steps(self) -> int:
+        return max(self.max_size - self.order, 1)
+    
+    def format_sentence(self, asentence):
         if self.output_format == 'TC':
             #
             # capitalize the first letter of the sentence
@@ -97,8 +107,27 @@ class SentenceProducer(Producer):
             asentence = asentence.lower()
         elif self.output_format == 'UC':
             asentence = asentence.upper()
-        else:
-            pass
+        return asentence
+    
+    def make_batch_item(self, seed, tokens):
+        """Creates a sentence from a seed and the words drawn by produce_batch()
+        
+        Follows the rules of produce(): the sentence ends at a terminal word, or with a period
+        when it reaches max_size words or there is no next word.
+        """
+        sentence = seed.strip()
+        nwords = self.order
+        for token in tokens:
+            if self.is_terminal(token):
+                return self.format_sentence(sentence)
+            sentence = f'{sentence} {token.lstrip()}'
+            nwords+=1
+            if nwords >= self.max_size:
+                break
+        return self.format_sentence(sentence + '.')
+
+    def add_sentence_to_set(self, sentence_set, asentence):
+        asentence = self.format_sentence(asentence)
         sentence_set.add(asentence)
         
         if self.verbose > 1:
@@ -13,6 +13,8 @@
 from common.wordCollector import WordCollector
 from common.utils import Utils
 from common.markovChain import MarkovChain
+from common.internedChain import InternedChain
+from common.backoffChain import BackoffChain
 from common.sentenceProducer import SentenceProducer
 import argparse
 import pandas as pd
@@ -31,12 +33,14 @@ class SentenceProducerRunner(object):
         parser.add_argument("--name", help="Name of resulting MarkovChain, used to save to file", type=str, default="mychain")
         parser.add_argument("-r", "--remove_stop_words", help="remove common stop words", action="store_true", default=False)
         parser.add_argument("-p", "--processing_mode", help="specify words of sentences", choices=['words','sentences', 'lines'], default='sentences')
+        parser.add_argument("--stream", help="Read and count the source a line at a time", action="store_true", default=False)
+        parser.add_argument("--backoff", help="Use a BackoffChain that backs off to the longest matching key of a lower order", action="store_true", default=False)
 
         #
         # SentenceProducer arguments
         #
         parser.add_argument("-c", "--chainfile", help="Existing serialized MarkovChain file.",  type=str, default=None)
-        parser.add_argument("-f","--format", help="File input/output format. Default is csv", type=str, choices=['csv','json','xlsx'], default='csv' )
+        parser.add_argument("-f","--format", help="File input/output format. Default is csv", type=str, choices=['csv','json','xlsx','npz'], default='csv' )
 
         parser.add_argument("-n", "--num", help="Number of sentences to produce",  type=int, default=10)
         parser.add_argument("--min", help="Minimum length of sentences", type=int, choices=range(2,6), default=5)
@@ -49,6 +53,8 @@ class SentenceProducerRunner(object):
         parser.add_argument("--initial", help="choose initial seed only (start of word)", action="store_true", default=True)
         parser.add_argument("--recycle", help="How often to pick a new seed, default is pick a new seed after each sentence", type=int, default=1)
         parser.add_argument("--display", "-d", help="Display each word as it is produced", action="store_true", default=True)
+        parser.add_argument("--batch", "-b", help="Produce this many sentences in a single vectorized batch instead of one at a time", type=int, default=None)
+        parser.add_argument("--engine", help="Sampling engine: cumulative (binary search) or alias (constant time alias tables). Default is cumulative", type=str, choices=['cumulative','alias'], default='cumulative')
         args = parser.parse_args()
         
         markovChain = None
@@ -65,6 +71,8 @@ class SentenceProducerRunner(object):
             collector.name = args.name
             collector.format = args.format
             collector.processing_mode = args.processing_mode
+            collector.streaming = args.stream
+            collector.backoff = args.backoff
             if args.verbose > 0:
                 print(collector.__repr__())
         
@@ -73,6 +81,8 @@ class SentenceProducerRunner(object):
                 print(f"MarkovChain written to file: {collector.filename}")
             
             markovChain = collector.markovChain
+            if args.backoff:
+                markovChain = collector.backoffChain
 
         else:
             # use serialized MarkovChain file  and counts file in specified format
@@ -80,6 +90,8 @@ class SentenceProducerRunner(object):
             #
             order_string = '_0{}'.format(order)
             chain_filename = f'{args.chainfile}_wordsChain{order_string}.{args.format}'
+            if args.backoff:    # the BackoffChain file holds the counts of every order
+                chain_filename = f'{args.chainfile}_wordsBackoff{order_string}.npz'
             counts_filename = f'{args.chainfile}_wordCounts{order_string}.{args.format}'
             
             chain_file_info = Utils.get_file_info(chain_filename)
@@ -95,7 +107,9 @@ class SentenceProducerRunner(object):
                 print(f"{chain_path} does not exist")
                 exit()
             else:
-                if ext=='json':
+                if args.backoff:
+                    markovChain = BackoffChain.load(chain_path)
+                elif ext=='json':
                     chain_df = pd.read_json(chain_path, orient="index")
                     counts_df = pd.read_json(counts_path, orient="index")
                     markovChain = MarkovChain(order, counts_df, chain_df=chain_df)
@@ -105,6 +119,8 @@ class SentenceProducerRunner(object):
                     markovChain = MarkovChain(order, counts_df, chain_df=chain_df)
                 elif ext=='xlsx':
                     pass        # TODO
+                elif ext=='npz':     # binary chain file, counts and probabilities in one memory mapped file
+                    markovChain = InternedChain.load(chain_path)
         
         if args.verbose > 0:
             print('run SentenceProducer')
@@ -118,10 +134,17 @@ class SentenceProducerRunner(object):
         sentenceProducer.seed = args.seed   # the initial starting seed, could be None
         sentenceProducer.postprocessing = args.postprocessing
         sentenceProducer.recycle_seed_count = args.recycle
+        if args.engine != 'cumulative':
+            sentenceProducer.set_sampling_engine(args.engine)
         sentenceProducer.display_as_produced = display_as_produced
-        sentences = sentenceProducer.produce()
-        
-        if not display_as_produced:
+        if args.batch is not None:
+            sentences = sentenceProducer.produce_batch(args.batch)
             for s in sentences: print(f'{s}')
+            print(f"{sentenceProducer.batch_stats['items']} sentences, {sentenceProducer.batch_stats['items_per_sec']:.1f} sentences/sec")
+        else:
+            sentences = sentenceProducer.produce()
+            
+            if not display_as_produced:
+                for s in sentences: print(f'{s}')
 
     
\ No newline at end of file
@@ -2,6 +2,8 @@
 import pandas as pd
 import string
 import argparse
+from collections import Counter
+from itertools import islice
 from markovify import split_into_sentences
 from nltk.corpus import stopwords
 from nltk import word_tokenize
@@ -13,6 +15,10 @@ class TextParser(object):
     
     Dependencies: This uses NLTK corpus for stop words, and markovify for splitting lines into sentences.
         pip install nltk markovify pandas
+    
+    If stream is True the source file is not read when the TextParser is created.
+    Instead iter_words() reads it a line at a time and yields the words of each line,
+    so only the word counts are kept in memory, not the text itself.
         
     TODO Known issues:
         * support treating double quote and sentence terminators (.!?)  as a words instead of punctuation.
@@ -27,7 +33,7 @@ class TextParser(object):
     
     _prefix = ' '  # prefix for the initial word of a sentence or line
 
-    def __init__(self, txt = None, source = None, maxlines=None, ignore_case=True, remove_stop_words=False):
+    def __init__(self, txt = None, source = None, maxlines=None, ignore_case=True, remove_stop_words=False, stream=False):
         self._words = []        # words in order of appearance. Does not include stop words if remove_stop_words is True
         self._all_words = []    # words in order of appearance including stop words
         self._sentence_words = []    # words in sentence order with initial word of each sentence prefixed with a space
@@ -36,7 +42,7 @@ class TextParser(object):
         self._sentences = []
         self._word_set = None
         self._nlines = 0
-        self._word_counts = {}
+        self._word_counts = Counter()
         self._maxlines = maxlines
         self.counts_df = None
         self.verbose = 0
@@ -47,7 +53,11 @@ class TextParser(object):
         self.replace_utf_punctuation = True      # replace UTF-8 single, double quotation marks with ' and " respectively
         self.treat_dblquotes_as_words = True    # if true treat " as a word (instead of a quote)
         self.initial_word_prefix = TextParser._prefix
+        self.stream = stream
+        self.line_range = None      # optional (start, stop) line numbers read by iter_lines()
 
+        if stream:
+            return      # the source is read by iter_words()
         if source is not None:
             fp = open(source, "r")
             self.text = fp.read()
@@ -114,20 +124,48 @@ class TextParser(object):
         if self._line_words is None:
             self._line_words = []
             for line in self._lines:
-                s_rempunc = TextParser.remove_punctuation(line)
-                words = s_rempunc.split(' ')
-                line_words = []
-                if self._ignore_case:
-                    line_words = [str.lower(w) for w in words if len(w) > 0]
-                else:
-                    line_words = [w for w in words if len(w) > 0]
-                    
-                if len(line_words) > 0:
-                    line_words[0] = self.initial_word_prefix + line_words[0]
-                    self._line_words += line_words          
+                self._line_words += self._parse_line_words(line)
                         
         return self._line_words
     
+    def _parse_line_words(self, line) -> list:
+        """Returns the words of a line with the initial word prefixed
+        
+        """
+        s_rempunc = TextParser.remove_punctuation(line)
+        words = s_rempunc.split(' ')
+        line_words = []
+        if self._ignore_case:
+            line_words = [str.lower(w) for w in words if len(w) > 0]
+        else:
+            line_words = [w for w in words if len(w) > 0]
+            
+        if len(line_words) > 0:
+            line_words[0] = self.initial_word_prefix + line_words[0]
+        return line_words
+    
+    def _parse_sentence(self, s) -> (list, list):
+        """Returns all the words of a sentence (lower case) and the sentence words
+        
+        The sentence words do not include stop words if remove_stop_words is True,
+        and are lower case if ignore_case is True. The initial word is not prefixed.
+        """
+        s_rempunc = TextParser.remove_punctuation(s)
+        words = s_rempunc.split(' ')
+        allwords = [str.lower(w) for w in words if len(w) > 0]
+        sentence_words = []
+        if self._remove_stop_words:
+            if self._ignore_case:
+                sentence_words = [str.lower(w) for w in words if len(w) > 0 and w.lower() not in TextParser._sw ]
+            else:
+                sentence_words = [w for w in words if len(w) > 0 and w.lower() not in TextParser._sw ]
+        else:
+            if self._ignore_case:
+                sentence_words = [str.lower(w) for w in words if len(w) > 0]
+            else:
+                sentence_words = [w for w in words if len(w) > 0]
+        return allwords, sentence_words
+    
     def get_lines(self):
         return self._lines
     
@@ -143,12 +181,11 @@ class TextParser(object):
         return self._word_set
     
     def _set_word_set(self):
-        self._word_set = set(self._words)
+        self._word_set = set(self._words) if len(self._words) > 0 else set(self._word_counts.keys())
     
     def _set_word_counts(self, sort_counts=False, reverse=False):
         if len(self._word_counts) == 0:
-            for w in self._word_set:
-                self._word_counts |= {w:self._words.count(w)}
+            self._word_counts = Counter(self._words)
         if sort_counts:
             self._word_counts = dict(sorted(self._word_counts.items(), key=lambda item: item[1], reverse=reverse))
         self.counts_df = pd.DataFrame(data=self._word_counts.items(), columns=['word','count'])
@@ -169,21 +206,8 @@ class TextParser(object):
                 print(f'line {self.nlines}: {l}')
             ls = split_into_sentences(l)
             for s in ls:
-                s_rempunc = TextParser.remove_punctuation(s)
-                words = s_rempunc.split(' ')
-                allwords = [str.lower(w) for w in words if len(w) > 0]
+                allwords, sentence_words = self._parse_sentence(s)
                 self._all_words += allwords
-                sentence_words = []
-                if self._remove_stop_words:
-                    if self._ignore_case:
-                        sentence_words = [str.lower(w) for w in words if len(w) > 0 and w.lower() not in TextParser._sw ]
-                    else:
-                        sentence_words = [w for w in words if len(w) > 0 and w.lower() not in TextParser._sw ]
-                else:
-                    if self._ignore_case:
-                        sentence_words = [str.lower(w) for w in words if len(w) > 0]
-                    else:
-                        sentence_words = [w for w in words if len(w) > 0]
                 self._words += sentence_words
                 
                 if len(sentence_words) > 0:
@@ -195,6 +219,71 @@ class TextParser(object):
             self._nlines += 1
         self._set_word_set()
         return self._nlines
+    
+    @staticmethod
+    def get_line_ranges(source, nranges:int, maxlines=None) -> list:
+        """Splits the lines of a source file into nranges (start, stop) ranges of about the same number of lines
+        
+        """
+        with open(source, "rb") as fp:
+            nlines = sum(1 for _ in fp)
+        if maxlines is not None:
+            nlines = min(nlines, maxlines)
+        bounds = [round(i * nlines / nranges) for i in range(nranges + 1)]
+        return [(bounds[i], bounds[i+1]) for i in range(nranges) if bounds[i+1] > bounds[i]]
+    
+    def update_word_counts(self, word_counts:Counter):
+        """Adds word counts collected elsewhere, from another part of the source for example
+        
+        """
+        self._word_counts.update(word_counts)
+    
+    def iter_lines(self):
+        """Reads the source file or text one line at a time, up to maxlines lines
+        
+        If line_range is set only the lines in that range are read.
+        """
+        if self.source is not None:
+            fp = open(self.source, "r")
+        else:
+            fp = iter((self.text or '').splitlines())
+        lines = fp if self.line_range is None else islice(fp, self.line_range[0], self.line_range[1])
+        try:
+            for l in lines:
+                if self._maxlines is not None and self._nlines >= self._maxlines:
+                    break
+                l = l.rstrip('\r\n').replace('\t',' ')
+                if self.replace_utf_punctuation:
+                    l = TextParser.replace_utf8_punctuation(l)
+                self._nlines += 1
+                yield l
+        finally:
+            if self.source is not None:
+                fp.close()
+    
+    def iter_words(self, mode='sentences'):
+        """Yields the words of each line of the source in turn, without retaining the text
+        
+        The words yielded are the same as get_sentence_words(), get_line_words(),
+        get_words() or get_all_words() return for the whole text, one line at a time.
+        Word counts are accumulated as the lines are read.
+        Parameters:
+            mode - 'sentences', 'lines' or 'words'. In 'sentences' mode the initial word of each sentence
+                   is prefixed, in 'lines' mode the initial word of each line.
+        """
+        for l in self.iter_lines():
+            line_words = []
+            for s in split_into_sentences(l):
+                allwords, sentence_words = self._parse_sentence(s)
+                self._word_counts.update(sentence_words)
+                if mode == 'words':
+                    line_words += sentence_words if self._remove_stop_words else allwords
+                elif len(sentence_words) > 0:
+                    sentence_words[0] = self.initial_word_prefix + sentence_words[0]
+                    line_words += sentence_words
+            if mode == 'lines':
+                line_words = self._parse_line_words(l)
+            yield line_words
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
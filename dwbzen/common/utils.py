@@ -16,7 +16,7 @@ from datetime import datetime
 
 class Utils(object):
     
-    known_extensions = ['json', 'txt', 'mxl', 'xml', 'musicxml', 'csv']
+    known_extensions = ['json', 'txt', 'mxl', 'xml', 'musicxml', 'csv', 'npz']
 
     @staticmethod
     def get_file_info(cpath, def_extension='json'):
@@ -15,6 +15,8 @@
 
 from common.collector import Collector
 from common.textParser import TextParser
+from common.chainCounts import ChainCounts
+from common.backoffChain import BackoffChain
 import pandas as pd
 
 import re
@@ -38,6 +40,10 @@ class WordCollector(Collector):
     start of some unit - a sentence or line (which may have > 1 sentence).
     In 'words' collection mode, there are no initial keys - all the words treated equally.
     
+    If streaming is True the source file is read and counted a line at a time
+    so the memory used depends on the number of distinct keys, not the size of the source.
+    If workers is set, the source file is split into line ranges that are counted
+    in separate processes and merged, giving the same result as a serial collection.
 
     """
     
@@ -52,11 +58,14 @@ class WordCollector(Collector):
         self._remove_stop_words = remove_stop_words
         self._terminal_object = '~'
         self._initial_object = ' '
+        self.key_separator = ' '
         self._source = source
         self._words = None                  # words in order of appearance
+        self.streaming = False              # if True, count the source a line at a time
         
         self.countsFileName = '_wordCounts' + '_0{}'.format(state_size)
         self.chainFileName = '_wordsChain' + '_0{}'.format(state_size)
+        self.backoffFileName = '_wordsBackoff' + '_0{}'.format(state_size)
         
         self.words_re = re.compile(r'[,;: ]')    # regular expression to split a line into words
 
@@ -74,7 +83,7 @@ class WordCollector(Collector):
         Initial keys are prefixed by TextParser._prefix, which defaults to a space.
         
         """
-        word_keys =  [ (' '.join(words[i:i+self.order]), words[i+self.order]) for i in range(0, len(words)-2) ]
+        word_keys =  [ (' '.join(words[i:i+self.order]), words[i+self.order]) for i in range(0, len(words)-self.order) ]
         word_keys_df =  pd.DataFrame(data=word_keys, columns=['key','word'])
         words_ser = word_keys_df.value_counts(ascending=False)
         df = pd.DataFrame(words_ser, columns=['count'])
@@ -84,6 +93,54 @@ class WordCollector(Collector):
             
         return self.counts_df
 
+    def _process_word_stream(self, word_lists) -> pd.DataFrame:
+        """Streaming version of _process_words, counting the keys of each list of words as it arrives
+        
+        The words are added to a single ChainCounts sequence, so the keys
+        that span lines (and sentences) are counted the same as with _process_words.
+        """
+        counts = ChainCounts(self.order, self.key_separator)
+        for words in word_lists:
+            counts.add_sequence(words)
+        return self._set_counts(counts)
+    
+    def _set_counts(self, counts:ChainCounts) -> pd.DataFrame:
+        self.counts_df = counts.to_dataframe()
+        if self.sort_chain:
+            self.counts_df.sort_values(by=['key','word'], ignore_index=True, inplace=True)
+            
+        return self.counts_df
+
+    @staticmethod
+    def count_shard(shard) -> ChainCounts:
+        """Counts the keys in a range of source lines
+        
+        Parameters:
+            shard - a tuple of (source, (start, stop) line range, order, processing_mode, ignore_case, remove_stop_words)
+        Returns:
+            a ChainCounts with the word counts in token_counts
+        """
+        source, line_range, order, processing_mode, ignore_case, remove_stop_words = shard
+        text_parser = TextParser(source=source, ignore_case=ignore_case, remove_stop_words=remove_stop_words, stream=True)
+        text_parser.line_range = line_range
+        counts = ChainCounts(order, ' ')
+        for words in text_parser.iter_words(processing_mode):
+            counts.add_sequence(words)
+        counts.token_counts = text_parser._word_counts
+        return counts
+    
+    def get_shards(self) -> list:
+        line_ranges = TextParser.get_line_ranges(self._source, self.workers, self._maxlines)
+        return [(self._source, line_range, self.order, self.processing_mode, self.ignore_case, self._remove_stop_words) for line_range in line_ranges]
+
+    def set_update_source(self, source):
+        """update() collects the new material from a source file
+        
+        """
+        self._source = source
+        self.source = source
+        self.text = None
+    
     def _set_keys(self):
         prefix = self._text_parser.initial_word_prefix
         self._initial_keys_df = self.counts_df[ [x.startswith(prefix) for x in self.counts_df['key']] ]
@@ -97,16 +154,34 @@ class WordCollector(Collector):
             print(f'number of initial keys: {len(self._initial_keys)}')
     
     def collect(self):
+        sharded = self.workers is not None and self._source is not None and not self.backoff
+        streaming = self.streaming or sharded or self.backoff
         self._text_parser = TextParser(txt=self.text, source=self._source, \
                    maxlines=self._maxlines, ignore_case=self.ignore_case, \
-                   remove_stop_words=self._remove_stop_words)
+                   remove_stop_words=self._remove_stop_words, stream=streaming)
+        if self.backoff:
+            #
+            # the counts of every order up to self.order in one pass
+            #
+            self.backoffChain = BackoffChain(self.order, self.key_separator)
+            for words in self._text_parser.iter_words(self.processing_mode):
+                self.backoffChain.add_sequence(words)
+            self._set_counts(self.backoffChain.get_counts(self.order))
+        elif sharded:
+            counts = self.collect_shards(self.get_shards())
+            self._text_parser.update_word_counts(counts.token_counts)
+            self._set_counts(counts)
+        elif self.streaming:
+            self._process_word_stream(self._text_parser.iter_words(self.processing_mode))
         #
         # word counts are informational only
         #
         self.word_counts = self._text_parser.get_word_counts(sort_counts=True, reverse=True)
         self.words_df = self._text_parser.counts_df
                 
-        if self.processing_mode == 'words':
+        if streaming:
+            pass
+        elif self.processing_mode == 'words':
             self._collect_words()
         elif self.processing_mode == 'sentences':
             self._collect_sentences()
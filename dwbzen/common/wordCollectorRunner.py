@@ -26,11 +26,14 @@ class WordCollectorRunner(object):
         parser.add_argument("-v","--verbose", help="increase output verbosity", action="count", default=0)
         parser.add_argument("-i","--ignoreCase", help="ignore input case", action="store_true", default=False)
         parser.add_argument("-n","--name", help="Name of resulting MarkovChain, used to save to file", type=str, default="mychain")
-        parser.add_argument("-f","--format", help="Save output format. Default is csv", type=str, choices=['csv','json','xlsx'], default='csv' )
+        parser.add_argument("-f","--format", help="Save output format. Default is csv", type=str, choices=['csv','json','xlsx','npz'], default='csv' )
         parser.add_argument("--sort", help="Sort resulting MarkovChain ascending on both axes", action="store_true", default=False)
+        parser.add_argument("--workers", "-w", help="Number of worker processes to collect with, default is to collect serially", type=int, default=None)
         parser.add_argument("-d","--display", help="display resulting MarkovChain in json or cvs format",type=str, choices=['csv','json','chain'] ) 
         parser.add_argument("-r", "--remove_stop_words", help="remove common stop words", action="store_true", default=False)
         parser.add_argument("-p", "--processing_mode", help="specify words of sentences", choices=['words','sentences', 'lines'], default='sentences')
+        parser.add_argument("--stream", help="Read and count the source a line at a time", action="store_true", default=False)
+        parser.add_argument("--backoff", help="Also collect a BackoffChain of orders 0 through order, saved as a single .npz file", action="store_true", default=False)
         args = parser.parse_args()
         
         if args.verbose > 0:
@@ -41,7 +44,10 @@ class WordCollectorRunner(object):
         collector.name = args.name
         collector.format = args.format
         collector.sort_chain = args.sort
+        collector.workers = args.workers
         collector.processing_mode = args.processing_mode
+        collector.streaming = args.stream
+        collector.backoff = args.backoff
         if args.verbose > 0:
             print(collector.__repr__())
     
@@ -23,8 +23,10 @@ class WordProducer(Producer):
 
         self.terminal_object = '~'
         self.initial_object = ' '
+        self.key_separator = ''
         self.output_format = 'TC'   # title case, can also do UC = upper case, LC = lower case
         self._set_keys()
+        self.compile_sampler()
     
     def __str__(self):
         return f"WordProducer order={self.order} verbose={self.verbose}, source={self.source}, min/max={self.min_size},{self.max_size} seed={self.seed}, num={self.num}"
@@ -33,13 +35,18 @@ class WordProducer(Producer):
         """Create the keys
         
         Creates the set of initial keys (_initial_keys) and all keys (_keys)
-        from the counts_df DataFrame
+        from the counts_df DataFrame, or the states of an InternedChain without joining the keys
         """
         prefix = self.initial_object
-        self._initial_keys_df = self.counts_df[ [x.startswith(prefix) for x in self.counts_df['key']] ]
-        self._initial_keys = list(set(self._initial_keys_df['key'].values.tolist()))
-        
-        self._keys = list(set(self.counts_df['key'].values.tolist()))
+        interned = self.markovChain.interned
+        if interned is not None:
+            self._initial_keys = interned.get_key_sequence(interned.get_states_with_prefix(prefix))
+            self._keys = interned.get_key_sequence()
+        else:
+            self._initial_keys_df = self.counts_df[ [x.startswith(prefix) for x in self.counts_df['key']] ]
+            self._initial_keys = list(set(self._initial_keys_df['key'].values.tolist()))
+            
+            self._keys = list(set(self.counts_df['key'].values.tolist()))
 
         if self.verbose > 1:
             print(f'total number of keys: {len(self._keys)}')
@@ -71,23 +78,13 @@ class WordProducer(Producer):
         if self.verbose > 2:
             print(f"get_next_character(seed): '{seed}'")
             
-        if seed in self._keys:
-            df = self.chain_df[self.chain_df['key']==seed]
-            if len(df) == 0:  #  add to chain_df from counts_df
-                df = self._add_key(seed)
-            
-            #row = self.chain_df.loc[seed]
-            #row_probs = row[row > 0].cumsum()
-            # given a probability, pick the first character in the row_probs (cumulative probabilities)
-            # having a probability > the random probability
-            # for example:
+        if seed in self.sampler:
+            # given a probability, pick the first character having a cumulative probability > the random probability
             prob = random.random()
-            row = df[df['prob']>prob].iloc[0]
-            next_token = row['word']
+            row = self.sampler.sample(seed, prob)
+            next_token = row['next_token']
             p = row['prob']
-            #p = row_probs[row_probs> prob].iat[0]
-            #next_token = row_probs[row_probs> prob].index[0]
-            new_seed = (seed + next_token)[1:self.order+1]
+            new_seed = self.next_seed(seed, next_token)
             if self.verbose > 1:
                 print(f"random prob: {prob}, row prob: {p},  seed: '{seed}', next_token: '{next_token}', new_seed: '{new_seed}'")
         else:
@@ -96,15 +93,43 @@ class WordProducer(Producer):
                 
         return dict([ ('next_token', next_token), ('new_seed',new_seed)])
     
-    def add_word_to_list(self, word_list, aword):
+    def next_seed(self, seed, next_token):
+        return (seed + next_token)[1:self.order+1]
+    
+    def is_terminal(self, token) -> bool:
+        return token == self.terminal_object
+    
+    def get_batch_max_steps(self) -> int:
+        return self.max_size + 1
+    
+    def format_word(self, aword):
         if self.output_format == 'TC':
             aword = aword.title()
         elif self.output_format == 'LC':
             aword = aword.lower()
         elif self.output_format == 'UC':
             aword = aword.upper()
-        else:
-            pass
+        return aword
+    
+    def make_batch_item(self, seed, tokens):
+        """Creates a word from a seed and the characters drawn by produce_batch()
+        
+        Follows the rules of produce(): the word ends at the terminal character, at max_size characters,
+        or when there is no next character. Words ending at the terminal character shorter than min_size are rejected.
+        """
+        word = seed.strip()
+        for token in tokens:
+            if self.is_terminal(token):
+                if len(word) < self.min_size:
+                    return None
+                break
+            word = word + token
+            if len(word) >= self.max_size:
+                break
+        return self.format_word(word)
+    
+    def add_word_to_list(self, word_list, aword):
+        aword = self.format_word(aword)
         word_list.append(aword)
         if self.display_as_produced:
             print(f"{aword}")
@@ -13,6 +13,8 @@
 from common.characterCollector import CharacterCollector
 from common.utils import Utils
 from common.markovChain import MarkovChain
+from common.internedChain import InternedChain
+from common.backoffChain import BackoffChain
 from common.wordProducer import WordProducer
 from textwrap import dedent
 import pandas as pd
@@ -32,12 +34,14 @@ def main():
     parser.add_argument("--source", "-s", help="input file name")
     parser.add_argument("--ignoreCase", "-i", help="ignore input case", action="store_true", default=False)
     parser.add_argument("--name", help="Name of resulting MarkovChain, used to save to file", type=str, default="mychain")
+    parser.add_argument("--stream", help="Read and count the source a line at a time", action="store_true", default=False)
+    parser.add_argument("--backoff", help="Use a BackoffChain that backs off to the longest matching key of a lower order", action="store_true", default=False)
 
     #
     # WordProducer arguments
     #
     parser.add_argument("-c", "--chainfile", help="Existing serialized MarkovChain file, or POS file name.",  type=str, default=None)
-    parser.add_argument("-f","--format", help="File input/output format. Default is csv", type=str, choices=['csv','json','xlsx'], default='csv' )
+    parser.add_argument("-f","--format", help="File input/output format. Default is csv", type=str, choices=['csv','json','xlsx','npz'], default='csv' )
 
     parser.add_argument("--num", "-n", help="Number of words to produce",  type=int, default=10)
     parser.add_argument("--min", help="Minimum length of words", type=int, choices=range(2,6), default=4)
@@ -50,6 +54,8 @@ def main():
     parser.add_argument("--pos", help="Source is a part-of-speech file", action="store_true",default=False)
     parser.add_argument("--recycle", help="How often to pick a new seed, default is pick a new seed after each word produced", type=int, default=1)
     parser.add_argument("--display", "-d", help="Display each word as it is produced", action="store_true", default=True)
+    parser.add_argument("--batch", "-b", help="Produce this many words in a single vectorized batch instead of one at a time", type=int, default=None)
+    parser.add_argument("--engine", help="Sampling engine: cumulative (binary search) or alias (constant time alias tables). Default is cumulative", type=str, choices=['cumulative','alias'], default='cumulative')
     args = parser.parse_args()
     
     markovChain = None
@@ -65,11 +71,15 @@ def main():
         source_file = args.source
         collector = CharacterCollector(state_size = args.order, verbose=args.verbose, source=source_file, text=args.text, ignore_case=args.ignoreCase)
         collector.sort_chain = True
+        collector.streaming = args.stream
+        collector.backoff = args.backoff
         run_results = collector.run()
         if run_results['save_result']:
             print(f"MarkovChain written to file: {collector.filename}")
         
         markovChain = collector.markovChain
+        if args.backoff:
+            markovChain = collector.backoffChain
         
     else:
         # use serialized MarkovChain file  and counts file in specified format
@@ -77,6 +87,8 @@ def main():
         #
         order_string = '_0{}'.format(order)
         chain_filename = f'{args.chainfile}_charsChain{order_string}.{args.format}'
+        if args.backoff:    # the BackoffChain file holds the counts of every order
+            chain_filename = f'{args.chainfile}_charsBackoff{order_string}.npz'
         counts_filename = f'{args.chainfile}_charCounts{order_string}.{args.format}'
         
         chain_file_info = Utils.get_file_info(chain_filename)
@@ -92,7 +104,9 @@ def main():
             print(f"{chain_path} does not exist")
             exit()
         else:
-            if ext=='json':
+            if args.backoff:
+                markovChain = BackoffChain.load(chain_path)
+            elif ext=='json':
                 chain_df = pd.read_json(chain_path, orient="index")
                 counts_df = pd.read_json(counts_path, orient="index")
                 markovChain = MarkovChain(order, counts_df, chain_df=chain_df)
@@ -102,6 +116,8 @@ def main():
                 markovChain = MarkovChain(order, counts_df, chain_df=chain_df)
             elif ext=='xlsx':
                 pass        # TODO
+            elif ext=='npz':     # binary chain file, counts and probabilities in one memory mapped file
+                markovChain = InternedChain.load(chain_path)
 
     #
     # markovChain will never, ever be None
@@ -114,10 +130,17 @@ def main():
     wordProducer.initial = args.initial
     wordProducer.seed = args.seed
     wordProducer.recycle_seed_count = args.recycle
+    if args.engine != 'cumulative':
+        wordProducer.set_sampling_engine(args.engine)
     wordProducer.display_as_produced = display_as_produced
-    words = wordProducer.produce()  # also prints the words
-    if not display_as_produced:
-        print(words)
+    if args.batch is not None:
+        words = wordProducer.produce_batch(args.batch)
+        for w in words: print(w)
+        print(f"{wordProducer.batch_stats['items']} words, {wordProducer.batch_stats['items_per_sec']:.1f} words/sec")
+    else:
+        words = wordProducer.produce()  # also prints the words
+        if not display_as_produced:
+            print(words)
             
 if __name__ == '__main__':
     main()
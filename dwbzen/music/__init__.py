@@ -15,12 +15,15 @@ del minPythonVersionStr
 __all__ = [
     'chord', 
     'chords', 
+    'corpusIndex', 
     'durationCollector', 
     'instruments', 
     'intervalCollector',
     'intervalCollectorRunner',
     'keys',
     'key',
+    'midiReader',
+    'midiWriter',
     'musicCollector',
     'musicProducer',
     'musicProducerRunner',
@@ -33,19 +36,24 @@ __all__ = [
     'sample_usage',
     'scale',
     'scales',
+    'scoreCache',
     'scoreGen',
     'scoreGenRunner',
+    'scoreWriter',
     'song'
 ]
 
 from .chords import Chords
 from .chord import Chord
+from .corpusIndex import CorpusIndex
 from .durationCollector import DurationCollector
 from .instruments import Instruments
 from .intervalCollector import IntervalCollector
 from .intervalCollectorRunner import IntervalCollectorRunner
 from .keys import Keys
 from .keys import Key
+from .midiReader import MidiReader
+from .midiWriter import MidiWriter
 from .musicCollector import MusicCollector
 from .musicProducer import MusicProducer
 from .musicProducerRunner import MusicProducerRunner
@@ -58,8 +66,10 @@ from .noteCollectorRunner import NoteCollectorRunner
 from .sample_usage import keys_usage, scales_usage, song_usage
 from .scale  import Scale
 from .scales import Scales
+from .scoreCache import ScoreCache
 from .scoreGen import ScoreGen
 from .scoreGenRunner import ScoreGenRunner
+from .scoreWriter import ScoreWriter
 from .song import Song
 
 
@@ -0,0 +1,198 @@
+# ------------------------------------------------------------------------------
+# Name:          corpusIndex.py
+# Purpose:       CorpusIndex class.
+#
+#                CorpusIndex is a persistent index of the music21 corpus metadata
+#                and the parts, keys and notes of the corpus scores.
+#
+# Authors:      Donald Bacon
+#
+# Copyright:    Copyright 2026 Donald Bacon
+# License:      BSD, see license.txt
+# ------------------------------------------------------------------------------
+
+from common.environment import Environment
+from common.collectorProducer import CollectorProducer
+from music.musicUtils import MusicUtils
+from music21 import key, note
+from music21.corpus import manager
+from concurrent.futures import ProcessPoolExecutor
+import json, os, re, sqlite3
+import numpy as np
+import pandas as pd
+
+class CorpusIndex(object):
+    """An index of the corpus scores that answers composer, title, keypart and mode queries without music21 corpus searches.
+
+    The index has two tables, saved in a SQLite database:
+        scores - a row for each score in the corpus metadata: position, corpus, path, number, composers, titles, parsed and notes
+        parts - a row for each part of the parsed scores: path, number, part_number, part_name, keys, mode and notes
+    number is the work number of a score in a file of several works, such as an ABC file, otherwise None.
+    The scores table is created once from the music21 metadata bundles, which can take some time to read.
+    A score is parsed the first time a query needs its parts, and its part names, the names of its Keys, the mode
+    of each part and its number of notes are added to the parts table. Queries are answered from the tables in memory.
+    The default database is corpus_index.db in the Environment music data folder.
+    """
+
+    def __init__(self, filename:str=None):
+        if filename is None:
+            filename = os.path.join(Environment.get_environment().get_data_folder('music'), 'corpus_index.db')
+        self.filename = filename
+        self.scores_df = None
+        self.parts_df = None
+        if os.path.exists(filename):
+            self.load()
+        else:
+            self.create()
+
+    def __repr__(self):
+        parsed = 0 if self.scores_df is None else int(self.scores_df['parsed'].sum())
+        return f"CorpusIndex {self.filename} scores={len(self.scores_df)} parsed={parsed}"
+
+    def create(self):
+        """Creates the scores table from the metadata of all the corpora known to music21 and saves the index
+
+        """
+        manager.readAllMetadataBundlesFromDisk()
+        entries = []
+        for corpus_name in manager.iterateCorpora(returnObjects=False):
+            for entry in manager.fromName(corpus_name).metadataBundle:
+                if entry.metadata is not None:
+                    entries.append(entry)
+        entries.sort(key=lambda entry: entry.sourcePath)      # the order of a corpus.search() result
+        rows = [(i, entry.corpusName, str(entry.sourcePath), None if entry.number is None else str(entry.number), \
+                 json.dumps(list(entry.metadata.composers)), \
+                 json.dumps([] if entry.metadata.title is None else [entry.metadata.title]), 0, 0) for i,entry in enumerate(entries)]
+        self.scores_df = pd.DataFrame(data=rows, columns=['position', 'corpus', 'path', 'number', 'composers', 'titles', 'parsed', 'notes'])
+        self.parts_df = pd.DataFrame(columns=['path', 'number', 'part_number', 'part_name', 'keys', 'mode', 'notes'])
+        self.save()
+
+    def load(self):
+        connection = sqlite3.connect(self.filename)
+        self.scores_df = pd.read_sql_query("select * from scores order by position", connection)
+        self.parts_df = pd.read_sql_query("select * from parts", connection)
+        connection.close()
+        if 'number' not in self.parts_df.columns:      # an index without work numbers, create it again
+            self.create()
+
+    def save(self):
+        """Saves the index, replacing the database file atomically
+
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.filename)), exist_ok=True)
+        with CollectorProducer.atomic_file(self.filename) as index_file:
+            connection = sqlite3.connect(index_file)
+            self.scores_df.to_sql('scores', connection, index=False)
+            self.parts_df.to_sql('parts', connection, index=False)
+            connection.execute("create index parts_path on parts (path)")
+            connection.commit()
+            connection.close()
+
+    @staticmethod
+    def matches(query, values:list) -> bool:
+        """Returns True if a query matches any of the values as music21 metadata search() does
+
+        A query with regular expression characters, or a compiled pattern, is a case-insensitive regular expression search.
+        Otherwise the query must be a case-insensitive substring of a value.
+        """
+        if isinstance(query, re.Pattern) or any(c in query for c in '*.|+?{}'):
+            pattern = query if isinstance(query, re.Pattern) else re.compile(query, re.IGNORECASE)
+            return any(pattern.search(v) is not None for v in values)
+        return any(query.lower() in v.lower() for v in values)
+
+    def search(self, composer:str=None, title:str=None) -> pd.DataFrame:
+        """Returns the scores rows matching a composer and title, as MusicUtils.get_metadata_bundle() does
+
+        Arguments:
+            composer - composer name, can be None
+            title - a regular expression string used to do a title search
+        """
+        if composer is None and title is None:
+            return self.scores_df.iloc[0:0]
+        selected = np.ones(len(self.scores_df), dtype=bool)
+        if composer is not None:
+            selected &= np.array([CorpusIndex.matches(composer, json.loads(c)) for c in self.scores_df['composers']], dtype=bool)
+        if title is not None:
+            titles_re = re.compile(title, re.IGNORECASE)
+            selected &= np.array([CorpusIndex.matches(titles_re, json.loads(t)) for t in self.scores_df['titles']], dtype=bool)
+        return self.scores_df[selected]
+
+    def get_scores(self, composer:str=None, title:str=None, keypart:str=None, filters:dict=None, workers:int=None) -> pd.DataFrame:
+        """Returns the scores rows matching a composer and title that pass the filters, as MusicUtils.filter_score() does
+
+        A score passes if there are no filters, no 'mode' filter or no keypart,
+        otherwise the mode of the last Key of the keypart must be the filter mode.
+        Scores are parsed only if their parts are not in the index, in workers processes if workers is not None.
+        """
+        scores_df = self.search(composer, title)
+        if filters is None or 'mode' not in filters or keypart is None:
+            return scores_df
+        unparsed = scores_df[scores_df['parsed']==0]
+        self.add_scores(list(dict.fromkeys(CorpusIndex.get_score_keys(unparsed))), workers)
+        key_parts = self.parts_df[(self.parts_df['part_name']==keypart) & (self.parts_df['mode']!='')]
+        modes = dict(zip(CorpusIndex.get_score_keys(key_parts), key_parts['mode']))    # a later part of the same name replaces an earlier one
+        selected = np.array([modes.get(k) == filters['mode'] for k in CorpusIndex.get_score_keys(scores_df)], dtype=bool)
+        return scores_df[selected]
+
+    @staticmethod
+    def get_score_keys(df:pd.DataFrame) -> list:
+        """Returns the (path, number) of each row of the scores or parts table, number is None if the score has no work number
+
+        """
+        return [(path, None if pd.isna(number) else number) for path, number in zip(df['path'], df['number'])]
+
+    def get_parts(self, path:str, number:str=None) -> pd.DataFrame:
+        numbers = self.parts_df['number']
+        return self.parts_df[(self.parts_df['path']==path) & (numbers.isna() if number is None else numbers==number)]
+
+    def add_scores(self, scores:[(str,str)], workers:int=None) -> int:
+        """Parses scores and adds their parts to the index, then saves the index
+
+        Parameters:
+            scores - a list of the (path, number) of the scores
+        Returns:
+            the number of scores added
+        """
+        if len(scores) == 0:
+            return 0
+        if workers is None:
+            results = list(map(CorpusIndex.get_score_info, scores))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(CorpusIndex.get_score_info, scores))
+        rows = [part for parts in results for part in parts]
+        parts_df = pd.DataFrame(data=rows, columns=self.parts_df.columns)
+        self.parts_df = parts_df if len(self.parts_df) == 0 else pd.concat([self.parts_df, parts_df], ignore_index=True)
+        notes = {}
+        for score_key, nnotes in zip(CorpusIndex.get_score_keys(parts_df), parts_df['notes']):
+            notes[score_key] = notes.get(score_key, 0) + int(nnotes)
+        score_keys = CorpusIndex.get_score_keys(self.scores_df)
+        added_keys = set(scores)
+        added = np.array([k in added_keys for k in score_keys], dtype=bool)
+        self.scores_df.loc[added, 'parsed'] = 1
+        self.scores_df.loc[added, 'notes'] = [notes.get(k, 0) for k, a in zip(score_keys, added) if a]
+        self.save()
+        return len(scores)
+
+    @staticmethod
+    def get_score_info(score:(str,str)) -> list:
+        """Parses a score and returns a list of (path, number, part_number, part_name, keys, mode, notes), one for each Part
+
+        keys is a JSON list of the names of the Keys of the Part in order of appearance
+        and mode is the mode of the last Key, '' if the Part has no Key or KeySignature.
+        """
+        path, number = score
+        if MusicUtils.verbose > 0:
+            print(f"indexing {path} {'' if number is None else number}")
+        ascore = MusicUtils.parse_score(path, number)
+        parts = []
+        for part_number, apart in enumerate(ascore.parts, start=1):
+            key_sigs, _ = MusicUtils.get_keySignatures(apart)
+            part_keys = [k if isinstance(k, key.Key) else k.asKey() for k in key_sigs]
+            mode = part_keys[-1].mode if len(part_keys) > 0 else ''
+            nnotes = len(apart.flatten().getElementsByClass(note.Note))
+            parts.append((path, number, part_number, apart.partName, json.dumps([k.name for k in part_keys]), mode, nnotes))
+        return parts
+
+if __name__ == '__main__':
+    print(CorpusIndex.__doc__)
@@ -32,6 +32,8 @@ class DurationCollector(MusicCollector):
         self.parts = None
         self.durations_df = None
         self.source_df = None
+        self.probability_places = 3
+        self._pending_df = None     # the durations not yet counted by add_durations()
         self.countsFileName = '_durationsCounts' + '_0{}'.format(state_size)
         self.chainFileName = '_durationsChain' + '_0{}'.format(state_size)
         if parts is not None:
@@ -50,25 +52,11 @@ class DurationCollector(MusicCollector):
     
     def process(self, key_durations, next_duration):
         index_str = MusicUtils.show_durations(key_durations)      # str value
-        col_val = next_duration.duration.quarterLengthNoTuplets   # float value
+        col_val = float(next_duration['quarterLength'])     # float value, the quarterLengthNoTuplets
         if self.verbose > 1:
             print(f"key: {index_str}, next: {col_val}")
         
-        if self.counts_df is None:
-            # initialize the counts DataFrame
-            # self.counts_df = pd.DataFrame(data=[1],index=[index_str], columns=[str(next_duration.quarterLength)] )
-            self.counts_df = pd.DataFrame(data=[1],index=[index_str], columns=[next_duration.duration.quarterLengthNoTuplets] )
-        
-        else:
-            if index_str not in self.counts_df.index:   # add a new row
-                self.counts_df.loc[index_str, col_val] = 1
-            else: # update existing index
-                if col_val in self.counts_df.columns:
-                    self.counts_df.loc[index_str, col_val] = 1 + self.counts_df.loc[index_str, col_val]
-                else:
-                    self.counts_df.loc[index_str, col_val] = 1
-
-        self.counts_df = self.counts_df.fillna(0)
+        self.add_count(index_str, col_val)
         
     def set_source(self, source):
         """This method is called in the __init__ of the parent class, MusicCollector
@@ -92,6 +80,24 @@ class DurationCollector(MusicCollector):
         return result
 
         
+    def add_durations(self, durations_df:pd.DataFrame):
+        """Counts the durations of a DataFrame created by MusicUtils.get_durations_from_notes()
+        
+        Each key is order durations followed by the next duration, and the next key starts after that.
+        The durations left over continue with the next DataFrame added, so adding the durations
+        of scores one at a time counts the same as adding them all at once.
+        """
+        if self._pending_df is not None and len(self._pending_df) > 0:
+            durations_df = pd.concat([self._pending_df, durations_df], ignore_index=True)
+        df_len = len(durations_df)
+        iloc = 0
+        while iloc + self.order < df_len:
+            key_durations = durations_df.iloc[iloc:iloc+self.order]    # list of length self.order
+            next_duration = durations_df.iloc[iloc+self.order]
+            self.process(key_durations, next_duration)      # add to counts DataFrame
+            iloc = iloc + self.order
+        self._pending_df = durations_df.iloc[iloc:]
+
     def collect(self):
         """
         Run collection using the set parameters
@@ -101,18 +107,13 @@ class DurationCollector(MusicCollector):
             print(f"durations: {self.durations_df}")
             
         if self.durations_df is not None:
-            df_len = len(self.durations_df) 
-            iloc = 0
-            while iloc + self.order < df_len:
-                key_durations = self.durations_df.iloc[iloc:iloc+self.order]    # list of length self.order
-                next_duration = self.durations_df.iloc[iloc+self.order]
-                self.process(key_durations, next_duration)      # add to counts DataFrame
-                
-                iloc = iloc + self.order
+            self.add_durations(self.durations_df)
+        self._pending_df = None
 
+        self.materialize_counts()
         self.counts_df.rename_axis('KEY', inplace=True)
         if self.sort_chain:
-            self.counts_df.sort_index('index', ascending=True, inplace=True)
+            self.counts_df.sort_index(axis=0, ascending=True, inplace=True)
             self.counts_df.sort_index(axis=1, ascending=True, inplace=True)
 
         #
@@ -121,7 +122,7 @@ class DurationCollector(MusicCollector):
         sums = self.counts_df.sum(axis=1)
         self.chain_df = self.counts_df.div(sums, axis=0)
         self.chain_df.rename_axis('KEY', inplace=True)
-        self.chain_df = self.chain_df.map(lambda x: MusicUtils.round_values(x, 3))
+        self.chain_df = self.chain_df.map(lambda x: MusicUtils.round_values(x, self.probability_places))
         
         self.markovChain = MarkovChain(self.order, self.counts_df,  chain_df=self.chain_df, myname=self.name)
         
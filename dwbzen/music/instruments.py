@@ -13,6 +13,7 @@ from music21 import instrument, Music21Object
 from music21 import note, clef, interval
 
 import pandas as pd
+import numpy as np
 import importlib
 
 class Instruments(object):
@@ -29,16 +30,28 @@ class Instruments(object):
     Instrument information maintained in resources/music/instruments.json
     Clef information in resources/music/clefs.json
 
+    The instrument and clef tables are built the first time an Instruments is created for a resource folder
+    and shared by all the Instruments of that folder in the process, so creating one is cheap.
+    The music21 Instrument and Clef instances are shared too: copy one before inserting it in a stream.
+    The ranges are also in numpy arrays indexed by the position of an instrument in instruments_pd (see index),
+    used by pitches_in_range() and adjust_pitches_to_range() to check and adjust whole arrays of midi pitches.
     """
     
     instrument_names=[ 'Alto', 'Bass', 'Bassoon', 'Clarinet', 'Flute', 'Harpsichord', 'Koto', 'Oboe', 'Piano', 'PianoLH', 'PianoRH', 'Soprano', 'Tenor']
     clef_names=['Soprano', 'Alto', 'Tenor', 'Bass', 'Treble', 'Treble8va', 'Treble8vb', 'Bass8va', 'Bass8vb', 'C', 'F', 'G']
+    _registries = {}    # resource folder : (instruments_pd, clefs_pd, index, low, high), built once per process
     
     def __init__(self, verbose=0, resource_folder ="/Compile/dwbzen/resources/music"):
         self.resource_folder = resource_folder
         self.verbose = verbose
-        self.__create_instrument_classes()
-        self.__create_clef_classes()
+        registry = Instruments._registries.get(resource_folder)
+        if registry is None:
+            self.__create_instrument_classes()
+            self.__create_clef_classes()
+            self.__create_range_arrays()
+            Instruments._registries[resource_folder] = (self.instruments_pd, self.clefs_pd, self.index, self.low, self.high)
+        else:
+            self.instruments_pd, self.clefs_pd, self.index, self.low, self.high = registry
 
     @staticmethod
     def __create_instance(row:pd.Series) -> Music21Object:
@@ -78,6 +91,13 @@ class Instruments(object):
         self.clefs_pd = pd.read_json(self.resource_folder + "/clefs.json", orient="index")
         self.clefs_pd['instance'] = [Instruments.__create_instance(row[1]) for row in self.clefs_pd.iterrows()]
 
+    def __create_range_arrays(self):
+        self.index = {name:i for i,name in enumerate(self.instruments_pd.index)}      # instrument name : position
+        self.low = np.array([r[0] for r in self.instruments_pd['range_ps']], dtype=np.int64)
+        self.high = np.array([r[1] for r in self.instruments_pd['range_ps']], dtype=np.int64)
+        self.low.setflags(write=False)      # shared by all the Instruments
+        self.high.setflags(write=False)
+
     def get_clef(self, clef_name) -> clef.Clef:
         instance = None
         if clef_name in self.clefs_pd.index:
@@ -97,15 +117,58 @@ class Instruments(object):
             instance = self.instruments_pd.loc[instrument_name]['instance']
         return instance
     
+    def get_midi_program(self, instrument_name) -> int:
+        """Returns the General MIDI program number of an Instrument, 0 (piano) if it has none
+        
+        """
+        program = None
+        if instrument_name in self.instruments_pd.index:
+            program = self.instruments_pd.loc[instrument_name]['instance'].midiProgram
+        return 0 if program is None else program
+    
+    def get_range(self, instrument_name:str) -> (int, int):
+        """Returns the (low, high) pitch.ps range of an Instrument, raises KeyError if it is not supported
+        
+        """
+        i = self.index[instrument_name]
+        return int(self.low[i]), int(self.high[i])
+    
+    def get_indexes(self, instrument_names:[str]) -> np.ndarray:
+        """Returns the index of each instrument name, -1 if it is not supported
+        
+        """
+        return np.array([self.index.get(name, -1) for name in instrument_names], dtype=np.int64)
+    
     def is_in_range(self, instrument_name:str, note:note.Note) -> bool:
         """Return True if a Note is in the rage of a given Instrument, False otherwise
         
         """
         noteps = note.pitch.ps
-        rng = self.instruments_pd.loc[instrument_name]['range_ps']
-        inrange = (noteps >= rng[0] and noteps <= rng[1])
+        low, high = self.get_range(instrument_name)
+        inrange = (noteps >= low and noteps <= high)
         return inrange
     
+    def get_range_arrays(self, instruments) -> (np.ndarray, np.ndarray):
+        """Returns the low and high ranges of an instrument name, or of an array of instrument indexes, see get_indexes()
+        
+        """
+        if isinstance(instruments, str):
+            i = self.index[instruments]
+            return self.low[i], self.high[i]
+        return self.low[instruments], self.high[instruments]
+    
+    def pitches_in_range(self, instruments, pitches:np.ndarray) -> np.ndarray:
+        """The vectorized is_in_range() of midi pitches (pitch.ps)
+        
+            Args:
+                instruments - an instrument name, or an array of the instrument index of each pitch, see get_indexes()
+                pitches - an int array of midi pitches
+            Returns:
+                a bool array, True where the pitch is in range
+        """
+        low, high = self.get_range_arrays(instruments)
+        return (pitches >= low) & (pitches <= high)
+    
     def check_range(self, instrument_name:str, note:note.Note) -> int:
         """Returns the number of steps a Note is for a given Instrument, 0 otherwise.
         
@@ -125,11 +188,11 @@ class Instruments(object):
         """
         steps_out_of_range = 0
         noteps = note.pitch.ps
-        rng = self.instruments_pd.loc[instrument_name]['range_ps']
-        if noteps < rng[0]:
-            steps_out_of_range = noteps - rng[0]
-        elif noteps > rng[1]:
-            steps_out_of_range = noteps - rng[1]
+        low, high = self.get_range(instrument_name)
+        if noteps < low:
+            steps_out_of_range = noteps - low
+        elif noteps > high:
+            steps_out_of_range = noteps - high
         return int(steps_out_of_range)
     
     def adjust_to_range(self, instrument_name:str, anote:note.Note, inPlace=False) -> note.Note:
@@ -171,6 +234,25 @@ class Instruments(object):
 
         return newnote
     
+    def adjust_pitches_to_range(self, instruments, pitches:np.ndarray) -> np.ndarray:
+        """The vectorized adjust_to_range() of midi pitches (pitch.ps)
+        
+            Pitches below the range are raised, and pitches above the range lowered,
+            by the number of octaves needed to be back in range.
+            Microtonal pitches are adjusted as check_range() does, by the whole semitones they are out of range,
+            so a pitch less than a semitone out of range is unchanged.
+            Args:
+                instruments - an instrument name, or an array of the instrument index of each pitch, see get_indexes()
+                pitches - an int or float array of midi pitches
+            Returns:
+                a new int64 array of the adjusted pitches, float64 if pitches is a float array
+        """
+        low, high = self.get_range_arrays(instruments)
+        pitches = np.asarray(pitches)
+        pitches = pitches.astype(np.float64 if np.issubdtype(pitches.dtype, np.floating) else np.int64)
+        steps = np.trunc(np.where(pitches < low, pitches - low, np.where(pitches > high, pitches - high, 0))).astype(np.int64)
+        return pitches - np.sign(steps) * 12 * (1 + (np.abs(steps) - 1) // 12)
+    
 if __name__ == '__main__':
     print(Instruments.__doc__)
     instruments = Instruments()
@@ -12,6 +12,7 @@
 
 from music.musicCollector import MusicCollector
 from music.musicUtils import MusicUtils
+from music.midiReader import MidiReader
 from common.markovChain import MarkovChain
 from common.collectorProducer import CollectorProducer
 import pandas as pd
@@ -29,8 +30,10 @@ class IntervalCollector(MusicCollector):
         super().__init__(state_size, verbose, source, parts)
         
         self.initial_object, self.terminal_object = IntervalCollector.initialize_initial_terminal_objects()
-        self.countsFileName = '_intervalsCounts' + '_0{}'.format(state_size)
+
+        self.countsFileName = '_intervalsCounts' + '_0{}'.format(state_size)
         self.chainFileName = '_intervalsChain' + '_0{}'.format(state_size)
+        self.source_path = None     # a corpus search or MIDI source read and counted in worker processes by collect()
         if source is not None:
             self.source = self.set_source(source)   # otherwise it's None
     
@@ -57,23 +60,12 @@ class IntervalCollector(MusicCollector):
     def process(self, key_intervals, next_interval):
         index_str = MusicUtils.show_intervals(key_intervals,'semitones')
         col_str = str(next_interval.semitones)
-        col_name = next_interval.interval.directedName
+        col_name = next_interval['directedName']
         
         if self.verbose > 1:
             print(f"key_interval: {index_str}, next_interval: {next_interval.semitones}, {col_name}")
     
-        if self.counts_df is None:
-            # initialize the counts DataFrame
-            self.counts_df = pd.DataFrame(data=[1],index=[index_str], columns=[next_interval.semitones])
-        else:
-            if index_str not in self.counts_df.index:   # add a new row
-                self.counts_df.loc[index_str, col_str] = 1
-            else: # update existing index
-                if col_str in self.counts_df.columns:
-                    self.counts_df.loc[index_str, col_str] = 1 + self.counts_df.loc[index_str, col_str]
-                else:
-                    self.counts_df.loc[index_str, col_str] = 1
-        self.counts_df = self.counts_df.fillna(0)
+        self.add_count(index_str, col_str)
 
     def set_source(self, source):
         """Determine if source is a file or folder and if it exists (or not)
@@ -90,6 +82,8 @@ class IntervalCollector(MusicCollector):
         --source "composer='bach',title='bwv*'"     # corpus wild card search for composer and title
         --source $CORPUS/haydn/opus74no1            # an individual corpus file
         --source '/data/music/Corpus/dwbzen/Prelude.mxl'    # a single musicXML file. The .mxl may be omitted
+        --source '/data/music/midi/Prelude.mid'     # a single MIDI file, read with MidiReader without parsing a Score
+        --source '/data/music/midi'                 # all the MIDI files in a folder and its subfolders
         --source [filename].json                    # load a serialized interval DataFrame (TODO)
         
         """
@@ -99,6 +93,16 @@ class IntervalCollector(MusicCollector):
         if source.startswith('$CORPUS'):
             corpus_file = self.corpus_folder + source[6:]
             self.score = corpus.parse(corpus_file)
+        elif self.workers is not None and (IntervalCollector.is_corpus_search(source) or MidiReader.is_midi_source(source)):
+            #
+            # the scores or MIDI files are read and counted in worker processes by collect(), see collect_sharded()
+            #
+            self.source_path = source
+        elif MidiReader.is_midi_source(source):
+            self.intervals_df, self.score_partNames, self.score_partNumbers, _ = \
+                MidiReader.get_tables(source, interval.Interval, partnames=self.part_names, partnumbers=self.part_numbers, workers=self.workers)
+            if len(self.intervals_df) == 0:
+                result = False
         elif 'composer' in source or 'title' in source:
             search_string = source.split(",")
             for ss in search_string:
@@ -109,11 +113,19 @@ class IntervalCollector(MusicCollector):
                     title = st[1]
             MusicUtils.verbose = self.verbose
             self.intervals_df, self.score_partNames, self.score_partNumbers = \
-                MusicUtils.get_all_score_music21_objects(interval.Interval, composer=composer, title=title, partnames=self.part_names, partnumbers=self.part_numbers) 
+                MusicUtils.get_all_score_music21_objects(interval.Interval, composer=composer, title=title, partnames=self.part_names, partnumbers=self.part_numbers, workers=self.workers, cache=self.score_cache, index=self.corpus_index) 
             if self.intervals_df is None or len(self.intervals_df) == 0:
                 result = False
         else:   # must be a single filename or path
             file_info = MusicUtils.get_file_info(source)
+            if self.score_cache is not None and file_info['Path'].exists():
+                #
+                # the intervals are loaded from the cache if this file was collected before, the Score is not available
+                #
+                settings = MusicUtils.get_table_settings(interval.Interval, partnames=self.part_names, partnumbers=self.part_numbers)
+                _, self.intervals_df, self.score_partNames, self.score_partNumbers = \
+                    MusicUtils.get_score_table((file_info['path_text'], None, source, settings, None, self.score_cache))
+                return result
             if file_info['Path'].exists():
                 self.score = converter.parse(file_info['path_text'])
                 if self.verbose > 2:
@@ -125,14 +137,44 @@ class IntervalCollector(MusicCollector):
                 result = False
         return result
 
+    def set_update_source(self, source):
+        """update() collects the new material from a score or corpus search, see set_source()
+        
+        """
+        self.score = None
+        self.intervals_df = None
+        self.source_path = None
+        self.source = self.set_source(source)
+
+    def get_source_df(self) -> pd.DataFrame:
+        return self.intervals_df
+    
+    def get_token_column(self) -> str:
+        return 'semitones'
+    
+    def get_table_tasks(self) -> list:
+        """Returns a (get_table, task) for each score of a corpus search or MIDI file of the source_path, see collect_sharded()
+        
+        """
+        if MidiReader.is_midi_source(self.source_path):
+            return [(MidiReader.get_table, task) for task in MidiReader.get_table_tasks(self.source_path, interval.Interval, \
+                                                                                         partnames=self.part_names, partnumbers=self.part_numbers)]
+        composer, title = IntervalCollector.get_corpus_search(self.source_path)
+        return [(MusicUtils.get_score_table, task) for task in MusicUtils.get_corpus_tasks(interval.Interval, composer=composer, title=title, \
+                                            partnames=self.part_names, partnumbers=self.part_numbers, workers=self.workers, cache=self.score_cache, index=self.corpus_index)]
+    
     def collect(self) -> MarkovChain:
         """
         Run collection using the set parameters
+        If workers is set the scores of a corpus search or MIDI source are read and counted in worker processes, see collect_sharded().
         Returns MarkovChain result
         """
+        if self.workers is not None and self.source_path is not None:
+            return self.collect_sharded()
+        
         if self.verbose > 1:
             print(f"intervals: {self.intervals_df}")
-            
+        
         for pname in self.score_partNames:
             partIntervals_df = self.intervals_df[self.intervals_df['part_name']==pname]
             df_len = len(partIntervals_df)
@@ -142,7 +184,7 @@ class IntervalCollector(MusicCollector):
 
             while iloc + self.order < df_len:
                 if iloc == 0:
-                    key_intervals =  pd.concat([self.initial_object, partIntervals_df.iloc[iloc+self.order-1] ])
+                    key_intervals =  pd.concat([self.initial_object, partIntervals_df.iloc[iloc:iloc+self.order-1] ])
                 else:
                     key_intervals = partIntervals_df.iloc[iloc:iloc+self.order]    # list of length self.order
                     
@@ -156,30 +198,8 @@ class IntervalCollector(MusicCollector):
             next_interval = self.terminal_object.iloc[0]
             self.process(key_intervals, next_interval)
 
-        self.counts_df.rename_axis('KEY', inplace=True)
-        if self.sort_chain:
-            self.counts_df.sort_index('index', ascending=True, inplace=True)
-            self.counts_df.sort_index(axis=1, ascending=True, inplace=True)
-        #
-        # create the MarkovChain from the counts by summing probabilities
-        #
-        sums = self.counts_df.sum(axis=1)
-        self.chain_df = self.counts_df.div(sums, axis=0)
-        self.chain_df.rename_axis('KEY', inplace=True)
-        self.chain_df = self.chain_df.map(lambda x: MusicUtils.round_values(x, 6))
-        
-        self.markovChain = MarkovChain(self.order, self.counts_df,  chain_df=self.chain_df, myname=self.name)
-        
-        if self.verbose > 1:
-            print(f" Counts:\n {self.counts_df}")
-            print(f" MarkovChain:\n {self.markovChain}")
-            if self.verbose > 1:
-                print(self.markovChain.__repr__())
-        #
-        # collect durations from the Score and notes_df DataFrame
-        #
-        self.collect_durations(self.intervals_df)
-        return self.markovChain
+        self.materialize_counts()
+        return self._create_music_chain(self.intervals_df)
     
     def save(self):
         """Saves the chain_df, counts_df and intervals_df DataFrames to a file in specified format.
@@ -187,9 +207,9 @@ class IntervalCollector(MusicCollector):
         """
 
         save_result = super().save()
-        if self.intervals_df is not None:
+        if self.intervals_df is not None and self.format != 'npz':
             #
-            # optionally save intervals_df as .csv
+            # optionally save intervals_df as .csv, the npz format is only the chain file
             #
             filename = "{}/{}_intervals.{}".format(self.save_folder, self.name, self.format)
             df = self.intervals_df[['name','niceName','semitones','part_name','part_number']]
@@ -12,6 +12,8 @@
 
 from common.collector import Collector
 from music.intervalCollector import IntervalCollector
+from music.scoreCache import ScoreCache
+from music.corpusIndex import CorpusIndex
 import argparse
 
 class IntervalCollectorRunner(Collector):
@@ -19,11 +21,14 @@ class IntervalCollectorRunner(Collector):
     if __name__ == '__main__':
         parser = argparse.ArgumentParser()
         parser.add_argument("--order", "-o", help="the order of the Markov Chain state space", type=int, choices=range(1,5))
-        parser.add_argument("-s", "--source", help="input file (.mxl or .musicxml), folder name, or composer name ('bach' for example)")
+        parser.add_argument("-s", "--source", help="input file (.mxl, .musicxml or .mid), folder of MIDI files, or composer name ('bach' for example)")
         parser.add_argument("-v","--verbose", help="increase output verbosity", action="count", default=0)
         parser.add_argument("-n","--name", help="Name of resulting MarkovChain, used to save to file", type=str)
-        parser.add_argument("-f","--format", help="Save output format. Default is csv", type=str, choices=['csv','json','xlsx'], default='json' )
+        parser.add_argument("-f","--format", help="Save output format. Default is csv", type=str, choices=['csv','json','xlsx','npz'], default='json' )
         parser.add_argument("--sort", help="Sort resulting MarkovChain ascending on both axes", action="store_true", default=False)
+        parser.add_argument("--workers", "-w", help="Number of worker processes to parse corpus scores and collect with, default is to work serially", type=int, default=None)
+        parser.add_argument("--cache", help="Cache the intervals extracted from each score in the data folder and reuse them in later runs", action="store_true", default=False)
+        parser.add_argument("--index", help="Find corpus scores with the corpus index in the data folder, creating it if needed", action="store_true", default=False)
         parser.add_argument("-d","--display", help="display resulting MarkovChain in json or cvs format", type=str, choices=['csv','json','chain'] )
         parser.add_argument("-p","--parts", help="part name(s) or number(s) to include in building the MarkovChain", type=str)
         parser.add_argument("--filter", help="Apply filter to parts", type=str, default=None)
@@ -33,10 +38,16 @@ class IntervalCollectorRunner(Collector):
             print('run IntervalCollector')
             print(args)
 
-        collector = IntervalCollector(state_size = args.order, verbose=args.verbose, source=args.source, parts=args.parts )
+        collector = IntervalCollector(state_size = args.order, verbose=args.verbose, source=None, parts=args.parts )
         collector.name = args.name
         collector.format = args.format
         collector.sort_chain = args.sort
+        collector.workers = args.workers
+        if args.cache:
+            collector.score_cache = ScoreCache()
+        if args.index:
+            collector.corpus_index = CorpusIndex()
+        collector.source = collector.set_source(args.source)    # after workers and score_cache are set
         collector.set_score_filter(args.filter)    # could be None
         #
         # only for Bach works in the music21 corpus
@@ -0,0 +1,392 @@
+# ------------------------------------------------------------------------------
+# Name:          midiReader.py
+# Purpose:       MidiReader class.
+#
+#                MidiReader decodes the notes of Standard MIDI Files directly
+#                into notes tables, without music21 streams.
+#
+# Authors:      Donald Bacon
+#
+# Copyright:    Copyright 2026 Donald Bacon
+# License:      BSD, see license.txt
+# ------------------------------------------------------------------------------
+
+from music.musicUtils import MusicUtils
+from music21 import duration, key, note, pitch
+from music21.common.numberTools import opFrac
+from fractions import Fraction
+import numpy as np
+import pandas as pd
+import os, struct
+
+class MidiReader(object):
+    """Reads the notes of a type 0 or type 1 Standard MIDI File into a notes table, see MusicUtils.get_notes_for_score()
+
+    The file is decoded in a single pass over the track events. Note on/off pairs become notes,
+    time signature and key signature meta events give the measure numbers and Keys. No music21 stream is created.
+    A part is the notes of one channel of a track, named for the track name (or "Track n"),
+    with the channel number appended if the track has notes on more than one channel. Channel 10 (percussion) is skipped.
+    A part is a single line: of the notes starting at the same time, only the highest is kept.
+    Durations are quantized to the nearest 1/4 or 1/3 quarterLength as music21 does when it parses a MIDI file.
+    Pitches are spelled with MusicUtils.adjust_accidental(), preferring the accidentals of the key signature in effect,
+    and the scale degrees are relative to that key signature, '' if there is none. Key signatures apply to all the parts.
+    """
+
+    extensions = ('.mid', '.midi')
+    _pitches = {}           # (sharps, mode, midi pitch) : (Pitch, scale degree), shared by all the files read in a process
+
+    def __init__(self, data:bytes, title:str=None):
+        """
+        Parameters:
+            data - the contents of a Standard MIDI File
+            title - the title of the notes, for example the file name
+        """
+        self.title = title
+        self.format = 0
+        self.ticks_per_quarter = 480
+        self.tracks = []                # (track name, [(channel, on tick, off tick, midi pitch)]) of each track
+        self.time_signatures = []       # (tick, numerator, denominator)
+        self.key_signatures = []        # (tick, Key)
+        self.parse(data)
+
+    def __repr__(self):
+        return f"MidiReader {self.title} format={self.format} tracks={len(self.tracks)} ticks_per_quarter={self.ticks_per_quarter}"
+
+    @staticmethod
+    def read(path:str) -> 'MidiReader':
+        with open(path, 'rb') as f:
+            data = f.read()
+        return MidiReader(data, title=os.path.splitext(os.path.basename(path))[0])
+
+    @staticmethod
+    def is_midi_source(source:str) -> bool:
+        """Returns True if a collector source is a MIDI file or a folder with a MIDI file in it or its subfolders
+
+        """
+        if source.lower().endswith(MidiReader.extensions):
+            return True
+        for _, _, filenames in os.walk(source):
+            if any(f.lower().endswith(MidiReader.extensions) for f in filenames):
+                return True
+        return False
+
+    @staticmethod
+    def get_midi_paths(source:str) -> [str]:
+        """Returns the MIDI file paths of a source, a single file or all the MIDI files in a folder and its subfolders, sorted
+
+        """
+        if not os.path.isdir(source):
+            return [source] if os.path.exists(source) else []
+        paths = []
+        for folder, _, filenames in os.walk(source):
+            paths.extend(os.path.join(folder, f) for f in filenames if f.lower().endswith(MidiReader.extensions))
+        return sorted(paths)
+
+    @staticmethod
+    def read_variable_length(data:bytes, i:int) -> (int, int):
+        """Decodes a MIDI variable length quantity at data[i]
+
+        Returns:
+            a 2-tuple of the value and the index of the next byte
+        """
+        value = 0
+        while True:
+            b = data[i]
+            i += 1
+            value = (value << 7) | (b & 0x7F)
+            if b < 0x80:
+                return value, i
+
+    def parse(self, data:bytes):
+        if data[0:4] != b'MThd':
+            raise ValueError(f"{self.title} is not a Standard MIDI File")
+        header_length, self.format, ntracks, division = struct.unpack('>IHHH', data[4:14])
+        if division & 0x8000:
+            raise ValueError(f"{self.title}: SMPTE time division is not supported")
+        self.ticks_per_quarter = division
+        i = 8 + header_length
+        while i + 8 <= len(data) and len(self.tracks) < ntracks:
+            chunk_type = data[i:i+4]
+            length = struct.unpack('>I', data[i+4:i+8])[0]
+            if chunk_type == b'MTrk':
+                self.tracks.append(self.parse_track(data[i+8:i+8+length], len(self.tracks) + 1))
+            i += 8 + length             # unknown chunks are skipped
+        self.time_signatures.sort(key=lambda ts: ts[0])
+        self.key_signatures.sort(key=lambda ks: ks[0])
+
+    def parse_track(self, data:bytes, track_number:int) -> (str, list):
+        """Decodes the events of a track chunk
+
+        Returns:
+            a 2-tuple of the track name and a list of (channel, on tick, off tick, midi pitch) of its notes
+        """
+        name = None
+        notes = []
+        sounding = {}           # (channel, pitch) : [on ticks], note offs end the earliest note on
+        tick = 0
+        status = 0
+        i = 0
+        end = len(data)
+        read_variable_length = MidiReader.read_variable_length
+        while i < end:
+            delta, i = read_variable_length(data, i)
+            tick += delta
+            if data[i] >= 0x80:
+                status = data[i]
+                i += 1
+            event_type = status & 0xF0
+            if event_type == 0x90 or event_type == 0x80:
+                channel = status & 0x0F
+                midi, velocity = data[i], data[i+1]
+                i += 2
+                if event_type == 0x90 and velocity > 0:
+                    sounding.setdefault((channel, midi), []).append(tick)
+                else:
+                    on_ticks = sounding.get((channel, midi))
+                    if on_ticks:
+                        notes.append((channel, on_ticks.pop(0), tick, midi))
+            elif event_type in (0xA0, 0xB0, 0xE0):
+                i += 2
+            elif event_type in (0xC0, 0xD0):
+                i += 1
+            elif status == 0xFF:
+                meta_type = data[i]
+                length, i = read_variable_length(data, i + 1)
+                meta = data[i:i+length]
+                i += length
+                if meta_type == 0x03 and name is None:
+                    name = meta.decode('utf-8', errors='replace').strip()
+                elif meta_type == 0x58 and length >= 2:
+                    self.time_signatures.append((tick, meta[0], 2 ** meta[1]))
+                elif meta_type == 0x59 and length >= 2:
+                    sharps = struct.unpack('>b', meta[0:1])[0]
+                    self.key_signatures.append((tick, key.KeySignature(sharps).asKey('minor' if meta[1] == 1 else 'major')))
+                elif meta_type == 0x2F:
+                    break
+                status = 0
+            elif status in (0xF0, 0xF7):        # system exclusive
+                length, i = read_variable_length(data, i)
+                i += length
+                status = 0
+            else:
+                raise ValueError(f"{self.title}: invalid MIDI event status {status:#x} in track {track_number}")
+        for (channel, midi), on_ticks in sounding.items():     # notes without a note off end at the end of the track
+            notes.extend((channel, on, tick, midi) for on in on_ticks)
+        return (name if name else f"Track {track_number}"), notes
+
+    @staticmethod
+    def get_pitch(akey:key.Key, midi:int) -> (pitch.Pitch, str):
+        """Returns the Pitch of a midi pitch spelled for a Key and its scale degree, '' if akey is None
+
+        """
+        pitch_key = (None, None, midi) if akey is None else (akey.sharps, akey.mode, midi)
+        result = MidiReader._pitches.get(pitch_key)
+        if result is None:
+            preference = MusicUtils.default_pitch_map if akey is None or akey.sharps == 0 else 'sharp' if akey.sharps > 0 else 'flat'
+            apitch = MusicUtils.adjust_accidental(note.Note(pitch.Pitch(ps=midi)), preference).pitch
+            result = (apitch, '' if akey is None else MusicUtils.get_scale_degree(akey, apitch)['number'])
+            MidiReader._pitches[pitch_key] = result
+        return result
+
+    def get_parts(self) -> {str:tuple}:
+        """Returns a dict of part name : (on ticks, off ticks, midi pitches) int64 arrays of each part, in onset order
+
+        """
+        parts = {}
+        for track_name, notes in self.tracks:
+            if len(notes) == 0:
+                continue
+            notes_array = np.array(notes, dtype=np.int64)
+            channels = [c for c in np.unique(notes_array[:,0]).tolist() if c != 9]
+            for channel in channels:
+                channel_notes = notes_array[notes_array[:,0] == channel]
+                order = np.lexsort((-channel_notes[:,3], channel_notes[:,1]))       # by on tick, highest pitch first
+                channel_notes = channel_notes[order]
+                first = np.concatenate(([True], channel_notes[1:,1] != channel_notes[:-1,1]))
+                channel_notes = channel_notes[first]
+                name = track_name if len(channels) == 1 else f"{track_name} {channel + 1}"
+                if name in parts:
+                    name = f"{name} ({len(parts) + 1})"
+                parts[name] = (channel_notes[:,1], channel_notes[:,2], channel_notes[:,3])
+        return parts
+
+    def get_measures(self, ticks:np.ndarray) -> np.ndarray:
+        """Returns the measure number of each tick, from 1. Time signatures are assumed to change at a bar line
+
+        """
+        signatures = self.time_signatures if len(self.time_signatures) > 0 and self.time_signatures[0][0] == 0 \
+                     else [(0, 4, 4)] + self.time_signatures
+        starts = np.array([ts[0] for ts in signatures], dtype=np.int64)
+        bar_ticks = np.array([max(1, self.ticks_per_quarter * 4 * ts[1] // ts[2]) for ts in signatures], dtype=np.int64)
+        first_measures = np.ones(len(signatures), dtype=np.int64)
+        for i in range(1, len(signatures)):
+            first_measures[i] = first_measures[i-1] + -(-(starts[i] - starts[i-1]) // bar_ticks[i-1])
+        s = np.searchsorted(starts, ticks, side='right') - 1
+        return first_measures[s] + (ticks - starts[s]) // bar_ticks[s]
+
+    def get_quarter_lengths(self, ticks:np.ndarray) -> np.ndarray:
+        """Quantizes durations in ticks to the nearest 1/4 or 1/3 quarterLength
+
+        Returns:
+            the quantized quarterLengths as ints in twelfths of a quarter
+        """
+        quarters = ticks / self.ticks_per_quarter
+        fourths = 3 * np.rint(quarters * 4).astype(np.int64)
+        thirds = 4 * np.rint(quarters * 3).astype(np.int64)
+        return np.where(np.abs(fourths - quarters * 12) <= np.abs(thirds - quarters * 12), fourths, thirds)
+
+    def get_notes(self, partnames:[str]=None, partnumbers:[int]=None) -> (pd.DataFrame,{str},{int}):
+        """Creates the notes table of the selected parts, with the columns described in MusicUtils.get_notes_for_score()
+
+        Parameters:
+            partnames, partnumbers - the parts to include. If both are None or empty all the parts are included.
+                                     Part numbers are the position of a part in get_parts() starting at 1.
+        Returns:
+            a 3-tuple of the notes_df DataFrame, a set of part names and a set of part numbers
+        """
+        parts = self.get_parts()
+        select_all = not partnames and not partnumbers
+        selected = [pname for n, pname in enumerate(parts, start=1) \
+                    if select_all or (partnames and pname in partnames) or (partnumbers and n in partnumbers)]
+        score_partnames = set()
+        score_partnumbers = set()
+        tables = []
+        for part_number, pname in enumerate(selected, start=1):
+            on_ticks, off_ticks, pitches = parts[pname]
+            twelfths = self.get_quarter_lengths(off_ticks - on_ticks)
+            keep = twelfths > 0
+            if not keep.any():
+                continue
+            tables.append((part_number, pname, on_ticks[keep], pitches[keep], twelfths[keep]))
+            score_partnames.add(pname)
+            score_partnumbers.add(part_number)
+        if len(tables) == 0:
+            return pd.DataFrame(), score_partnames, score_partnumbers
+        part_numbers = np.concatenate([np.full(len(t[2]), t[0]) for t in tables])
+        part_names = np.concatenate([np.full(len(t[2]), t[1], dtype=object) for t in tables])
+        on_ticks = np.concatenate([t[2] for t in tables])
+        ps = np.concatenate([t[3] for t in tables])
+        twelfths = np.concatenate([t[4] for t in tables])
+        #
+        # pitch names, durations and scale degrees are computed once for each distinct value, see get_pitch()
+        #
+        k = np.zeros(len(ps), dtype=np.int64) if len(self.key_signatures) == 0 else \
+            np.maximum(np.searchsorted([ks[0] for ks in self.key_signatures], on_ticks, side='right') - 1, 0)
+        key_pitches = list(zip(k.tolist(), ps.tolist()))
+        names = {}
+        scale_degrees = {}
+        for kp in set(key_pitches):
+            akey = self.key_signatures[kp[0]][1] if len(self.key_signatures) > 0 else None
+            names[kp], scale_degrees[kp] = MidiReader.get_pitch(akey, kp[1])
+        durations = {t:duration.Duration(opFrac(Fraction(t, 12))) for t in np.unique(twelfths).tolist()}
+        notes_df = pd.DataFrame({'part_number' : part_numbers, 'part_name' : part_names, \
+                                 'name' : [names[kp].name for kp in key_pitches], \
+                                 'nameWithOctave' : [names[kp].nameWithOctave for kp in key_pitches], \
+                                 'pitchClass' : ps % 12, 'ps' : ps, \
+                                 'quarterLength' : twelfths / 12.0, \
+                                 'quarterLengthNoTuplets' : [float(durations[t].quarterLengthNoTuplets) for t in twelfths.tolist()]})
+        for column, get_value in (('type', lambda d: d.type), ('ordinal', lambda d: d.ordinal), ('dots', lambda d: d.dots), \
+                                  ('fullName', lambda d: d.fullName), ('tuplets', lambda d: str(d.tuplets))):
+            values = {t:get_value(d) for t, d in durations.items()}
+            notes_df[column] = [values[t] for t in twelfths.tolist()]
+        notes_df['scaleDegree'] = [scale_degrees[kp] for kp in key_pitches]
+        notes_df['measure'] = self.get_measures(on_ticks)
+        return MusicUtils.compact_table(notes_df[MusicUtils.notes_table_columns]), score_partnames, score_partnumbers
+
+    def get_transposed_notes(self, target_key=MusicUtils.C_Major, target_key_minor=MusicUtils.A_Minor, partnames:[str]=None, partnumbers:[int]=None, \
+                             instruments=None) -> (pd.DataFrame,{str},{int}):
+        """Gets the notes of the selected parts transposed to a new Key as MusicUtils.get_transposed_notes_for_score() does
+
+        Parts without a key signature are not transposed.
+        If instruments is not None, the range of the parts named for an Instrument is enforced.
+        """
+        notes_df, score_partnames, score_partnumbers = self.get_notes(partnames, partnumbers)
+        if len(notes_df) > 0 and len(self.key_signatures) > 0:
+            key_sigs = [ks[1] for ks in self.key_signatures]
+            measure_numbers = self.get_measures(np.array([ks[0] for ks in self.key_signatures], dtype=np.int64)).tolist()
+            measure_numbers[0] = 1          # the first key signature is in effect from the start
+            measure_numbers.append(int(notes_df['measure'].max()) + 1)
+            part_keys = {pname:(key_sigs, measure_numbers) for pname in score_partnames}
+            range_names = set() if instruments is None else score_partnames.intersection(instruments.index)
+            if len(range_names) > 0:
+                notes_df = MusicUtils.transpose_notes(notes_df, {p:k for p,k in part_keys.items() if p in range_names}, target_key, target_key_minor, instruments)
+            if len(range_names) < len(part_keys):
+                notes_df = MusicUtils.transpose_notes(notes_df, {p:k for p,k in part_keys.items() if p not in range_names}, target_key, target_key_minor)
+        return notes_df, score_partnames, score_partnumbers
+
+    @staticmethod
+    def get_table(task:tuple) -> tuple:
+        """Reads a MIDI file and creates its notes or intervals table. This runs in a worker process for get_tables()
+
+        Args:
+            task - a tuple of (path, table, partnames, partnumbers, transposition, instruments)
+                   table is 'notes' or 'intervals', transposition is 'diatonic' or None
+        Returns:
+            a 4-element tuple of (title, DataFrame, set of part names, set of part numbers)
+        """
+        path, table, partnames, partnumbers, transposition, instruments = task
+        if MusicUtils.verbose > 0:
+            print(f"working on {path}")
+        reader = MidiReader.read(path)
+        if transposition == 'diatonic':
+            df, pnames, pnums = reader.get_transposed_notes(partnames=partnames, partnumbers=partnumbers, instruments=instruments)
+        else:
+            df, pnames, pnums = reader.get_notes(partnames, partnumbers)
+        if table == 'intervals' and len(df) > 0:
+            df = MusicUtils.get_intervals_from_notes(df)
+        return reader.title, df, pnames, pnums
+
+    @staticmethod
+    def get_table_tasks(source:str, classinfo=note.Note, partnames=None, partnumbers=None, transposition:str=None, instruments=None) -> [tuple]:
+        """Returns the get_table() task of each MIDI file of a source, in get_midi_paths() order
+
+        The arguments are the same as get_tables().
+        """
+        table = 'notes' if classinfo is note.Note else 'intervals'
+        return [(path, table, partnames, partnumbers, transposition, instruments) for path in MidiReader.get_midi_paths(source)]
+
+    @staticmethod
+    def iter_tables(source:str, classinfo=note.Note, partnames=None, partnumbers=None, transposition:str=None, \
+                    instruments=None, workers:int=None):
+        """Generates the notes or intervals table of each MIDI file of a source, in get_midi_paths() order
+
+        The arguments are the same as get_tables(). A file is read when its table is needed,
+        or with workers a few files ahead, so only a few tables are in memory at once, see MusicUtils.iter_tables().
+        Yields:
+            the result of get_table() for each file, a tuple of (title, DataFrame, set of part names, set of part numbers)
+        """
+        tasks = MidiReader.get_table_tasks(source, classinfo, partnames, partnumbers, transposition, instruments)
+        yield from MusicUtils.iter_tables(MidiReader.get_table, tasks, workers)
+
+    @staticmethod
+    def get_tables(source:str, classinfo=note.Note, partnames=None, partnumbers=None, transposition:str=None, \
+                   instruments=None, workers:int=None) -> (pd.DataFrame,{str},{int},[str]):
+        """Gets the notes or intervals of a MIDI file or of all the MIDI files in a folder, as MusicUtils.get_corpus_tables() does
+
+        Args:
+            source - a MIDI file or a folder, see get_midi_paths()
+            classinfo - note.Note for a notes DataFrame, interval.Interval for an intervals DataFrame
+            partnames, partnumbers - the parts to include, see get_notes()
+            transposition - 'diatonic' to transpose the notes of each file with get_transposed_notes(), None to use the notes as is
+            instruments - music.Instruments instance, if not None part ranges are enforced after a diatonic transposition
+            workers - the number of worker processes. If None the files are read serially in this process.
+        Returns:
+            a 4-element tuple of the combined DataFrame with a 'title' column, the set of part names,
+            the set of part numbers and a list of the titles of the files included.
+        """
+        dfs = []
+        titles = []
+        all_partnames = set()
+        all_partnumbers = set()
+        for score_title, df, pnames, pnums in MidiReader.iter_tables(source, classinfo, partnames, partnumbers, transposition, instruments, workers):
+            titles.append(score_title)
+            if len(df) > 0:
+                df['title'] = score_title
+                dfs.append(df)
+                all_partnames = all_partnames.union(pnames)
+                all_partnumbers = all_partnumbers.union(pnums)
+        tables_df = MusicUtils.compact_table(pd.concat(dfs, ignore_index=True)) if len(dfs) > 0 else pd.DataFrame()
+        return tables_df, all_partnames, all_partnumbers, titles
+
+if __name__ == '__main__':
+    print(MidiReader.__doc__)
@@ -0,0 +1,196 @@
+# ------------------------------------------------------------------------------
+# Name:          midiWriter.py
+# Purpose:       MidiWriter class.
+#
+#                MidiWriter writes Standard MIDI Files directly from
+#                part event arrays, without music21 streams.
+#
+# Authors:      Donald Bacon
+#
+# Copyright:    Copyright 2026 Donald Bacon
+# License:      BSD, see license.txt
+# ------------------------------------------------------------------------------
+
+from music21 import stream, tempo, meter, key, note, chord
+import numpy as np
+import struct
+
+class MidiWriter(object):
+    """Creates a type 1 Standard MIDI File from the (midi pitch, quarterLength) arrays of each part.
+
+    Track 0 is the conductor track with the tempo, time signature and key signature.
+    Each part is a track with its name, a program change and a note on/off pair per note,
+    on its own channel (skipping channel 10, percussion). The file is built in memory
+    and written with a single write() call.
+    write() has the same signature as music21 Score.write(), so a ScoreWriter can export a MidiWriter as a Score.
+    """
+
+    def __init__(self, qpm:float=80.0, time_signature:(int,int)=(4,4), sharps:int=0, mode:str='major', title:str=None, \
+                 ticks_per_quarter:int=480, velocity:int=90):
+        """
+        Parameters:
+            qpm - tempo in quarter notes per minute
+            time_signature - (numerator, denominator)
+            sharps - the number of sharps (> 0) or flats (< 0) of the key signature
+            mode - 'major' or 'minor'
+            title - optional sequence name of the conductor track
+            ticks_per_quarter - the file time division
+            velocity - note on velocity of all the notes
+        """
+        self.qpm = qpm
+        self.time_signature = time_signature
+        self.sharps = sharps
+        self.mode = mode
+        self.title = title
+        self.ticks_per_quarter = ticks_per_quarter
+        self.velocity = velocity
+        self.parts = []         # (name, program, pitches, durations, offsets)
+
+    def __repr__(self):
+        return f"MidiWriter parts={len(self.parts)} qpm={self.qpm} time_signature={self.time_signature}"
+
+    @staticmethod
+    def from_score_settings(ascore_tempo:tempo.MetronomeMark, time_signature:meter.TimeSignature, score_key:key.KeySignature, title:str=None) -> 'MidiWriter':
+        mode = score_key.mode if isinstance(score_key, key.Key) else 'major'
+        return MidiWriter(qpm=ascore_tempo.getQuarterBPM(), time_signature=(time_signature.numerator, time_signature.denominator), \
+                          sharps=score_key.sharps, mode=mode, title=title)
+
+    @staticmethod
+    def from_score(ascore:stream.Score, instruments=None) -> 'MidiWriter':
+        """Creates a MidiWriter from the Notes and Chords of each Part of a Score
+
+        The tempo, time signature and key are the first found in the Score, the default if there are none.
+        The program of a part is that of its Instrument, or of the instruments registry entry of the part name
+        if the Instrument has no midiProgram.
+        Tied notes are written as a single note with the total duration.
+        """
+        flat = ascore.flatten()
+        ascore_tempo = flat.getElementsByClass(tempo.MetronomeMark).first() or tempo.MetronomeMark(number=80)
+        time_signature = flat.getElementsByClass(meter.TimeSignature).first() or meter.TimeSignature('4/4')
+        score_key = flat.getElementsByClass(key.KeySignature).first() or key.KeySignature(0)
+        title = None if ascore.metadata is None else ascore.metadata.title
+        midiWriter = MidiWriter.from_score_settings(ascore_tempo, time_signature, score_key, title)
+        for apart in ascore.parts:
+            pitches = []
+            durations = []
+            offsets = []
+            flat_part = apart.stripTies().flatten()
+            for element in flat_part.notes:
+                element_pitches = [element.pitch] if isinstance(element, note.Note) else element.pitches if isinstance(element, chord.Chord) else []
+                for apitch in element_pitches:
+                    pitches.append(int(apitch.ps))
+                    durations.append(float(element.quarterLength))
+                    offsets.append(float(flat_part.elementOffset(element)))
+            part_instrument = apart.getInstrument(returnDefault=False)
+            program = None if part_instrument is None else part_instrument.midiProgram
+            if program is None and instruments is not None and apart.partName in instruments.index:
+                program = instruments.get_midi_program(apart.partName)
+            midiWriter.add_part(apart.partName, np.array(pitches, dtype=np.int64), np.array(durations, dtype=np.float64), \
+                                program=program, offsets=np.array(offsets, dtype=np.float64))
+        return midiWriter
+
+    def add_part(self, name:str, pitches:np.ndarray, durations:np.ndarray, program:int=None, offsets:np.ndarray=None):
+        """Adds a part track
+
+        Parameters:
+            name - the track name, can be None
+            pitches - int midi pitch numbers. Pitches outside 0 to 127 are moved into that range by octaves
+            durations - float quarterLengths
+            program - General MIDI program number 0 to 127, None for no program change
+            offsets - the float quarterLength offset of each note. If None the notes follow one another
+        """
+        durations = np.asarray(durations, dtype=np.float64)
+        if offsets is None:
+            offsets = np.concatenate(([0.0], np.cumsum(durations)[:-1])) if len(durations) > 0 else durations
+        self.parts.append((name, program, np.asarray(pitches, dtype=np.int64), durations, np.asarray(offsets, dtype=np.float64)))
+
+    @staticmethod
+    def variable_length(value:int) -> bytes:
+        """Encodes an int as a MIDI variable length quantity, 7 bits per byte, most significant first
+
+        """
+        data = [value & 0x7F]
+        value >>= 7
+        while value > 0:
+            data.append((value & 0x7F) | 0x80)
+            value >>= 7
+        return bytes(reversed(data))
+
+    @staticmethod
+    def meta_event(event_type:int, data:bytes) -> bytes:
+        """A delta time 0 meta event
+
+        """
+        return b'\x00\xff' + bytes([event_type]) + MidiWriter.variable_length(len(data)) + data
+
+    @staticmethod
+    def track_chunk(events:bytes) -> bytes:
+        events = events + MidiWriter.meta_event(0x2F, b'')      # end of track
+        return b'MTrk' + struct.pack('>I', len(events)) + events
+
+    def get_conductor_track(self) -> bytes:
+        numerator, denominator = self.time_signature
+        events = bytearray()
+        if self.title is not None:
+            events += MidiWriter.meta_event(0x03, self.title.encode('utf-8'))
+        events += MidiWriter.meta_event(0x51, struct.pack('>I', round(60000000 / self.qpm))[1:])
+        events += MidiWriter.meta_event(0x58, bytes([numerator, denominator.bit_length() - 1, 24, 8]))
+        events += MidiWriter.meta_event(0x59, struct.pack('>bB', max(-7, min(7, self.sharps)), 1 if self.mode == 'minor' else 0))
+        return MidiWriter.track_chunk(bytes(events))
+
+    def get_part_track(self, name:str, program:int, pitches:np.ndarray, durations:np.ndarray, offsets:np.ndarray, channel:int) -> bytes:
+        """Creates the track of a part. Note offs come before note ons at the same time, notes of 0 ticks are dropped
+
+        """
+        events = bytearray()
+        if name is not None:
+            events += MidiWriter.meta_event(0x03, name.encode('utf-8'))
+        if program is not None:
+            events += bytes([0x00, 0xC0 | channel, program & 0x7F])
+        #
+        # times are rounded from the offsets so rounding errors don't accumulate
+        #
+        on_ticks = np.rint(offsets * self.ticks_per_quarter).astype(np.int64)
+        off_ticks = np.rint((offsets + durations) * self.ticks_per_quarter).astype(np.int64)
+        keep = off_ticks > on_ticks
+        pitches = pitches[keep]
+        pitches = np.where(pitches < 0, pitches + 12 * ((11 - pitches) // 12), pitches)
+        pitches = np.where(pitches > 127, pitches - 12 * ((pitches - 116) // 12), pitches)
+        nnotes = len(pitches)
+        ticks = np.concatenate((off_ticks[keep], on_ticks[keep]))
+        is_on = np.concatenate((np.zeros(nnotes, dtype=np.int64), np.ones(nnotes, dtype=np.int64)))
+        order = np.lexsort((is_on, ticks))      # by time, then offs before ons
+        deltas = np.diff(np.concatenate(([0], ticks[order])))
+        statuses = np.where(is_on[order] == 1, 0x90 | channel, 0x80 | channel)
+        velocities = np.where(is_on[order] == 1, self.velocity, 0)
+        keys = np.concatenate((pitches, pitches))[order]
+        variable_length = MidiWriter.variable_length
+        for delta, status, midi, velocity in zip(deltas.tolist(), statuses.tolist(), keys.tolist(), velocities.tolist()):
+            events += variable_length(delta) if delta > 0x7F else bytes([delta])
+            events += bytes([status, midi, velocity])
+        return MidiWriter.track_chunk(bytes(events))
+
+    def to_bytes(self) -> bytes:
+        tracks = [self.get_conductor_track()]
+        channels = [c for c in range(16) if c != 9]
+        for i, (name, program, pitches, durations, offsets) in enumerate(self.parts):
+            tracks.append(self.get_part_track(name, program, pitches, durations, offsets, channels[i % len(channels)]))
+        header = b'MThd' + struct.pack('>IHHH', 6, 1, len(tracks), self.ticks_per_quarter)
+        return header + b''.join(tracks)
+
+    def write(self, fmt:str='midi', fp:str=None) -> str:
+        """Writes the Standard MIDI File to fp in a single write
+
+        Parameters:
+            fmt - ignored, the format is always MIDI. For compatibility with music21 Score.write()
+            fp - the file name
+        Returns:
+            the file name
+        """
+        data = self.to_bytes()
+        with open(fp, 'wb') as f:
+            f.write(data)
+        return fp
+
+if __name__ == '__main__':
+    print(MidiWriter.__doc__)
@@ -11,8 +11,13 @@
 # ------------------------------------------------------------------------------
 
 from common.collector import Collector
+from common.chainCounts import ChainCounts
+from common.markovChain import MarkovChain
 from music.instruments import Instruments
+from music.musicUtils import MusicUtils
+from concurrent.futures import ProcessPoolExecutor
 import music
+import numpy as np
 import pandas as pd
 
 class MusicCollector(Collector):
@@ -25,6 +30,9 @@ class MusicCollector(Collector):
         self.corpus_folder="/Compile/music21/music21/corpus"    # the default corpus folder
         self.terminal_object = None     # set in derived classes
         self.initial_object = None      # set in derived classes
+        self.key_separator = ','       # keys are comma-delimited as in "A4,G4"
+        self.layout = 'wide'           # counts_df has a KEY index and a column for each next token
+        self.probability_places = 6    # chain_df probabilities are rounded to this many decimal places
         self.score = None       # if source is a single Score
         self.scores = []        # a list of Score if collecting from a corpus
         self.titles = []        # the titles of all Score(s)
@@ -35,6 +43,10 @@ class MusicCollector(Collector):
         self.score_partNames = set()       # the part names extracted from the score or scores
         self.durationCollector = None
         self.durations_df = None
+        self._chain_counts = None   # ChainCounts accumulated by process(), see add_count()
+        self.score_cache = None     # a ScoreCache of the DataFrames extracted from scores, None to parse every score
+        self.corpus_index = None    # a CorpusIndex used to find corpus scores, None to search the corpus
+        self.table_filename = None  # if not None, sharded collection writes the source tables to this csv file, see collect_shards()
         if parts is not None:
             self.add_parts(parts)
         self.enforceRange = True
@@ -76,17 +88,260 @@ class MusicCollector(Collector):
     def collect(self):  # implement in derived classes
         return None
     
+    def add_count(self, index_str:str, col_val):
+        """Counts one occurrence of a key and its next token
+        
+        The counts accumulate in a ChainCounts, so each event is a constant time dict update
+        instead of a write to (and copy of) the counts_df DataFrame. The counts_df is created once
+        by materialize_counts() when collection is complete.
+        """
+        if self._chain_counts is None:
+            self._chain_counts = ChainCounts(self.order, self.key_separator)
+        self._chain_counts.add(index_str, col_val)
+    
+    def materialize_counts(self) -> pd.DataFrame:
+        """Creates the counts_df DataFrame from the counts accumulated by add_count()
+        
+        The rows and columns are in order of first appearance, as adding them to a DataFrame one at a time does.
+        """
+        if self._chain_counts is not None:
+            self.counts_df = self._chain_counts.to_dataframe('wide')
+            self._chain_counts = None
+        return self.counts_df
+    
+    def get_source_df(self) -> pd.DataFrame:
+        """Returns the notes_df or intervals_df DataFrame being collected, implement in derived classes
+        
+        """
+        return None
+    
+    def get_token_column(self) -> str:
+        """Returns the source DataFrame column of the tokens used in MarkovChain keys, implement in derived classes
+        
+        """
+        return None
+    
+    def get_tokens(self, df:pd.DataFrame) -> list:
+        """Returns the str tokens, the same values used in MarkovChain keys, of the rows of a source DataFrame.
+        
+        """
+        return [str(x) for x in df[self.get_token_column()]]
+    
+    @staticmethod
+    def is_corpus_search(source:str) -> bool:
+        return 'composer' in source or 'title' in source
+    
+    @staticmethod
+    def get_corpus_search(source:str) -> (str, str):
+        """Returns the composer and title of a corpus search source such as "composer=bach,title=^bwv4+"
+        
+        """
+        title = None
+        composer = None
+        search_string = source.split(",", maxsplit=1)    # title can be a regular expression with embedded commas
+        for ss in search_string:
+            st = ss.split('=')
+            if st[0] == 'composer':
+                composer = st[1]
+            elif st[0] == 'title':
+                title = st[1]
+        return composer, title
+    
+    def get_table_tasks(self) -> list:
+        """Returns a (get_table, task) for each score or MIDI file of the source in source order, implement in derived classes
+        
+        get_table is MusicUtils.get_score_table or MidiReader.get_table, which reads the score or file of a task
+        and returns its (title, DataFrame, set of part names, set of part numbers), or None if it does not match the filters.
+        """
+        return []
+    
+    @staticmethod
+    def count_shard(shard) -> tuple:
+        """Reads a contiguous range of the scores or MIDI files of the source and counts the keys of their parts,
+        each part a separate sequence continued by the part of the same name in the next score.
+        
+        This runs in a worker process, so the scores are parsed and their tables extracted here
+        and only the counts and durations are returned to the parent.
+        Parameters:
+            shard - a tuple of ([(get_table, task)], token column, order, key_separator, keep_tables), see get_table_tasks()
+        Returns:
+            a 4-element tuple of the ChainCounts, an array of the quarterLengthNoTuplets of the notes in source order,
+            a list of the (title, set of part names, set of part numbers) of each score, None if it does not match the filters,
+            and a list of the tables of the scores if keep_tables is True, otherwise None.
+        """
+        tasks, column, order, key_separator, keep_tables = shard
+        counts = ChainCounts(order, key_separator)
+        durations = []
+        scores = []
+        tables = [] if keep_tables else None
+        for get_table, task in tasks:
+            result = get_table(task)
+            if result is None:
+                scores.append(None)
+                continue
+            score_title, df, pnames, pnums = result
+            if len(df) == 0:
+                scores.append((score_title, set(), set()))
+                continue
+            scores.append((score_title, pnames, pnums))
+            for pname in pd.unique(df['part_name']):
+                counts.add_sequence([str(x) for x in df.loc[df['part_name']==pname, column]], name=pname)
+            durations.append(df['quarterLengthNoTuplets'].to_numpy(dtype=MusicUtils.notes_table_dtypes['quarterLengthNoTuplets']))
+            if keep_tables:
+                tables.append(df)
+        durations = np.concatenate(durations) if len(durations) > 0 else np.empty(0, dtype=MusicUtils.notes_table_dtypes['quarterLengthNoTuplets'])
+        return counts, durations, scores, tables
+    
+    def get_shards(self) -> list:
+        """Splits the scores or MIDI files of the source into contiguous ranges to read and count in worker processes
+        
+        Only the score paths and table settings are sent to the workers. There are up to 4 x workers shards
+        so that the workers given the longest scores do not hold up the others.
+        """
+        tasks = self.get_table_tasks()
+        nshards = min(len(tasks), 4 * self.workers)
+        bounds = [round(i * len(tasks) / nshards) for i in range(nshards + 1)] if nshards > 0 else [0]
+        return [(tasks[bounds[i]:bounds[i+1]], self.get_token_column(), self.order, self.key_separator, self.table_filename is not None) \
+                for i in range(nshards)]
+    
+    def collect_shards(self, shards:list) -> ChainCounts:
+        """Reads and counts each shard in a separate process and merges the results in shard order
+        
+        The durations of the scores are added to a new durationCollector, see start_durations(),
+        and the titles, part names and part numbers are set as set_source() does.
+        If table_filename is not None the tables of the scores are written to that csv file.
+        The merged ChainCounts are identical to counting the scores serially.
+        """
+        if self.verbose > 0:
+            print(f"collecting {len(shards)} shards using {self.workers} workers")
+        counts = ChainCounts(self.order, self.key_separator)
+        self.start_durations()
+        self.titles = []
+        tables_written = False
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=MusicUtils._set_verbose, initargs=(MusicUtils.verbose,)) as executor:
+            for shard_counts, durations, scores, tables in executor.map(self.count_shard, shards):
+                counts.merge(shard_counts)
+                if len(durations) > 0:
+                    self.durationCollector.add_durations(pd.DataFrame({'quarterLength' : durations}))
+                for score in scores:
+                    if score is not None:
+                        score_title, pnames, pnums = score
+                        self.titles.append(score_title)
+                        self.score_partNames = self.score_partNames.union(pnames)
+                        self.score_partNumbers = self.score_partNumbers.union(pnums)
+                for df in tables or []:
+                    df.to_csv(path_or_buf=self.table_filename, mode='a' if tables_written else 'w', header=not tables_written)
+                    tables_written = True
+        if tables_written:
+            print(f"notes: {self.table_filename}")
+        return counts
+    
+    def collect_sharded(self) -> MarkovChain:
+        """Collects the scores or MIDI files of the source in worker processes, see get_shards()
+        
+        The notes or intervals tables of the scores are not returned to this process unless table_filename is set,
+        so the source DataFrame is not available, as in streaming collection.
+        """
+        counts = self.finish_counts(self.collect_shards(self.get_shards()))
+        self.counts_df = counts.to_dataframe('wide')
+        return self._create_music_chain(None)
+    
+    def finish_counts(self, counts:ChainCounts) -> ChainCounts:
+        """Adds the initial and terminal keys of each part to merged counts, as collect() does
+        
+        The initial key of a part is the initial_object followed by the first order-1 tokens
+        and it replaces the first key of the part. The terminal_object follows the last key of the part.
+        """
+        initial_token = self.get_tokens(self.initial_object)[0]
+        terminal_token = self.get_tokens(self.terminal_object)[0]
+        separator = counts.key_separator
+        for pname, head in counts.heads.items():
+            if counts.lengths[pname] > self.order:
+                counts.add(separator.join(head[:self.order]), head[self.order], -1)
+                counts.add(separator.join([initial_token] + head[:self.order-1]), head[self.order])
+            counts.add(separator.join(counts.tails[pname]), terminal_token)
+        return counts
+    
+    def _create_music_chain(self, source_df:pd.DataFrame) -> MarkovChain:
+        """Creates the MarkovChain from counts_df and then collects the durations of source_df
+        If source_df is None the durations were added as the source was collected, see start_durations()
+        
+        """
+        self.counts_df.rename_axis('KEY', inplace=True)
+        if self.sort_chain:
+            self.counts_df.sort_index(axis=0, ascending=True, inplace=True)
+            self.counts_df.sort_index(axis=1, ascending=True, inplace=True)
+        #
+        # create the MarkovChain from the counts by summing probabilities
+        #
+        sums = self.counts_df.sum(axis=1)
+        self.chain_df = self.counts_df.div(sums, axis=0)
+        self.chain_df.rename_axis('KEY', inplace=True)
+        self.chain_df = self.chain_df.map(lambda x: MusicUtils.round_values(x, self.probability_places))
+        
+        self.markovChain = MarkovChain(self.order, self.counts_df,  chain_df=self.chain_df, myname=self.name)
+        
+        if self.verbose > 1:
+            print(f" Counts:\n {self.counts_df}")
+            print(f" MarkovChain:\n {self.markovChain}")
+            if self.verbose > 1:
+                print(self.markovChain.__repr__())
+        #
+        # collect durations from the Score and notes_df DataFrame
+        #
+        self.collect_durations(source_df)
+        return self.markovChain
+    
     def collect_durations(self, source:pd.DataFrame ):
-        self.durationCollector = music.DurationCollector(self.order, self.verbose, source, self.parts)
+        """Collects the durations of a notes or intervals DataFrame.
+        If source is None the durations were already added to the durationCollector, see start_durations()
+        
+        """
+        if source is not None or self.durationCollector is None:
+            self.durationCollector = music.DurationCollector(self.order, self.verbose, source, self.parts)
         self.durationCollector.score = self.score
         if self.name is not None and len(self.name) > 0:
             self.durationCollector.name = self.name
         self.durationCollector.format = self.format
         self.durationCollector.sort_chain = self.sort_chain
-        run_results = self.durationCollector.run()
+        if self.updating:
+            run_results = self.durationCollector.update()
+        else:
+            run_results = self.durationCollector.run()
         self.durations_df = self.durationCollector.durations_df
         return run_results
     
+    def start_durations(self):
+        """Creates an empty durationCollector to add the durations of scores to one at a time with add_durations()
+        
+        """
+        self.durationCollector = music.DurationCollector(self.order, self.verbose, None, self.parts)
+        self.durations_df = None
+    
+    def merge_counts(self, counts_df:pd.DataFrame, chain_df:pd.DataFrame) -> MarkovChain:
+        """Adds previously saved counts to the counts_df of newly collected material, wide layout
+        
+        Only the chain_df rows of keys in the new material are recomputed.
+        """
+        changed_keys = self.counts_df.index
+        if self.counts_df.columns.inferred_type == 'floating':    # duration tokens are read as str from csv and json files
+            counts_df.columns = counts_df.columns.astype(float)
+            chain_df.columns = chain_df.columns.astype(float)
+        merged_df = counts_df.add(self.counts_df, fill_value=0).fillna(0)
+        merged_df.rename_axis('KEY', inplace=True)
+        if self.sort_chain:
+            merged_df.sort_index(axis=0, ascending=True, inplace=True)
+            merged_df.sort_index(axis=1, ascending=True, inplace=True)
+        self.counts_df = merged_df
+        
+        self.chain_df = chain_df.reindex(index=merged_df.index, columns=merged_df.columns, fill_value=0.0)
+        changed_df = merged_df.loc[changed_keys]
+        changed_df = changed_df.div(changed_df.sum(axis=1), axis=0)
+        self.chain_df.loc[changed_keys] = changed_df.map(lambda x: MusicUtils.round_values(x, self.probability_places))
+        self.chain_df.rename_axis('KEY', inplace=True)
+        self.markovChain = MarkovChain(self.order, self.counts_df,  chain_df=self.chain_df, myname=self.name)
+        return self.markovChain
+    
     def save(self):
         save_result = super().save()
         return save_result
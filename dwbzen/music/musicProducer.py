@@ -10,13 +10,34 @@
 
 import music
 from common.producer import Producer
+from common.markovChain import MarkovChain
+from common.internedChain import InternedChain
+from common.chainSampler import ChainSampler
+from common.aliasSampler import AliasSampler
 from music.musicUtils import MusicUtils
+from music.midiWriter import MidiWriter
 import pandas as pd
-import random, math, sys
-from music21 import note, clef, stream, interval, tempo, meter, key, metadata
+import numpy as np
+import random, math, sys, copy, time
+from concurrent.futures import ProcessPoolExecutor
+from music21 import note, clef, stream, interval, tempo, meter, key, metadata, pitch
 
 class MusicProducer(Producer):
     """Produce music from interval, notes or scale degree MarkovChains.
+    
+    Both the notes/intervals chain and the durations chain are compiled when the producer is created
+    into per-state next tokens and cumulative probabilities. The tokens are parsed to int semitones,
+    note names and float quarterLengths, and seeds are tuples, so picking a note and its duration
+    is a lookup and a binary search in each chain.
+    
+    In event_mode a part is produced as arrays of midi pitch numbers and quarterLengths
+    using integer arithmetic for intervals and instrument ranges. Notes are created from the arrays
+    only when a Score is needed, and not at all by produce_events().
+    
+    If workers is set, each part is produced as event arrays in a worker process with its own random number generator,
+    seeded from rand_seed and the part position, and the Score is assembled from the parts when all are done.
+    The result is the same for any number of workers. It is not the same as producing the parts serially
+    (workers None), which uses the random module seeded with rand_seed.
 
     Known Issues: 
       Reading durations_chain in json format is incorrect. Currently the columns are interpreted as datetime values, should be int.
@@ -31,14 +52,18 @@ class MusicProducer(Producer):
         self.show = None
         self.producerType = producerType
 
-        self.score = stream.Score()
-        self.score.insert(0, metadata.Metadata())
+        self.score = None
+        self.new_score()
+        self.batch_stats = None         # throughput of the last produce_scores()
         self.parts = parts                  # comma-delimited filter part names from the command line
         self.produceParts = produceParts    # comma-delimited production part names (instruments) from the command line
         self.part_names, self.part_numbers = MusicProducer.get_parts(parts)
         self.producePart_names = produceParts
         
+        if isinstance(durationsChain, InternedChain):
+            durationsChain = MarkovChain.from_interned(durationsChain)
         self.durationsChain = durationsChain
+        self.key_separator = ','
         self.collection_mode = collection_mode
         self.pitch_class_mode = (collection_mode == 'dpc' or collection_mode == 'apc')
         self.pitch_mode =  (collection_mode == 'dp' or collection_mode == 'ap')
@@ -48,6 +73,8 @@ class MusicProducer(Producer):
         self.fixed_duration = None   # duration.Duration(quarterLength=0.5)
         
         self._set_keys()
+        self.compile_sampler()
+        self.compile_durations_sampler()
         self.raw_seed = None
         self.score_key = key.Key('C')
 
@@ -65,8 +92,35 @@ class MusicProducer(Producer):
         self.num_measures = self.num        # number of measures to produce
         self.enforceRange = False           # force instruments to their range
         self.trace_mode = False             # displays the notes/intervals as they are produced
+        self.event_mode = False             # produce parts as midi pitch and quarterLength arrays, see produce_events()
+        self.part_events = None             # the (pitches, durations) of each part from the last produce_events()
+        self.rand_seed = rand_seed
+        self.workers = None                 # number of worker processes to produce the parts with, None to produce them serially
+        self._rng = None                    # the random.Random of the part being produced in parallel, None to use the random module
+        self._executor = None               # the worker process pool of produce_scores(), None to create one for each produce()
 
     
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_executor'] = None           # a worker process pool is not sent to the workers
+        return state
+
+    def new_score(self) -> stream.Score:
+        """Creates the empty Score that produce() adds the parts to
+        
+        """
+        self.score = stream.Score()
+        self.score.insert(0, metadata.Metadata())
+        return self.score
+    
+    @property
+    def rng(self):
+        """The random number generator used to pick seeds and next tokens
+        
+        This is the random module, seeded with rand_seed, unless the parts are produced in parallel.
+        """
+        return random if self._rng is None else self._rng
+    
     @staticmethod
     def get_parts(parts:str) -> ([str],[int]):
         part_names = []
@@ -118,13 +172,115 @@ collectionMode = {self.collection_mode}, parts={self.parts}, produce={self.produ
             elif self.collection_mode == 'sd':
                 initstr = '1'
         
-        self._keys = pd.Series(self.chain_df.index)
+        self._keys = MusicProducer.get_chain_keys(self.markovChain)
         self._key_values = self._keys.values
         self._initial_keys = self._keys[self._keys.apply(lambda x: x.startswith(initstr))]
         
-        self._durationKeys = pd.Series(self.durationsChain.chain_df.index)
+        self._durationKeys = MusicProducer.get_chain_keys(self.durationsChain)
         self._durations_key_values = self._durationKeys.values
 
+    @staticmethod
+    def get_chain_keys(markovChain:MarkovChain) -> pd.Series:
+        """Returns the keys of a (wide layout) MarkovChain, from its InternedChain if it has one so the chain_df isn't created
+        
+        """
+        if markovChain.interned is not None:
+            return pd.Series(list(markovChain.interned.get_key_sequence()), dtype=object)
+        return pd.Series(markovChain.chain_df.index)
+    
+    @staticmethod
+    def get_chain_sampler(markovChain:MarkovChain) -> ChainSampler:
+        """Creates the ChainSampler of a (wide layout) MarkovChain, from the arrays of its InternedChain if it has one
+        
+        """
+        if markovChain.interned is not None:
+            return ChainSampler.from_interned(markovChain.interned)
+        return ChainSampler.from_wide(markovChain.chain_df)
+    
+    def parse_key(self, key) -> tuple:
+        """Parses a notes or intervals chain key, or a seed string, to a tuple of tokens
+        
+        For example "A4,G4" --> ('A4', 'G4') for notes and "-2,1" --> (-2, 1) for intervals.
+        """
+        if self.producerType == 'intervals':
+            return tuple(int(math.trunc(float(x))) for x in str(key).split(self.key_separator))
+        return tuple(str(key).split(self.key_separator))
+    
+    def parse_token(self, token):
+        if self.producerType == 'intervals':    # intervals can only be integers (for now)
+            return int(math.trunc(float(token)))
+        return token
+    
+    @staticmethod
+    def parse_duration_key(key) -> tuple:
+        """Parses a durations chain key to a tuple of quarterLengths, for example "0.5,1.0" --> (0.5, 1.0)
+        
+        The order 1 durations chain keys are floats instead of strings, 0.5 --> (0.5,)
+        """
+        return tuple(float(x) for x in str(key).split(','))
+    
+    @staticmethod
+    def compile_chain(sampler:ChainSampler, parse_key, parse_token) -> (list, list, dict):
+        """Parses the keys and tokens of a compiled (wide layout) chain so producing a note needs no string handling
+        
+        Arguments:
+            sampler - a ChainSampler created from a wide layout chain_df
+            parse_key - function that parses a key to a seed tuple
+            parse_token - function that parses a next token
+        Returns:
+            a 3-element tuple: the parsed next token of each sampler row, the seed tuple that follows each sampler row,
+            and a dict of seed tuple : sampler state id
+        """
+        seeds = [parse_key(k) for k in sampler.keys]
+        seed_states = {seed:state for state,seed in enumerate(seeds)}
+        tokens = [parse_token(t) for t in sampler.tokens]
+        row_states = sampler.get_row_states()
+        next_seeds = [seeds[row_states[row]][1:] + (tokens[row],) for row in range(len(tokens))]
+        return tokens, next_seeds, seed_states
+    
+    def compile_sampler(self) -> ChainSampler:
+        """Creates the sampler for the (wide layout) notes or intervals chain_df
+        
+        The sampling_engine determines the sampler: a ChainSampler for 'cumulative', an AliasSampler for 'alias'.
+        The next tokens are parsed to int semitones (intervals) or note/scale degree names (notes).
+        """
+        sampler = MusicProducer.get_chain_sampler(self.markovChain)
+        self._tokens, self._next_seeds, self._seed_states = MusicProducer.compile_chain(sampler, self.parse_key, self.parse_token)
+        self.sampler = AliasSampler.from_sampler(sampler) if self.sampling_engine == 'alias' else sampler
+        return self.sampler
+    
+    def compile_durations_sampler(self) -> ChainSampler:
+        """Creates the sampler for the durations chain_df. The next tokens are parsed to float quarterLengths
+        
+        The sampling_engine determines the sampler as in compile_sampler().
+        """
+        sampler = MusicProducer.get_chain_sampler(self.durationsChain)
+        self._durations_tokens, self._durations_next_seeds, self._durations_seed_states = \
+            MusicProducer.compile_chain(sampler, MusicProducer.parse_duration_key, float)
+        self.durations_sampler = AliasSampler.from_sampler(sampler) if self.sampling_engine == 'alias' else sampler
+        return self.durations_sampler
+    
+    def set_sampling_engine(self, engine:str) -> ChainSampler:
+        """Sets the sampling engine and compiles the notes or intervals sampler and the durations sampler
+        
+        """
+        sampler = super().set_sampling_engine(engine)
+        self.compile_durations_sampler()
+        return sampler
+    
+    def get_state(self, seed) -> int:
+        """Returns the notes or intervals sampler state id of a seed tuple or a chain key, -1 if not present
+        
+        """
+        if isinstance(seed, tuple):
+            return self._seed_states.get(seed, -1)
+        return self.sampler.get_state(seed)
+    
+    def get_durations_state(self, seed) -> int:
+        if isinstance(seed, tuple):
+            return self._durations_seed_states.get(seed, -1)
+        return self.durations_sampler.get_state(seed)
+    
     def get_seed(self, aseed=None):
         theseed = self.seed
         if self.seed is None:
@@ -133,17 +289,17 @@ collectionMode = {self.collection_mode}, parts={self.parts}, produce={self.produ
                 theseed = aseed
             elif self.initial:
                 # pick a seed that starts a Part
-                ind = random.randint(0, len(self.initial_keys)-1)
-                theseed = self.initial_keys.iloc[ind]
+                ind = self.rng.randint(0, len(self._initial_keys)-1)
+                theseed = self._initial_keys.iloc[ind]
             else:
                 # pick any old seed from the chain's index
-                ind = random.randint(0, len(self.keys)-1)
-                theseed = self.keys.iloc[ind]
+                ind = self.rng.randint(0, len(self._keys)-1)
+                theseed = self._keys.iloc[ind]
         return theseed
     
     def get_durations_seed(self):
             # pick any old seed from the durations chain's index
-            return self._durationKeys[random.randint(0, len(self._durationKeys)-1)]
+            return self._durationKeys[self.rng.randint(0, len(self._durationKeys)-1)]
         
     def set_seed(self, raw_seed, collector_type):
         """Creates a seed for Notes or Intervals from a list
@@ -182,38 +338,26 @@ collectionMode = {self.collection_mode}, parts={self.parts}, produce={self.produ
         """Gets the next Note or Interval based on the seed argument
         
         Args:
-            seed: The seed value to look up in the MarkovChain.
+            seed: The seed value to look up in the MarkovChain, a seed tuple or a chain key.
         
         Returns:
-            Both the next Note or Interval and a new seed as a dict with keys 'new_seed' and 'next_token'
-            The type of the next object returned is determined by self.type ('Notes' or 'Intervals')
+            Both the next Note or Interval and a new seed tuple as a dict with keys 'new_seed' and 'next_token'
+            The type of the next object returned is determined by self.producerType: a note or scale degree name
+            for 'notes', int semitones for 'intervals'. The values are None if the seed is not in the MarkovChain.
         """
         
         new_seed = None
         next_token = None
         if self.trace_mode:
             print(f"get_next_object(seed): \"{seed}\"")
-        if seed in self._key_values:
-            row = self.chain_df.loc[seed]
-            row_probs = row[row > 0].cumsum()
-            # given a probability, pick the first entry in the row_probs (cumulative probabilities)
-            # having a probability > the random probability
-            # 
-            prob = random.random()
-            p = row_probs[row_probs> prob].iat[0]
-            nt = row_probs[row_probs> prob].index[0]
-            
-            if self.producerType == 'intervals':    # intervals can only be integers (for now)
-                ns = [int(x) for x in seed.split(',')]
-                next_token = int(math.trunc(float(nt)))
-            else:   # 'notes'
-                ns = seed.split(',')
-                next_token = nt
-                
-            ns.append(next_token)
-            new_seed =  MusicUtils.to_string(ns[1:])
+        state = self.get_state(seed)
+        if state >= 0:
+            prob = self.rng.random()
+            row = self.sampler.sample_row(state, prob)
+            next_token = self._tokens[row]
+            new_seed = self._next_seeds[row]
             if self.verbose > 1:
-                print(f"random prob: {prob}, row prob: {p}, seed: '{seed}', next_token: '{next_token}', new_seed: '{new_seed}'")
+                print(f"random prob: {prob}, row prob: {self.sampler.probs[row]}, seed: '{seed}', next_token: '{next_token}', new_seed: '{new_seed}'")
         
         return dict([ ('next_token', next_token), ('new_seed',new_seed)])
     
@@ -221,19 +365,14 @@ collectionMode = {self.collection_mode}, parts={self.parts}, produce={self.produ
         """Gets the next Duration based on the seed argument
         
         Args:
-            seed: The seed value to look up in the durations MarkovChain.
+            seed: The seed value to look up in the durations MarkovChain, a seed tuple or a chain key.
         
         Returns:
-            Both the next duration and a new seed as a dict with keys 'new_seed' and 'next_token'
-            The type of the next object returned is determined by self.type ('Notes' or 'Intervals')
+            Both the next duration (a float quarterLength) and a new seed tuple as a dict with keys 'new_seed' and 'next_token'
+            The values are None if the seed is not in the durations MarkovChain.
             
             self.fixed_duration is not None, that is returned as 'next_token'
             and the seed argument is returned as 'new_seed'
-            
-        TODO - this doesn't work for order=1 chains, and it looks like it only works for order=2
-        get_next_object probably has same problem.
-        The problem is the durations chain keys for order 1 is a float instead of a string.
-        
         """
         new_seed = None
         next_token = None
@@ -243,30 +382,14 @@ collectionMode = {self.collection_mode}, parts={self.parts}, produce={self.produ
             next_token = self.fixed_duration
             new_seed = seed
         else:
-            if seed in self._durations_key_values:
-                row = self.durationsChain.chain_df.loc[seed]
-                row_probs = row[row > 0].cumsum()
-                # given a probability, pick the first entry in the row_probs (cumulative probabilities)
-                # having a probability > the random probability
-                # 
-                prob = random.random()
-                p = row_probs[row_probs> prob].iat[0]
-                next_token = float(row_probs[row_probs> prob].index[0])
-                #
-                # this next bit is needed because order=1 duration chain index (seed variable) is float instead of str
-                # so it's a hack until that can be fixed
-                #
-                if isinstance(seed, float):
-                    ns = seed   # a single float value
-                    new_seed = next_token
-                else:
-                    ns = [float(x) for x in seed.split(',')]
-                    ns.append(next_token)
-                    new_seed = str(ns[1:]).replace(' ', '')
-                    new_seed = new_seed[1:len(new_seed)-1]   # drop the []
-                    
+            state = self.get_durations_state(seed)
+            if state >= 0:
+                prob = self.rng.random()
+                row = self.durations_sampler.sample_row(state, prob)
+                next_token = self._durations_tokens[row]
+                new_seed = self._durations_next_seeds[row]
                 if self.verbose > 1:
-                    print(f"random prob: {prob}, row prob: {p}, seed: '{seed}', next_token: '{next_token}', new_seed: '{new_seed}'")
+                    print(f"random prob: {prob}, row prob: {self.durations_sampler.probs[row]}, seed: '{seed}', next_token: '{next_token}', new_seed: '{new_seed}'")
                     
         return dict([ ('next_token', next_token), ('new_seed',new_seed)])
     
@@ -274,8 +397,50 @@ collectionMode = {self.collection_mode}, parts={self.parts}, produce={self.produ
     def produce(self):
         """Produce a Score from a MarkovChain
         
+        In event_mode the parts are produced as (midi pitch, quarterLength) arrays
+        and the Notes are created from the arrays when the Score is assembled.
         """
+        parts_produced = self.produce_parts()
+        for pname, produced in zip(self.producePart_names, parts_produced):    # the part name must also be a valid Instrument
+            part = stream.Part()
+            clef = self.instruments.get_instrument_clef(pname)
+            part_instrument = self.instruments.get_instrument(pname)
+
+            #
+            # each part has its own copies so the parts and Scores produced don't share objects
+            #
+            part.insert(copy.deepcopy(clef))
+            part.insert(copy.deepcopy(self.tempo))
+            part.insert(copy.deepcopy(part_instrument))
+            part.insert(copy.deepcopy(self.score_key))
+            part.insert(copy.deepcopy(self.timeSignature))
+            
+            part_notes = MusicProducer.get_event_notes(*produced) if self.event_mode else produced
+            part.append(part_notes)
+            self.score.append(part)
+        
+        return self.score
+    
+    def produce_events(self) -> [(np.ndarray, np.ndarray)]:
+        """Produce the parts as (midi pitch, quarterLength) arrays without creating any music21 objects
         
+        Returns:
+            a list of (pitches, durations) for each part in producePart_names order,
+            int midi pitch numbers and float quarterLengths. The result is also saved in self.part_events
+        """
+        event_mode = self.event_mode
+        self.event_mode = True
+        try:
+            self.part_events = self.produce_parts()
+        finally:
+            self.event_mode = event_mode
+        return self.part_events
+    
+    def produce_parts(self) -> list:
+        """Produce the notes of each part, or (pitches, durations) arrays in event_mode, in producePart_names order
+        
+        All the parts start from the same initial seed. If workers is set the parts are produced in parallel.
+        """
         initial_seed = self.get_seed(self.seed)      # get the initial seed
         seed = initial_seed
         durations_seed = self.get_durations_seed()
@@ -284,41 +449,124 @@ collectionMode = {self.collection_mode}, parts={self.parts}, produce={self.produ
         if self.verbose > 2:
             print(f" MarkovChain:\n {self.markovChain}")
         #
-        # partNotes_dict = dict(),  key is part name, value is [note.Note]
-        #
         # total duration is sum of quarter lengths of all measures
         #
         total_duration = self.num_measures * self.timeSignature.numerator * self.timeSignature.beatDuration.quarterLength
-        
-        for pname in self.producePart_names:    # the part name must also be a valid Instrument
+        if self.workers is not None:
+            return self.produce_parallel(seed, total_duration)
+        parts_produced = []
+        for pname in self.producePart_names:
             if self.verbose > 0:
-                print(f"---- Starting {pname} part")            
-            part = stream.Part()
-            clef = self.instruments.get_instrument_clef(pname)
-            part_instrument = self.instruments.get_instrument(pname)
+                print(f"---- Starting {pname} part")
+            parts_produced.append(self.produce_part(pname, seed, total_duration))
+        return parts_produced
+    
+    def produce_scores(self, num_scores:int, rand_seed=None, events=False):
+        """Produce a number of Scores from the same MarkovChains, each with a distinct random seed
+        
+        This is a generator, each Score is yielded as soon as it's produced. The random seed of each Score
+        is spawned from rand_seed, so a batch is reproducible and a Score can be produced again by itself
+        with rand_seed set to the seed yielded with it. If rand_seed is None fresh entropy is used.
+        If events is True, the part events of produce_events() are yielded instead of a Score.
+        If workers is set, one pool of worker processes produces the parts of all the Scores. The workers get a copy
+        of the producer when the pool starts, so the producer settings must not be changed during the batch.
+        Yields:
+            a 3-element tuple (position, random seed, Score or part events)
+        The throughput of the batch (scores, notes, seconds) is saved in self.batch_stats
+        """
+        start_time = time.perf_counter()
+        sequences = np.random.SeedSequence(rand_seed).spawn(num_scores)
+        num_notes = 0
+        self.batch_stats = {'scores':0, 'notes':0, 'seconds':0.0}
+        if self.workers is not None:
+            self._executor = self.get_executor()
+        try:
+            for i, sequence in enumerate(sequences):
+                score_seed = int(sequence.generate_state(1, dtype=np.uint64)[0])
+                random.seed(score_seed)
+                self.rand_seed = score_seed     # the parts produced in parallel are seeded from this
+                if events:
+                    score = self.produce_events()
+                    num_notes = num_notes + sum(len(pitches) for pitches,_ in score)
+                else:
+                    self.new_score()
+                    score = self.produce()
+                    num_notes = num_notes + sum(len(part.notes) for part in score.parts)
+                self.batch_stats = {'scores':i+1, 'notes':num_notes, 'seconds':time.perf_counter() - start_time}
+                yield i, score_seed, score
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+    
+    def produce_part(self, pname, seed, total_duration):
+        """Produce a part, returns a list of Note or, in event_mode, a (pitches, durations) tuple of arrays
+        
+        """
+        if self.event_mode:
+            return self.produce_part_events(pname, seed, total_duration)
+        part_notes = []
+        if self.producerType == 'intervals':
+            part_notes = self.produce_intervals(pname, seed, total_duration)
+        elif self.producerType == 'notes':
+            part_notes = self.produce_notes(pname, seed, total_duration)
+        return part_notes
+    
+    def get_part_seeds(self) -> [int]:
+        """Returns a random seed for each part to produce, derived from rand_seed and the part position
+        
+        The seeds are spawned from a numpy SeedSequence, so the parts' random streams are independent
+        and don't depend on how the parts are scheduled. If rand_seed is None fresh entropy is used.
+        """
+        sequences = np.random.SeedSequence(self.rand_seed).spawn(len(self.producePart_names))
+        return [int(sequence.generate_state(1, dtype=np.uint64)[0]) for sequence in sequences]
+    
+    def get_executor(self) -> ProcessPoolExecutor:
+        """Returns a pool of worker processes, each with a copy of this producer
 
-            part.insert(clef)
-            part.insert(self.tempo)
-            part.insert(part_instrument)
-            part.insert(self.score_key)
-            part.insert(self.timeSignature)
-            part_notes = []
-            
-            if self.producerType == 'intervals':
-                part_notes = self.produce_intervals(pname, seed, total_duration)
-            elif self.producerType == 'notes':
-                part_notes = self.produce_notes(pname, seed, total_duration)
-            
-            #
-            # add rests to pad the last measure(s) of each part
-            # so all parts have the same total duration (in terms of quarter lengths)
-            # 
-            if self.verbose > 0:
-                print(f"---- End of {pname} part")
-            part.append(part_notes)
-            self.score.append(part)
+        """
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=MusicProducer._set_worker_producer, initargs=(self,))
+    
+    def produce_parallel(self, seed, total_duration) -> list:
+        """Produces the notes of each part in worker processes, each with its own random stream
         
-        return self.score
+        The workers return the (pitches, durations) arrays of a part and the Notes are created here.
+        The pool of produce_scores() is used if there is one, otherwise a pool is created for the parts.
+        Returns:
+            a list of the [note.Note] of each part, or (pitches, durations) in event_mode, in producePart_names order
+        """
+        tasks = [(pname, seed, total_duration, part_seed) for pname, part_seed in zip(self.producePart_names, self.get_part_seeds())]
+        if self.verbose > 0:
+            print(f"producing {len(tasks)} parts using {self.workers} workers")
+        if self._executor is not None:
+            part_events = list(self._executor.map(MusicProducer.produce_part_task, tasks))
+        else:
+            with self.get_executor() as executor:
+                part_events = list(executor.map(MusicProducer.produce_part_task, tasks))
+        if self.event_mode:
+            return part_events
+        return [MusicProducer.get_event_notes(pitches, durations) for pitches, durations in part_events]
+    
+    _worker_producer = None     # the MusicProducer of a worker process, set by the ProcessPoolExecutor initializer
+    
+    @staticmethod
+    def _set_worker_producer(producer:'MusicProducer'):
+        MusicProducer._worker_producer = producer
+    
+    @staticmethod
+    def produce_part_task(task):
+        """Produces the (pitches, durations) arrays of one part with its own random number generator. This runs in a worker process.
+        
+        Parameters:
+            task - a tuple of (part name, seed, total_duration, part random seed)
+        """
+        pname, seed, total_duration, part_seed = task
+        producer = MusicProducer._worker_producer
+        producer._rng = random.Random(part_seed)
+        try:
+            return producer.produce_part_events(pname, seed, total_duration)
+        finally:
+            producer._rng = None
     
     def produce_notes(self, part_name, seed, total_duration):
         """Produce a list of Note from a MarkovChain for 'notes' producerType for the named part
@@ -398,11 +646,11 @@ collectionMode = {self.collection_mode}, parts={self.parts}, produce={self.produ
         part_notes = []
         more_to_go = True
         num_notes = 1
-        first_note = self.start_notes[part_name]
+        first_note = copy.deepcopy(self.start_notes[part_name])
         part_notes.append(first_note)
         part_duration = first_note.duration.quarterLength       # running total of the durations of all the part notes
         durations_seed = self.get_durations_seed()
-        prev_note = self.start_notes[part_name]
+        prev_note = first_note
         
         while more_to_go:       # more notes to add for this part
             next_object_dict = self.get_next_object(seed)
@@ -466,6 +714,123 @@ collectionMode = {self.collection_mode}, parts={self.parts}, produce={self.produ
     
         return part_notes
     
+    def produce_part_events(self, part_name, seed, total_duration) -> (np.ndarray, np.ndarray):
+        """Produce the (midi pitch, quarterLength) arrays of a part, the event_mode equivalent of produce_notes() and produce_intervals()
+        
+        The random numbers are drawn in the same order as produce_notes() and produce_intervals(),
+        so the pitches and durations are those of the Notes they produce for the same random state.
+        Note tokens are converted to midi pitches (pitch.ps) once per distinct token. Intervals are added to the previous
+        midi pitch and a pitch out of the instrument range is moved by whole octaves back into range.
+        """
+        pitches = []
+        durations = []
+        more_to_go = True
+        part_duration = 0.0  # running total of the durations of all the part notes
+        low, high = self.instruments.get_range(part_name)
+        intervals = self.producerType == 'intervals'
+        if intervals:
+            first_note = self.start_notes[part_name]
+            prev_pitch = int(first_note.pitch.ps)
+            pitches.append(prev_pitch)
+            durations.append(float(first_note.duration.quarterLength))
+            part_duration = durations[0]
+        else:
+            token_pitches = {}      # note token : (midi pitch, True if the terminal note, True if the note has an octave)
+            terminal_note = music.NoteCollector.terminal_object
+        durations_seed = self.get_durations_seed()
+        
+        while more_to_go:       # more notes to add for this part
+            next_object_dict = self.get_next_object(seed)
+            next_duration_dict = self.get_next_durations_object(durations_seed)
+            token = next_object_dict['next_token']
+            if intervals:
+                if token == 100:       # the terminal object, pick a new seed and continue
+                    seed = self.get_seed()
+                    continue
+                newpitch = prev_pitch + (0 if token is None else token)     # interval.Interval(None) is a unison
+            else:
+                if token not in token_pitches:
+                    if self.collection_mode != 'sd':
+                        newnote = note.Note(token)
+                    else:
+                        newnote = note.Note(MusicUtils.get_pitch_from_scaleDegree(self.score_key, token))
+                    token_pitches[token] = (int(newnote.pitch.ps), newnote == terminal_note, newnote.pitch.octave is not None)
+                newpitch, terminal, has_octave = token_pitches[token]
+                if terminal:
+                    seed = self.get_seed()
+                    continue
+            
+            dur = next_duration_dict['next_token']    # quarterLength
+            if dur is None:
+                durations_seed = self.get_durations_seed()
+                continue
+            dur = float(dur)
+            if self.enforceRange and (intervals or has_octave):
+                #
+                # transpose up/down the number of octaves needed to bring back into range
+                # Pitch classes (no octave) are not transposed, as with a Note
+                #
+                if newpitch < low:
+                    newpitch = newpitch + 12 * (1 + (low - newpitch - 1) // 12)
+                elif newpitch > high:
+                    newpitch = newpitch - 12 * (1 + (newpitch - high - 1) // 12)
+            
+            remaining_dur =  total_duration - part_duration
+            if part_duration + dur >= total_duration:
+                dur = remaining_dur     # make the last note fill out the measure
+                more_to_go = False
+            if dur > 0:
+                pitches.append(newpitch)
+                durations.append(dur)
+                part_duration = part_duration + dur
+                prev_pitch = newpitch
+                seed =  next_object_dict['new_seed']
+                durations_seed = next_duration_dict['new_seed']
+        
+        if self.verbose > 0:
+            print(f"---- End of {part_name} part, duration: {part_duration}")
+        return np.array(pitches, dtype=np.int64), np.array(durations, dtype=np.float64)
+    
+    @staticmethod
+    def get_event_notes(pitches:np.ndarray, durations:np.ndarray) -> [note.Note]:
+        """Creates the Notes of a part from its midi pitch and quarterLength arrays
+        
+        The pitches are spelled as music21 spells a midi number, for example 61 is C#4.
+        """
+        part_notes = []
+        for midi, dur in zip(pitches.tolist(), durations.tolist()):
+            newnote = note.Note(pitch.Pitch(ps=midi))      # an int < 12 would be a pitch class
+            newnote.duration.quarterLength = dur
+            part_notes.append(newnote)
+        return part_notes
+    
+    def get_midi_writer(self, part_events:list=None, title:str=None) -> MidiWriter:
+        """Returns a MidiWriter for the part events, with the producer's tempo, time signature and key
+        and the midi program of each part instrument
+        
+        Arguments:
+            part_events - a list of (pitches, durations) for each part, default is self.part_events
+        """
+        if part_events is None:
+            part_events = self.part_events
+        midiWriter = MidiWriter.from_score_settings(self.tempo, self.timeSignature, self.score_key, title)
+        for pname, (pitches, durations) in zip(self.producePart_names, part_events):
+            midiWriter.add_part(pname, pitches, durations, program=self.instruments.get_midi_program(pname))
+        return midiWriter
+    
+    def get_events_df(self, part_events:list=None) -> pd.DataFrame:
+        """Returns a DataFrame of the part events with columns part, offset, midi and quarterLength
+        
+        Arguments:
+            part_events - a list of (pitches, durations) for each part, default is self.part_events
+        """
+        if part_events is None:
+            part_events = self.part_events
+        events_dfs = []
+        for pname, (pitches, durations) in zip(self.producePart_names, part_events):
+            offsets = np.concatenate(([0.0], np.cumsum(durations)[:-1]))
+            events_dfs.append(pd.DataFrame(data={'part':pname, 'offset':offsets, 'midi':pitches, 'quarterLength':durations}))
+        return pd.concat(events_dfs, ignore_index=True)
     
 if __name__ == '__main__':
     print(MusicProducer.__doc__)
@@ -14,11 +14,13 @@ from music.musicProducer import MusicProducer
 from music.noteCollector import NoteCollector
 from music.intervalCollector import IntervalCollector
 from music.instruments import Instruments
+from music.scoreWriter import ScoreWriter
 from common.utils import Utils
 from common.markovChain import MarkovChain
+from common.internedChain import InternedChain
 from common.environment import Environment
 
-import argparse
+import argparse, time
 import pandas as pd
 from music21 import key
 
@@ -40,6 +42,12 @@ class MusicProducerRunner(object):
                         the MarkovChain state will be interval.Interval(0) + interval.Interval(2)
                         If --initial is True, then when selecting a seed, pick one in the MarkovChain state space
                         that has the initial_object as the first element.
+            --batch :   Produce this number of Scores from the chains, each with a distinct random seed,
+                        and write them to files in the --folder in the --show format (musicxml, midi, text or csv)
+                        as they are produced instead of showing a Score.
+            --events :  Produce the parts as arrays of midi pitches and quarterLengths, creating the Notes only for the Score.
+                        With --show csv the events are written to a CSV file and no Score is created.
+                        With --show smf the events are written to a MIDI file by MidiWriter and no Score is created.
             --seed :    Optional initial seed.  The seed format depends on the source - Notes or Intervals
                         For intervals, specify semitones, for example --seed "5,-2"
                         For notes, specify the note with the octave, for example --seed "C#4,B3"
@@ -54,7 +62,7 @@ class MusicProducerRunner(object):
         # Collector arguments
         #
         parser.add_argument("--order", "-o", help="the order of the Markov Chain", type=int, choices=range(1,5))
-        parser.add_argument("--source", "-s", help="input file (.mxl or .musicxml), folder name, or composer name ('bach' for example)", default=None)
+        parser.add_argument("--source", "-s", help="input file (.mxl, .musicxml or .mid), folder of MIDI files, or composer name ('bach' for example)", default=None)
         parser.add_argument("--type", "-t", help="Source object type: notes or intervals", type=str, choices=['notes','intervals'], default='intervals')
         parser.add_argument("--parts", "-p", help="part name(s) or number(s) to include in building the MarkovChain", type=str, default=None)
         parser.add_argument("--filter", help="Apply filter to parts", type=str, default=None)
@@ -64,14 +72,14 @@ class MusicProducerRunner(object):
         parser.add_argument("--mode", \
             help="Notes collection mode: ap (absolute pitch), dp (diatonic pitch), apc (absolute pitch class), dpc (diatonic pitch class) sd (scale degree)", \
                             type=str, choices=['ap','dp', 'apc','dpc', 'sd'], default='dpc')
-        parser.add_argument("--format", "-f",help="Save output format. Default is json", type=str, choices=['csv','json','xlsx'], default='json' )
+        parser.add_argument("--format", "-f",help="Save output format. Default is json", type=str, choices=['csv','json','xlsx','npz'], default='json' )
         parser.add_argument("--sort", help="Sort resulting MarkovChain ascending on both axes", action="store_true", default=False)
         #
         # Producer arguments
         #
         parser.add_argument("--chainFiles", "-c", help="Existing serialized MarkovChain and Durations files (--format type).",  type=str, default=None)
         
-        parser.add_argument("--show", help="How to display resulting score", type=str, choices=['text','musicxml','midi'], default='musicxml')
+        parser.add_argument("--show", help="How to display resulting score. csv and smf (a MIDI file written by MidiWriter) write a file to --folder", type=str, choices=['text','musicxml','midi','csv','smf'], default='musicxml')
         parser.add_argument("--name", help="Base name of generated files", type=str, default="MyScore")
         parser.add_argument("--title", help="Title of the generated Score", type=str, default="MyScore")
         parser.add_argument("--measures", "-m",  help="Total number of measures per part to produce",  type=int, default=10)
@@ -92,6 +100,11 @@ class MusicProducerRunner(object):
         parser.add_argument("--recycle", help="How often to pick a new seed in terms of number of notes/intervals.", type=int, default=5)
         parser.add_argument("--trace", help="Show notes/intervals as they are produced", action="store_true", default=False)
         parser.add_argument("--duration","-d", help="Specify fixed duration as a quarterLength.", type=float, default=None)
+        parser.add_argument("--batch", "-b", help="Number of Scores to produce and write to files. Default is to produce and show one Score", type=int, default=None)
+        parser.add_argument("--folder", help="Folder to write --batch Scores or csv events to. Default is the music data folder", type=str, default=None)
+        parser.add_argument("--events", help="Produce parts as midi pitch and quarterLength arrays, required for --show csv", action="store_true", default=False)
+        parser.add_argument("--workers", "-w", help="Number of worker processes to produce the parts with, default is to produce them serially", type=int, default=None)
+        parser.add_argument("--engine", help="Sampling engine: cumulative (binary search) or alias (constant time alias tables). Default is cumulative", type=str, choices=['cumulative','alias'], default='cumulative')
         args = parser.parse_args()
         markovChain = None
         if args.verbose > 0:
@@ -147,11 +160,21 @@ class MusicProducerRunner(object):
                 file_info = Utils.get_file_info(chainFile)
                 thepath = file_info["path_text"]
                 ext = file_info['extension'].lower()
+                if ext == 'npz' and 'Counts_' in chainFile:
+                    i += 1      # a binary chain file also holds the counts, there is no separate counts file
+                    continue
                 if args.verbose > 0:
                     print(file_info)
                 if not file_info['Path'].exists():
                     print(f"{thepath} does not exist")
                     exit()
+                elif ext == 'npz':
+                    # duration tokens are restored as floats, not parsed as dates as with json
+                    if i==1:
+                        durationsChain = InternedChain.load(thepath)
+                        i=2
+                    else:
+                        markovChain = InternedChain.load(thepath)
                 else:
                     if ext == 'json':
                         mc_df = pd.read_json(thepath, orient="index")
@@ -186,10 +209,14 @@ class MusicProducerRunner(object):
         musicProducer.show = args.show
         musicProducer.name = args.name
         musicProducer.recycle_seed_count = args.recycle
+        if args.engine != 'cumulative':
+            musicProducer.set_sampling_engine(args.engine)
         musicProducer.initial = args.initial
         musicProducer.enforceRange = args.enforceRange
         musicProducer.trace_mode = args.trace
         musicProducer.fixed_duration = args.duration
+        musicProducer.workers = args.workers
+        musicProducer.event_mode = args.events or args.show in ['csv', 'smf']
         if args.key is not None:
             musicProducer.score_key = key.Key(args.key)
         #
@@ -210,8 +237,33 @@ class MusicProducerRunner(object):
         if args.type == 'intervals' or args.mode == 'sd':
             musicProducer.add_part_notes(args.notes)
                 
-        theScore = musicProducer.produce()
-        if theScore is not None:
-            theScore.metadata.title = args.title
-            theScore.show(args.show)
+        folder = args.folder if args.folder is not None else Environment.get_environment().get_data_folder('music')
+        if args.batch is not None:
+            start_time = time.perf_counter()
+            with ScoreWriter(folder, args.show, verbose=args.verbose) as writer:
+                for i, score_seed, theScore in musicProducer.produce_scores(args.batch, rand_seed=randomseed, events=args.show in ['csv', 'smf']):
+                    if args.show == 'csv':
+                        theScore = musicProducer.get_events_df(theScore)
+                    elif args.show == 'smf':
+                        theScore = musicProducer.get_midi_writer(theScore, title=f"{args.title} {i+1}")
+                    else:
+                        theScore.metadata.title = f"{args.title} {i+1}"
+                    writer.put(theScore, f"{args.name}_{i+1:04d}")
+                    if args.verbose > 0:
+                        print(f"Score {i+1} produced, random seed: {score_seed}")
+            elapsed = time.perf_counter() - start_time
+            stats = musicProducer.batch_stats
+            print(f"{stats['scores']} Scores ({stats['notes']} notes) produced, {writer.files_written} files written to {folder} in {elapsed:.2f} seconds")
+            if elapsed > 0:
+                print(f"{stats['scores']/elapsed:.2f} scores/sec, {stats['notes']/elapsed:.0f} notes/sec, writer busy {writer.write_seconds:.2f} seconds")
+        elif args.show in ['csv', 'smf']:
+            musicProducer.produce_events()
+            with ScoreWriter(folder, args.show) as writer:
+                writer.put(musicProducer.get_events_df() if args.show == 'csv' else musicProducer.get_midi_writer(title=args.title), args.name)
+            print(f"events written to {writer.get_filename(args.name)}")
+        else:
+            theScore = musicProducer.produce()
+            if theScore is not None:
+                theScore.metadata.title = args.title
+                theScore.show(args.show)
         print("Done")
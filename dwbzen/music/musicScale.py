@@ -4,18 +4,31 @@ from music21.note import Note
 from music21.key import Key
 from typing import List
 import json
+import numpy as np
 from common.environment import Environment
 
 class MusicScale(object):
+    """The notes of a scale formula from a root note, and the notes a number of scale degrees away from a note.
+    
+    The scale formulas file is read once per process, and the notes and lookup arrays of each
+    scale formula and root note are created once and shared by the MusicScales that use them, see get_scale_table().
+    """
+    
+    _scale_formulas = {}    # scaleFormulas.json filename : scales
+    _scale_tables = {}      # (formula, root nameWithOctave) : scale table
+    
     def __init__(self, scale_name='Major', root_note=Note('C4'), key=Key('C'), resource_folder=None):
         
         
         env = Environment.get_environment()
         resource_folder = env.resource_base if resource_folder is None else resource_folder
         filename = f"{resource_folder}/music/scaleFormulas.json"
-        with open(filename, "r") as fp:
-            scales = json.load(fp)
-        self.scales = scales["scales"]
+        self.scales = MusicScale._scale_formulas.get(filename)
+        if self.scales is None:
+            with open(filename, "r") as fp:
+                scales = json.load(fp)
+            self.scales = scales["scales"]
+            MusicScale._scale_formulas[filename] = self.scales
         #print(self.scales)
 
         self.scale = self.scales.get(scale_name, None)
@@ -27,10 +40,39 @@ class MusicScale(object):
         self.formula = self.scale['formula']
         self.key = key
         self.notes_stream = None
-        self.scale_notes = self.get_scale_notes(root_note)
-        self.scale_notes_names = [x.nameWithOctave for x in self.scale_notes]
-        self.range_notes = self.get_range_notes(root_note)
-        self.range_notes_names = [x.nameWithOctave for x in self.range_notes]
+        scale_table = self.get_scale_table(root_note)
+        self.scale_notes = scale_table['scale_notes']
+        self.scale_notes_names = scale_table['scale_notes_names']
+        self.range_notes = scale_table['range_notes']
+        self.range_notes_names = scale_table['range_notes_names']
+        self.names_index = scale_table['names_index']
+        self.range_ps = scale_table['range_ps']
+    
+    def get_scale_table(self, root_note:Note) -> dict:
+        '''Gets the shared notes and lookup arrays of the scale formula from a root note, creating them the first time
+            Returns: a dict with the keys
+                scale_notes, scale_notes_names - the scale notes spanning a single octave from the root note, see get_scale_notes()
+                range_notes, range_notes_names - the scale notes from octave 0 to 8, see get_range_notes()
+                names_index - dict of the index in range_notes of each range note nameWithOctave
+                range_ps - int array of the pitch.ps of each range note
+            The Notes are shared, copy a Note before changing it.
+        '''
+        table_key = (tuple(self.formula), root_note.nameWithOctave)
+        scale_table = MusicScale._scale_tables.get(table_key)
+        if scale_table is None:
+            scale_notes = self.get_scale_notes(Note(root_note.nameWithOctave))
+            self.scale_notes = scale_notes      # used by get_range_notes()
+            range_notes = self.get_range_notes(root_note)
+            names_index = {}
+            for i, n in enumerate(range_notes):        # the first range note of a name, as list.index()
+                names_index.setdefault(n.nameWithOctave, i)
+            range_ps = np.array([n.pitch.ps for n in range_notes], dtype=np.int64)
+            range_ps.setflags(write=False)
+            scale_table = {'scale_notes':scale_notes, 'scale_notes_names':[x.nameWithOctave for x in scale_notes], \
+                           'range_notes':range_notes, 'range_notes_names':[x.nameWithOctave for x in range_notes], \
+                           'names_index':names_index, 'range_ps':range_ps}
+            MusicScale._scale_tables[table_key] = scale_table
+        return scale_table
         
     def get_scale_notes(self, start_note=None)->List[Note]:
         '''The notes of the configured scale spanning a single octave, for example 'C4' to 'C5'
@@ -73,16 +115,23 @@ class MusicScale(object):
                 from_note - the starting note, default is the scale root note
             Returns: a new Note
             Note if from_note is not present in the full range of notes (self.range_notes), the from_note is returned.
+            A note is matched by nameWithOctave, so an enharmonic spelling of a scale note (D#4 in E- Major) is not in the scale.
+            The range note is shared, copy it before changing it.
         '''
         if from_note is None:
             from_note = self.root
 
-        if from_note.nameWithOctave in self.range_notes_names:
-            ind = self.range_notes_names.index(from_note.nameWithOctave) + scale_degrees
-            return self.range_notes[ind]
+        ind = self.get_index(from_note)
+        if ind >= 0:
+            return self.range_notes[ind + scale_degrees]
         else:
             return from_note
     
+    def get_index(self, anote:Note) -> int:
+        '''The index in range_notes of a Note matched by nameWithOctave as in get_note(), -1 if the note is not in the scale
+        '''
+        return self.names_index.get(anote.nameWithOctave, -1)
+    
     def __str__(self):
         result = ""
         for i,note in enumerate(self.scale_notes):
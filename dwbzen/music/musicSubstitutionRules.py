@@ -1,7 +1,6 @@
 
-from music21 import note, duration
+from music21 import note
 from music21.stream import Score
-import copy
 
 class MusicSubstitutionRules(object):
     
@@ -39,15 +38,21 @@ class MusicSubstitutionRules(object):
         musicScale = state['musicScale']   # music.MusicScale
         instruments = state['instruments']   # music.Instruments
         note_dur = anote.duration.quarterLength
-        scale_note = musicScale.get_note(scale_degrees, anote)
-        next_note = copy.deepcopy(scale_note)
-        next_note.duration = duration.Duration(note_dur)
+        index = musicScale.get_index(anote)
+        if index >= 0:
+            #
+            # move in the range notes of the scale table, then by the octaves needed to be in the instrument range
+            # so the only Note created is next_note
+            #
+            index = index + scale_degrees
+            ps = musicScale.range_ps[index]
+            octaves = int(instruments.adjust_pitches_to_range(instrument_name, ps) - ps) // 12
+            next_note = note.Note(musicScale.range_notes_names[index + octaves * len(musicScale.formula)], quarterLength=note_dur)
+        else:   # not in the scale, get_note() returns the note unchanged
+            next_note = note.Note(anote.nameWithOctave, quarterLength=note_dur)
+            if not instruments.is_in_range(instrument_name, next_note):
+                instruments.adjust_to_range(instrument_name, next_note, inPlace=True)
         state['previous_note'] = anote
-        #
-        # check the range of next_note and adjust if needed
-        #
-        if not instruments.is_in_range(instrument_name, next_note):
-            instruments.adjust_to_range(instrument_name, next_note, inPlace=True)
         
         state['note'] = next_note
         #
@@ -7,9 +7,13 @@ from music21.stream import Measure
 from music.instruments import Instruments
 
 import re
+import numpy as np
 import pandas as pd
-import pathlib, random, copy, math
+import pathlib, random, copy, math, json
 from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import os
 from builtins import isinstance
 import matplotlib.pyplot as plt
 import seaborn as sns
@@ -24,6 +28,20 @@ class MusicUtils(object):
     C_Major = key.Key('C')
     A_Minor = key.Key('a')
     default_pitch_map = {'Db':'C#', "D-":'C#', 'D#':'Eb', 'Gb':'F#', 'G-':'F#', 'Ab':'G#', 'A-':'G#', 'A#':'Bb' }
+    #
+    # the columns of a compact notes table and their dtypes, see get_notes_for_score()
+    # an intervals table has the part, duration and semitones columns plus note1, note2 and the interval names
+    # ps is float32 so microtonal pitches such as 60.5 are kept
+    #
+    notes_table_dtypes = {'part_number':'int8', 'part_name':'category', 'name':'category', 'nameWithOctave':'category', \
+                          'pitchClass':'int8', 'ps':'float32', 'quarterLength':'float32', 'quarterLengthNoTuplets':'float32', \
+                          'type':'category', 'ordinal':'category', 'dots':'int8', 'fullName':'category', 'tuplets':'category', \
+                          'scaleDegree':'category', 'note1':'category', 'note2':'category', 'directedName':'category', \
+                          'niceName':'category', 'semitones':'int8', 'measure':'int16', 'title':'category'}
+    notes_table_columns = ['part_number', 'part_name', 'name', 'nameWithOctave', 'pitchClass', 'ps', 'quarterLength', 'quarterLengthNoTuplets', \
+                           'type', 'ordinal', 'dots', 'fullName', 'tuplets', 'scaleDegree', 'measure']
+    table_version = 4       # the version of the notes and intervals tables, part of the ScoreCache key
+    duration_columns = ['quarterLength', 'quarterLengthNoTuplets', 'type', 'ordinal', 'dots', 'fullName', 'tuplets']
      
     @staticmethod
     def get_score(file_path:str) -> Score:
@@ -206,161 +224,196 @@ class MusicUtils(object):
             ascore - a Score instance
             partnames - a list of part names to extract from Score. If None then intervals from all parts are extracted.
         
+        The intervals are the consecutive notes of each part in the compact notes table, see get_notes_for_score().
         DataFrame columns returned:
-            interval  (interval.Interval)
+            part_number (int8)
             part_name
-            part_number
-            note1  (note.Note the first Note in the interval pair)
-            note2  (note.Note the second Note in the interval pair)
+            note1  (the nameWithOctave of the first Note in the interval pair)
+            note2  (the nameWithOctave of the second Note in the interval pair)
             name (interval name as in "P5")
             directedName  (as in "P-5" for down a 5th)
             niceName
-            semitones (int)
+            semitones (int8)
+            the duration columns of note1: quarterLength, quarterLengthNoTuplets, type, ordinal, dots, fullName and tuplets
+        The str columns are categorical. Use get_interval() to create a music21 Interval from a row.
         
         Returns a 3-tuplet consisting of the intervals_df DataFrame,
         a [int] of part numbers, and a [str] of part names.
         """
-        pdict = MusicUtils.get_score_intervals(ascore)
-        intrvals_df = pd.DataFrame()
-        part_number = 1
-        df = None
-        score_partnames = set()
-        score_partnumbers = set()
-        if partnames is None:
-            partnames = list(pdict.keys())
-        have_partnames = not ( partnames is None or len(partnames)==0)
-        have_partnumbers = not (partnumbers is None or len(partnumbers)==0 or part_number in partnumbers)
-        for k in pdict.keys():  # part names
-                
-                if (have_partnames and k in partnames) or (have_partnumbers and part_number in partnumbers):
-                    part_intervals = pdict[k]
-                    intervals =  [x['interval'] for x in part_intervals]
-                    df = pd.DataFrame(data=intervals, columns=['interval'])
-                    df['part_number'] = part_number
-                    df['part_name'] = k
-                    df['note1'] = [x['note1'] for x in part_intervals]
-                    df['note2'] = [x['note2'] for x in part_intervals]
-                    score_partnames.add(k)
-                    score_partnumbers.add(part_number)
-                    intrvals_df = pd.concat([intrvals_df, df])
-                    part_number = part_number + 1
-        if df is not None:
-            # else this score has none of the parts specified 
-            intrvals_df['name'] = [x.name for x in intrvals_df['interval']]
-            intrvals_df['directedName'] = [x.directedName for x in intrvals_df['interval']]
-            intrvals_df['niceName'] = [x.niceName for x in intrvals_df['interval']]
-            intrvals_df['semitones'] = [x.semitones for x in intrvals_df['interval']]
-            intrvals_df.reset_index(drop=True, inplace=True)       # make sure index is unique
-        return intrvals_df, score_partnames, score_partnumbers
+        notes_df, score_partnames, score_partnumbers = MusicUtils.get_notes_for_score(ascore, partnames, partnumbers)
+        return MusicUtils.get_intervals_from_notes(notes_df), score_partnames, score_partnumbers
     
+    @staticmethod
+    def get_intervals_from_notes(notes_df:pd.DataFrame) -> pd.DataFrame:
+        """Creates the intervals table of a compact notes table, see get_intervals_for_score()
+        
+        The interval names of each distinct pair of pitches are computed once.
+        """
+        if len(notes_df) == 0:
+            return pd.DataFrame()
+        part_numbers = notes_df['part_number'].to_numpy()
+        first = np.flatnonzero(part_numbers[:-1] == part_numbers[1:])     # rows followed by a note of the same part
+        note1 = notes_df['nameWithOctave'].to_numpy()[first]
+        note2 = notes_df['nameWithOctave'].to_numpy()[first + 1]
+        ps = notes_df['ps'].to_numpy()
+        names = {}
+        for pair in set(zip(note1, note2)):
+            i = interval.Interval(pitch.Pitch(pair[0]), pitch.Pitch(pair[1]))
+            names[pair] = (i.name, i.directedName, i.niceName)
+        pair_names = [names[pair] for pair in zip(note1, note2)]
+        intervals_df = pd.DataFrame({'part_number' : part_numbers[first], 'part_name' : notes_df['part_name'].to_numpy()[first], \
+                                     'note1' : note1, 'note2' : note2, \
+                                     'name' : [x[0] for x in pair_names], 'directedName' : [x[1] for x in pair_names], 'niceName' : [x[2] for x in pair_names], \
+                                     'semitones' : (ps[first + 1] - ps[first]) })
+        for column in MusicUtils.duration_columns:
+            intervals_df[column] = notes_df[column].to_numpy()[first]
+        return MusicUtils.compact_table(intervals_df)
 
     @staticmethod
     def get_notes_for_score(ascore:Score, partnames:[str]=None, partnumbers:[int]=None) ->  (pd.DataFrame,{str},{int}):
-        """Get the Notes of specified Parts from a score as a pandas.DataFrame
+        """Get the Notes of specified Parts from a score as a compact pandas.DataFrame
         Arguments:
             ascore - a Score instance
-            partnames - a list of part names to extract from Score. If None, no parts are extracted.
-                        If ['*'] (the default), then notes from all parts are extracted.
+            partnames - a list of part names to extract from Score. If None then notes from all parts are extracted.
                                 
         DataFrame columns returned:
-            note (music21.note.Note)
-            part_number
+            part_number (int8)
             part_name
             name  (just the pitch name as in "D")
             nameWithOctave   (pitch name with the octave as in "D5")
-            pitch (music21.pitch.Pitch)
-            pitchClass (integer)
-            ps (pitch space - float)
-            duration (music21.duration.Duration)
+            pitchClass (int8)
+            ps (pitch space, int16)
+            quarterLength (duration.quarterLength, float32)
+            quarterLengthNoTuplets (float32)
             type (the duration type string, for example "quarter")
             ordinal
-            quarterLength (duration.quarterLength, float)
-            quarterLengthNoTuplets
+            dots (int8)
+            fullName (the duration full name)
+            tuplets (the duration tuplets as a str)
             scaleDegree (the ordinal of the pitch relative to the part's Key/KeySignature)
+            measure (the measure number, int16. -1 if the note is not in a Measure)
+        The str columns are categorical. The table is built in a single pass over the notes of each Part
+        and has no music21 objects. Use get_note() to create a music21 Note from a row.
             
         Returns a 3-tuple consisting of the notes_df DataFrame,
         an integer set of part numbers, and a set(str) of part names.
         """
-        pdict = MusicUtils.get_score_notes(ascore)    # {'Soprano' : <music21.stream.iterator.StreamIterator for Part:Soprano> , 'Alto' : etc. }
-        score_parts = MusicUtils.get_score_parts(ascore)
-        notes_df = pd.DataFrame()
-        scale_degrees = []
-        df = None
+        return MusicUtils._get_parts_notes(MusicUtils.get_score_parts(ascore), partnames, partnumbers)
+    
+    @staticmethod
+    def _get_parts_notes(score_parts:{str:Part}, partnames:[str]=None, partnumbers:[int]=None) ->  (pd.DataFrame,{str},{int}):
+        """Creates the notes table of the selected Parts of a dict of part name : Part, see get_notes_for_score()
+        
+        """
         part_number = 1
         score_partnames = set()
         score_partnumbers = set()
+        columns = {c:[] for c in MusicUtils.notes_table_columns}
         if partnames is None:
-            partnames = list(pdict.keys())
+            partnames = list(score_parts.keys())
         have_partnames = not ( partnames is None or len(partnames)==0)
         have_partnumbers = not (partnumbers is None or len(partnumbers)==0 or part_number in partnumbers)
-        for k in pdict.keys():
+        for k in score_parts.keys():
             if  (have_partnames and k in partnames) or (have_partnumbers and part_number in partnumbers):
-                df = pd.DataFrame(data=pdict[k], columns=['note'])
-                df['part_number'] = part_number
-                df['part_name'] = k
-                sdlist = MusicUtils.get_scale_degrees(score_parts[k])  # scale degrees for notes in this Part
-                scale_degrees.extend([x['number'] for x in  sdlist])
+                MusicUtils._add_part_notes(columns, score_parts[k], part_number, k)
                 score_partnames.add(k)
                 score_partnumbers.add(part_number)
-                notes_df = pd.concat([notes_df, df])
                 part_number = part_number + 1
-                
-        if df is not None:
-            # else this score has none of the parts specified 
-            dfnotes = notes_df['note']
-            notes_df['name'] = [x.name for x in dfnotes]
-            notes_df['nameWithOctave'] = [x.nameWithOctave for x in dfnotes]
-            notes_df['pitch'] = [x.pitch for x in dfnotes]
-            notes_df['pitchClass'] = [x.pitch.pitchClass for x in dfnotes]
-            notes_df['ps'] = [x.pitch.ps for x in dfnotes]
-            notes_df['duration'] = [x.duration for x in dfnotes]
-            notes_df['type'] = [x.duration.type for x in dfnotes]
-            notes_df['ordinal'] = [x.duration.ordinal for x in dfnotes]
-            notes_df['quarterLength'] = [x.duration.quarterLength for x in dfnotes]
-            notes_df['quarterLengthNoTuplets'] = [x.duration.quarterLengthNoTuplets for x in dfnotes]
-            notes_df['scaleDegree'] = scale_degrees
-            
-            notes_df.reset_index(drop=True, inplace=True)       # make sure index is unique
-        return notes_df, score_partnames, score_partnumbers
+        if part_number == 1:
+            # this score has none of the parts specified
+            return pd.DataFrame(), score_partnames, score_partnumbers
+        return MusicUtils.compact_table(pd.DataFrame(columns)), score_partnames, score_partnumbers
+    
+    @staticmethod
+    def _add_part_notes(columns:dict, apart:Part, part_number:int, part_name:str):
+        """Appends the notes of a Part to the column lists of a notes table, see get_notes_for_score()
+        
+        The scale degree of a note is relative to the Key in effect in its measure.
+        Scale degrees are computed once for each Key and pitch name.
+        """
+        key_sigs, measure_numbers = MusicUtils.get_keySignatures(apart)
+        part_keys = [k if isinstance(k, key.Key) else k.asKey() for k in key_sigs]
+        scale_degrees = {}
+        k = 0
+        for anote in apart.flatten().getElementsByClass(note.Note):
+            apitch = anote.pitch
+            dur = anote.duration
+            columns['part_number'].append(part_number)
+            columns['part_name'].append(part_name)
+            columns['name'].append(apitch.name)
+            columns['nameWithOctave'].append(apitch.nameWithOctave)
+            columns['pitchClass'].append(apitch.pitchClass)
+            columns['ps'].append(apitch.ps)
+            columns['quarterLength'].append(float(dur.quarterLength))
+            columns['quarterLengthNoTuplets'].append(float(dur.quarterLengthNoTuplets))
+            columns['type'].append(dur.type)
+            columns['ordinal'].append(dur.ordinal)
+            columns['dots'].append(dur.dots)
+            columns['fullName'].append(dur.fullName)
+            columns['tuplets'].append(str(dur.tuplets))
+            measure = -1 if anote.measureNumber is None else anote.measureNumber
+            columns['measure'].append(measure)
+            if len(part_keys) == 0:
+                columns['scaleDegree'].append('')
+                continue
+            while k + 1 < len(part_keys) and measure >= measure_numbers[k+1]:      # a note not in a Measure keeps the current Key
+                k = k + 1
+            sd = scale_degrees.get((k, apitch.name))
+            if sd is None:
+                sd = MusicUtils.get_scale_degree(part_keys[k], apitch)['number']
+                scale_degrees[(k, apitch.name)] = sd
+            columns['scaleDegree'].append(sd)
+    
+    @staticmethod
+    def compact_table(df:pd.DataFrame) -> pd.DataFrame:
+        """Sets the compact dtypes of the columns of a notes or intervals table, see notes_table_dtypes
+        
+        This is needed after tables with different categories are concatenated.
+        """
+        dtypes = {c:t for c,t in MusicUtils.notes_table_dtypes.items() if c in df.columns and df[c].dtype != t}
+        if len(dtypes) > 0:
+            df = df.astype(dtypes)
+        return df
+    
+    @staticmethod
+    def get_note(row:pd.Series) -> note.Note:
+        """Creates a music21 Note from a row of a compact notes table
+        
+        """
+        return note.Note(row['nameWithOctave'], quarterLength=float(row['quarterLength']))
+    
+    @staticmethod
+    def get_notes(notes_df:pd.DataFrame) -> [note.Note]:
+        """Creates the music21 Notes of a compact notes table
+        
+        """
+        return [note.Note(n, quarterLength=float(ql)) for n, ql in zip(notes_df['nameWithOctave'], notes_df['quarterLength'])]
+    
+    @staticmethod
+    def get_interval(row:pd.Series) -> interval.Interval:
+        """Creates a music21 Interval from a row of an intervals table
+        
+        """
+        return interval.Interval(note.Note(row['note1']), note.Note(row['note2']))
     
     @staticmethod
     def get_durations_from_notes(source_df:pd.DataFrame) -> pd.DataFrame:
 
         """Get the Durations from a notes or intervals DataFrame
         
-        The notes_df argument has the columns described in get_notes_for_score().
+        The source_df argument has the columns described in get_notes_for_score() or get_intervals_for_score().
+        The durations of an intervals table are those of the first note of each interval.
         DataFrame columns returned:
-            note (music21.note.Note)
-            duration (music21.duration.Duration)
             type
             ordinal
             dots
             fullName
-            quarterLength
+            quarterLength (the quarterLengthNoTuplets)
             tuplets
         See the music21.duration documentation for details on individual fields
         """
-        if 'duration' in source_df.columns:
-            notes_df = source_df
-            durations_df = pd.DataFrame(data=notes_df[['note','duration']], columns=['note','duration'])
-            durations_df['type'] = [x.type for x in notes_df['duration']]
-            durations_df['ordinal'] = [x.ordinal for x in notes_df['duration']]
-            durations_df['dots'] = [x.dots for x in notes_df['duration']]
-            durations_df['fullName'] = [x.fullName for x in notes_df['duration']]
-            durations_df['quarterLength'] = [x.quarterLengthNoTuplets for x in notes_df['duration']]
-            durations_df['tuplets'] = [x.tuplets for x in notes_df['duration']]
-        else:
-            intervals_df = source_df
-            durations_df = pd.DataFrame(data=intervals_df[['note1']], columns=['note1'])
-            durations_df['duration'] = [x.duration for x in intervals_df['note1']]
-            durations_df['type'] = [x.duration.type for x in intervals_df['note1']]
-            durations_df['ordinal'] = [x.duration.ordinal for x in intervals_df['note1']]
-            durations_df['dots'] = [x.duration.dots for x in intervals_df['note1']]
-            durations_df['fullName'] = [x.duration.fullName for x in intervals_df['note1']]
-            durations_df['quarterLength'] = [x.duration.quarterLengthNoTuplets for x in intervals_df['note1']]
-            durations_df['tuplets'] = [x.duration.tuplets for x in intervals_df['note1']]
-            durations_df.rename(columns={'note1':'note'}, inplace=True)
-        return durations_df
+        durations_df = source_df[['type','ordinal','dots','fullName','quarterLengthNoTuplets','tuplets']]
+        return durations_df.rename(columns={'quarterLengthNoTuplets':'quarterLength'})
     
     @staticmethod
     def get_metadata_bundle(composer:str=None, title:str=None) -> metadata.bundles.MetadataBundle:
@@ -386,50 +439,250 @@ class MusicUtils(object):
         return meta
     
     @staticmethod
-    def get_all_score_music21_objects(classinfo, composer=None, title=None, partnames=None, partnumbers=None):
+    def get_all_score_music21_objects(classinfo, composer=None, title=None, partnames=None, partnumbers=None, workers:int=None, cache=None, index=None):
         if classinfo is note.Note:
-            return MusicUtils.get_all_score_notes(composer, title, partnames, partnumbers)
+            return MusicUtils.get_all_score_notes(composer, title, partnames, partnumbers, workers, cache, index)
         elif classinfo is interval.Interval:
-            return MusicUtils.get_all_score_intervals(composer, title, partnames, partnumbers)
+            return MusicUtils.get_all_score_intervals(composer, title, partnames, partnumbers, workers, cache, index)
         else:
             raise TypeError
 
     @staticmethod
-    def get_all_score_notes(composer=None, title=None, partnames=None, partnumbers=None):
-        scores, titles = MusicUtils.get_scores_from_corpus(composer, title)
-        notes_df = pd.DataFrame()
-        all_score_partnames = set()
-        all_score_partnumbers = set()
-        for i in range(len(scores)):
-            score = scores[i]
-            df,pnames,pnums = MusicUtils.get_notes_for_score(score, partnames, partnumbers)
-            df['title'] = titles[i]
-            notes_df = pd.concat([notes_df, df], ignore_index=True)
-            all_score_partnames = all_score_partnames.union(pnames)
-            all_score_partnumbers = all_score_partnumbers.union(pnums)
+    def get_all_score_notes(composer=None, title=None, partnames=None, partnumbers=None, workers:int=None, cache=None, index=None):
+        """Gets the notes of all the corpus scores matching the composer and title provided
+        
+        If workers is not None the scores are parsed in that many worker processes, see get_corpus_tables()
+        """
+        notes_df, all_score_partnames, all_score_partnumbers, _ = \
+            MusicUtils.get_corpus_tables(note.Note, composer, title, partnames=partnames, partnumbers=partnumbers, workers=workers, cache=cache, index=index)
         return notes_df, all_score_partnames, all_score_partnumbers
             
     @staticmethod
-    def get_all_score_intervals(composer=None, title=None, partnames=None, partnumbers=None):
-        meta = MusicUtils.get_metadata_bundle(composer, title)
-        intrvals_df = pd.DataFrame()
+    def get_all_score_intervals(composer=None, title=None, partnames=None, partnumbers=None, workers:int=None, cache=None, index=None):
+        """Gets the intervals of all the corpus scores matching the composer and title provided
+        
+        If workers is not None the scores are parsed in that many worker processes, see get_corpus_tables()
+        """
+        intrvals_df, all_score_partnames, all_score_partnumbers, _ = \
+            MusicUtils.get_corpus_tables(interval.Interval, composer, title, partnames=partnames, partnumbers=partnumbers, workers=workers, cache=cache, index=index)
+        return intrvals_df, all_score_partnames, all_score_partnumbers
+    
+    @staticmethod
+    def get_corpus_tables(classinfo, composer=None, title=None, keypart:str=None, filters:dict=None, partnames=None, partnumbers=None, \
+                          transposition:str=None, instruments:Instruments=None, workers:int=None, cache=None, index=None) -> (pd.DataFrame,{str},{int},[str]):
+        """Gets the notes or intervals of all the corpus scores matching the composer and title provided
+        
+        Parsing the musicXML dominates the collection time, so each score can be parsed, filtered,
+        transposed and extracted in a worker process. Only the notes or intervals DataFrame of a score
+        is returned to the parent, not the Score. The results are combined in corpus search order,
+        so the DataFrame is the same as that created serially.
+        Args:
+            classinfo - note.Note for a notes DataFrame, interval.Interval for an intervals DataFrame
+            composer, title, keypart, filters - as in get_scores_from_corpus()
+            partnames, partnumbers - the Parts to extract, as in get_notes_for_score() and get_intervals_for_score()
+            transposition - 'diatonic' to transpose the notes of each score with get_transposed_notes_for_score(), 
+                            'accidentals' to only adjust the score accidentals, None to use the score as is
+            instruments - music.Instruments instance, if not None Part ranges are enforced after a diatonic transposition
+            workers - the number of worker processes. If None the scores are parsed serially in this process.
+            cache - a music.ScoreCache. If not None the DataFrame of a score previously extracted with the same settings
+                    is loaded from the cache instead of parsing the score.
+            index - a music.CorpusIndex. If not None the scores are found with the index instead of a corpus search
+                    and scores that do not pass the mode filter are not parsed.
+        Returns:
+            a 4-element tuple of the combined DataFrame with a 'title' column, the set of part names,
+            the set of part numbers and a list of the titles of the scores included.
+        """
+        dfs = []
+        titles = []
         all_score_partnames = set()
         all_score_partnumbers = set()
-        for i in range(len(meta)):
-            md = meta[i].metadata
-            if MusicUtils.verbose > 0:
-                    print(f"working on {md.title}")
-            score = corpus.parse(meta[i])
-            df,pnames,pnums = MusicUtils.get_intervals_for_score(score, partnames, partnumbers)
+        for result in MusicUtils.iter_corpus_tables(classinfo, composer, title, keypart, filters, partnames, partnumbers, \
+                                                    transposition, instruments, workers, cache, index):
+            if result is None:
+                continue
+            score_title, df, pnames, pnums = result
+            titles.append(score_title)
             if len(df) > 0:
-                df['title'] = md.title
-                intrvals_df = pd.concat([intrvals_df, df], ignore_index=True)
+                df['title'] = score_title
+                dfs.append(df)
                 all_score_partnames = all_score_partnames.union(pnames)
                 all_score_partnumbers = all_score_partnumbers.union(pnums)
-        return intrvals_df, all_score_partnames, all_score_partnumbers
+        tables_df = MusicUtils.compact_table(pd.concat(dfs, ignore_index=True)) if len(dfs) > 0 else pd.DataFrame()
+        return tables_df, all_score_partnames, all_score_partnumbers, titles
+    
+    @staticmethod
+    def iter_corpus_tables(classinfo, composer=None, title=None, keypart:str=None, filters:dict=None, partnames=None, partnumbers=None, \
+                           transposition:str=None, instruments:Instruments=None, workers:int=None, cache=None, index=None):
+        """Generates the notes or intervals DataFrame of each corpus score matching the composer and title, in corpus search order
+        
+        The arguments are the same as get_corpus_tables(). A score is parsed when its DataFrame is needed,
+        or with workers at most 2 x workers scores ahead of the one consumed,
+        so only a few scores and DataFrames are in memory at once regardless of the number of scores.
+        Yields:
+            the result of get_score_table() for each score, a tuple of (title, DataFrame, set of part names, set of part numbers)
+            or None if the score does not match the filters.
+        """
+        tasks = MusicUtils.get_corpus_tasks(classinfo, composer, title, keypart, filters, partnames, partnumbers, \
+                                            transposition, instruments, workers, cache, index)
+        yield from MusicUtils.iter_tables(MusicUtils.get_score_table, tasks, workers)
     
     @staticmethod
-    def get_scores_from_corpus(composer=None, title=None, keypart:str=None, filters:dict=None):
+    def iter_tables(get_table, tasks:list, workers:int=None):
+        """Generates the result of get_table for each task, in task order
+        
+        get_table is a staticmethod that reads a score or file, such as get_score_table() or MidiReader.get_table().
+        If workers is not None, the tasks are run in worker processes at most 2 x workers tasks ahead of the one consumed.
+        """
+        if workers is None:
+            yield from map(get_table, tasks)
+        else:
+            if MusicUtils.verbose > 0:
+                print(f"parsing {len(tasks)} scores using {workers} workers")
+            with ProcessPoolExecutor(max_workers=workers, initializer=MusicUtils._set_verbose, initargs=(MusicUtils.verbose,)) as executor:
+                pending = deque()
+                for task in tasks:
+                    pending.append(executor.submit(get_table, task))
+                    if len(pending) >= 2 * workers:
+                        yield pending.popleft().result()
+                while len(pending) > 0:
+                    yield pending.popleft().result()
+    
+    @staticmethod
+    def get_corpus_tasks(classinfo, composer=None, title=None, keypart:str=None, filters:dict=None, partnames=None, partnumbers=None, \
+                         transposition:str=None, instruments:Instruments=None, workers:int=None, cache=None, index=None) -> [tuple]:
+        """Returns the get_score_table() task of each corpus score matching the composer and title, in corpus search order
+        
+        The arguments are the same as get_corpus_tables(). A task has the path of the score, not the Score,
+        so it can be sent to a worker process and parsed there.
+        """
+        settings = MusicUtils.get_table_settings(classinfo, keypart, filters, partnames, partnumbers, transposition, instruments)
+        return [(path, number, score_title, settings, instruments, cache) \
+                for path, number, score_title in MusicUtils.get_corpus_paths(composer, title, keypart, filters, index, workers)]
+    
+    @staticmethod
+    def get_corpus_paths(composer=None, title=None, keypart:str=None, filters:dict=None, index=None, workers:int=None) -> [(str,str,str)]:
+        """Returns a list of the (path, number, title) of the corpus scores matching the composer and title provided
+        
+        number is the work number of a score in a file of several works, such as an ABC file, otherwise None.
+        Use parse_score() to parse a score.
+        If index, a music.CorpusIndex, is not None the scores are found with the index, and scores whose keypart
+        does not have the filter mode are excluded without parsing them. Scores not yet in the index are parsed
+        to add them, in worker processes if workers is not None. Otherwise the corpus is searched with get_metadata_bundle().
+        """
+        if index is not None:
+            scores_df = index.get_scores(composer, title, keypart, filters, workers)
+            return [(path, None if pd.isna(number) else str(number), json.loads(titles)[0] if titles != '[]' else None) \
+                    for path, number, titles in zip(scores_df['path'], scores_df['number'], scores_df['titles'])]
+        meta = MusicUtils.get_metadata_bundle(composer, title)
+        return [(str(meta[i].sourcePath), None if meta[i].number is None else str(meta[i].number), meta[i].metadata.title) for i in range(len(meta))]
+    
+    @staticmethod
+    def parse_score(path:str, number:str=None) -> Score:
+        """Parses a score file, or a file in the music21 corpus as in 'bach/bwv10.7.mxl'
+        
+        number selects one work of a file of several works, as in get_corpus_paths(). If None the whole file is parsed.
+        """
+        return converter.parse(path, number=number) if os.path.exists(path) else corpus.parse(path, number=number)
+    
+    @staticmethod
+    def _set_verbose(verbose:int):
+        MusicUtils.verbose = verbose
+    
+    @staticmethod
+    def get_table_settings(classinfo, keypart:str=None, filters:dict=None, partnames=None, partnumbers=None, \
+                           transposition:str=None, instruments:Instruments=None) -> dict:
+        """Returns the settings used by get_score_table() to extract a DataFrame from a score, see get_corpus_tables()
+        
+        """
+        return {'table' : 'notes' if classinfo is note.Note else 'intervals', 'keypart' : keypart, 'filters' : filters, \
+                'partnames' : partnames, 'partnumbers' : partnumbers, 'transposition' : transposition, 'enforce_range' : instruments is not None, \
+                'version' : MusicUtils.table_version}
+    
+    @staticmethod
+    def get_score_table(task:tuple):
+        """Parses a score and extracts its notes or intervals DataFrame.
+        This runs in a worker process for get_corpus_tables(), so it is a staticmethod and
+        the task includes everything needed.
+        
+        Args:
+            task - a tuple of (score path, number, title, settings, instruments, cache)
+                   path is a score file, or a file in the music21 corpus as in 'bach/bwv10.7.mxl'
+                   number is the work number of the score in a file of several works, or None, see parse_score()
+                   settings are created by get_table_settings()
+                   cache is a music.ScoreCache or None
+        Returns:
+            a 4-element tuple of (title, DataFrame, set of part names, set of part numbers)
+            or None if the score does not match the filters.
+        """
+        path, number, score_title, settings, instruments, cache = task
+        is_file = os.path.exists(path)
+        if cache is not None:
+            file_path = path if is_file else str(corpus.getWork(path))
+            found, result = cache.get(file_path, settings, number)
+            if found:
+                if MusicUtils.verbose > 0:
+                    print(f"cached {score_title}")
+                return result
+        if MusicUtils.verbose > 0:
+            print(f"working on {score_title}")
+        result = None
+        ascore = MusicUtils.parse_score(path, number)
+        if MusicUtils.filter_score(ascore, settings['keypart'], settings['filters']):
+            partnames = settings['partnames']
+            transposition = settings['transposition']
+            if transposition == 'diatonic':
+                df, pnames, pnums = MusicUtils.get_transposed_notes_for_score(ascore, partnames=partnames, partnumbers=settings['partnumbers'], \
+                                                                               instruments=instruments)
+                if settings['table'] == 'intervals' and len(df) > 0:
+                    df = MusicUtils.get_intervals_from_notes(df)
+            else:
+                if transposition == 'accidentals':
+                    ascore = MusicUtils.adjust_score_accidentals(ascore, partnames=partnames, inPlace=False)
+                classinfo = note.Note if settings['table'] == 'notes' else interval.Interval
+                df, pnames, pnums = MusicUtils.get_music21_objects_for_score(classinfo, ascore, partnames, settings['partnumbers'])
+            result = (score_title, df, pnames, pnums)
+        if cache is not None:
+            cache.put(file_path, settings, result, number)
+        return result
+    
+    @staticmethod
+    def filter_score(ascore:Score, keypart:str=None, filters:dict=None) -> bool:
+        """Checks if a Score matches the filters, see get_scores_from_corpus()
+        
+        If it does and there is a keypart, the Key of all Parts is set to the Key of the keypart.
+        Returns:
+            True if the Score matches or there are no filters, False otherwise
+        """
+        if filters is None or 'mode' not in filters or keypart is None:
+            return True
+        mode = filters['mode']
+        spinfo = MusicUtils.get_score_parts_info(ascore, partnames=[keypart])
+        if keypart in spinfo and spinfo[keypart]['mode']==mode:
+            if MusicUtils.verbose > 0:
+                print(f'title: {ascore.metadata.title}')
+            #
+            # update the key to all parts
+            #
+            new_key = None
+            if 'key' in spinfo[keypart]:
+                new_key = spinfo[keypart]['key']
+            for apart in ascore.parts:
+                if apart.partName != keypart:
+                    measures = apart.getElementsByClass(Measure)
+                    for m in measures:
+                        keys = m.getElementsByClass([key.Key, key.KeySignature])
+                        if len(keys) > 0:
+                            for k in keys:
+                                if MusicUtils.verbose > 1:
+                                    print(f'update {m} in {ascore.metadata.title}  {apart.partName} to key:{new_key}')
+                                if new_key is not None:
+                                    m.removeByClass([key.Key, key.KeySignature])
+                                    m.insert(spinfo[keypart]['key'])
+            return True
+        return False
+    
+    @staticmethod
+    def get_scores_from_corpus(composer=None, title=None, keypart:str=None, filters:dict=None, index=None):
         """Gets a list of Score objects from the corpus matching the composer and title provided.
         
         Args:
@@ -437,6 +690,7 @@ class MusicUtils(object):
             title = the title to search. This can be a regular expression, for example '^bwv31[0-3]', or a single work name as in 'bwv310'
             keypart - the name of the Part (if any) that determines the overall score Key.
             filters - a dictionary of filter values. Currently only filter is 'mode' which can be 'major' or 'minor'
+            index - a music.CorpusIndex used to find the scores instead of a corpus search, see get_corpus_paths()
         Returns:
             a 2-element tupple of the list of matching Score, and a list of corresponding str (titles)
             
@@ -445,43 +699,15 @@ class MusicUtils(object):
         If mode filter and keypart are both provided, then the Key to all Parts is set to be the same as in keypart.
         
         Note - if keypart is provided but that part is NOT in a score, that score is NOT added to the lists of scores & titles returned.
+        To parse the scores in worker processes use get_corpus_tables(), which returns the notes or intervals instead of the Scores.
         """
         scores = []
         titles = []
-        meta = MusicUtils.get_metadata_bundle(composer, title)
-        for i in range(len(meta)):
-            md = meta[i].metadata
-            ascore = corpus.parse(meta[i])
-
-            if filters is not None and 'mode' in filters and keypart is not None:     # check if the score matches the filter
-                mode = filters['mode']
-                spinfo = MusicUtils.get_score_parts_info(ascore, partnames=[keypart])
-                if keypart in spinfo and spinfo[keypart]['mode']==mode:
-                    if MusicUtils.verbose > 0:
-                        print(f'title: {md.title}')
-                    #
-                    # update the key to all parts
-                    #
-                    new_key = None
-                    if 'key' in spinfo[keypart]:
-                        new_key = spinfo[keypart]['key']
-                    for apart in ascore.parts:
-                        if apart.partName != keypart:
-                            measures = apart.getElementsByClass(Measure)
-                            for m in measures:
-                                keys = m.getElementsByClass([key.Key, key.KeySignature])
-                                if len(keys) > 0:
-                                    for k in keys:
-                                        if MusicUtils.verbose > 1:
-                                            print(f'update {m} in {md.title}  {apart.partName} to key:{new_key}')
-                                        if new_key is not None:
-                                            m.removeByClass([key.Key, key.KeySignature])
-                                            m.insert(spinfo[keypart]['key'])
-                    scores.append(ascore)
-                    titles.append(md.title)
-            else:   
+        for path, number, score_title in MusicUtils.get_corpus_paths(composer, title, keypart, filters, index):
+            ascore = MusicUtils.parse_score(path, number)
+            if MusicUtils.filter_score(ascore, keypart, filters):
                 scores.append(ascore)
-                titles.append(md.title)
+                titles.append(score_title)
                 
         return scores,titles
     
@@ -560,8 +786,7 @@ class MusicUtils(object):
     @staticmethod
     def get_interval_stats(ascore, partnames=None, partnumbers=None):
         int_df,pnames,pnums = MusicUtils.get_intervals_for_score(ascore, partnames, partnumbers)
-        int_df = int_df.groupby(by=['semitones']).count()[['interval']]
-        int_df.rename(columns={'interval':'count'}, inplace=True)
+        int_df = int_df.groupby(by=['semitones']).size().to_frame('count')
         int_df.reset_index(inplace=True)       
         return int_df.sort_values(by='count', ascending=False)
 
@@ -628,11 +853,11 @@ class MusicUtils(object):
         instruments_info = Instruments()
         instruments_pd = instruments_info.instruments_pd
         for pn in partnames:
-            part_instrument = instruments_pd.loc[pn].instance
+            part_instrument = copy.deepcopy(instruments_pd.loc[pn].instance)     # the registry instances are shared
             score_instruments.append(part_instrument)
-            pitch_range = instruments_pd.loc[pn]['range_ps']
+            pitch_range = instruments_info.get_range(pn)
             clef_name = instruments_pd.loc[pn]['clef']
-            clef = instruments_info.clefs_pd.loc[clef_name]['instance']
+            clef = copy.deepcopy(instruments_info.clefs_pd.loc[clef_name]['instance'])
             part = MusicUtils.random_part(pitch_range[0], pitch_range[1], length, min_duration, clef, instrument=part_instrument)
             score.append(part)
         return score
@@ -891,7 +1116,114 @@ class MusicUtils(object):
                                                instruments=instruments, inPlace=inPlace, adjustAccidentals=adjustAccidentals)
                 new_score.append(tp)
         return new_score
-    
+
+    @staticmethod
+    def get_transposed_notes_for_score(ascore:Score, target_key=C_Major, target_key_minor=A_Minor, partnames:[str]=None, partnumbers:[int]=None, \
+                                       instruments:Instruments=None) -> (pd.DataFrame,{str},{int}):
+        """Get the notes of a Score transposed to a new Key without transposing the Score itself
+
+        The result is the same as get_notes_for_score(transpose_score(ascore, target_key, target_key_minor, partnames, instruments), partnames, partnumbers)
+        The notes table of the original Score is transposed with transpose_notes().
+        Returns:
+            a 3-tuple of the notes_df DataFrame, a set of part names and a set of part numbers as in get_notes_for_score()
+        """
+        score_parts = MusicUtils.get_score_parts(ascore)
+        if partnames is not None:       # transpose_score() only includes these Parts
+            score_parts = {pname:apart for pname,apart in score_parts.items() if pname in partnames}
+        notes_df, score_partnames, score_partnumbers = MusicUtils._get_parts_notes(score_parts, partnames, partnumbers)
+        if len(notes_df) > 0:
+            part_keys = dict()
+            for pname in score_partnames:
+                key_sigs, measure_numbers = MusicUtils.get_keySignatures(score_parts[pname])
+                measure_numbers.append(len(score_parts[pname]))
+                part_keys[pname] = (key_sigs, measure_numbers)
+            notes_df = MusicUtils.transpose_notes(notes_df, part_keys, target_key, target_key_minor, instruments)
+        return notes_df, score_partnames, score_partnumbers
+
+    @staticmethod
+    def transpose_notes(notes_df:pd.DataFrame, part_keys:{str:tuple}, target_key=C_Major, target_key_minor=A_Minor, \
+                        instruments:Instruments=None, preference:object=default_pitch_map) -> pd.DataFrame:
+        """Transposes a compact notes table as transpose_part() transposes the Parts of a Score
+
+        The notes in the measures of each Key are transposed by the interval get_transposition_intervals() gives for that Key
+        and their accidentals adjusted, then the octave of notes outside an instrument's range is changed.
+        A music21 Pitch is transposed once for each distinct pitch, Key and octave change,
+        and the results are applied to all the rows with that pitch. The notes table is not modified.
+            Args:
+                notes_df - a notes table created by get_notes_for_score() from the original Score
+                part_keys - a dict of part name : ([KeySignature], [measure numbers]) as returned by get_keySignatures()
+                            with the number of elements in the Part appended to the measure numbers, as in transpose_part()
+                target_key, target_key_minor, instruments - as in transpose_part()
+                preference - the accidental preference, see adjust_accidental()
+            Returns:
+                a new notes table with the name, nameWithOctave, pitchClass, ps and scaleDegree columns transposed
+        """
+        names = notes_df['nameWithOctave'].to_numpy(dtype=object, copy=True)
+        scale_degrees = notes_df['scaleDegree'].to_numpy(dtype=object, copy=True)
+        part_names = notes_df['part_name'].to_numpy(dtype=object)
+        measures = notes_df['measure'].to_numpy()
+        for pname, (key_sigs, measure_numbers) in part_keys.items():
+            in_part = part_names == pname
+            part_measures = measures[in_part]
+            part_notes = names[in_part]
+            transposed_keys = []
+            intervals = MusicUtils.get_transposition_intervals(key_sigs, key2=target_key, key2_minor=target_key_minor)
+            for i, intval in enumerate(intervals):
+                rows = (part_measures >= measure_numbers[i]) & (part_measures <= measure_numbers[i+1]-1)
+                part_notes[rows] = MusicUtils.map_values(part_notes[rows], \
+                                                         lambda n: MusicUtils.transpose_pitch_name(n, intval, preference))
+                akey = key_sigs[i] if intval.semitones == 0 else key_sigs[i].transpose(intval)
+                transposed_keys.append(akey if isinstance(akey, key.Key) else akey.asKey())
+
+            if instruments is not None:
+                ps = MusicUtils.map_values(part_notes, lambda n: pitch.Pitch(n).ps).astype(np.float64)    # quarter tones are not truncated
+                semitones = (instruments.adjust_pitches_to_range(pname, ps) - ps).astype(np.int64)         # whole octaves
+                for octaves in np.unique(semitones[semitones != 0]):
+                    rows = semitones == octaves
+                    tintval = interval.Interval(int(octaves))
+                    part_notes[rows] = MusicUtils.map_values(part_notes[rows], lambda n: pitch.Pitch(n).transpose(tintval).nameWithOctave)
+            names[in_part] = part_notes
+            #
+            # the scale degrees are relative to the transposed Keys
+            #
+            if len(transposed_keys) > 0:
+                k = np.maximum(np.searchsorted(measure_numbers[:len(transposed_keys)], part_measures, side='right') - 1, 0)
+                part_degrees = scale_degrees[in_part]
+                for ki in np.unique(k):
+                    akey = transposed_keys[ki]
+                    part_degrees[k == ki] = MusicUtils.map_values(part_notes[k == ki], \
+                                                                  lambda n: MusicUtils.get_scale_degree(akey, pitch.Pitch(n))['number'])
+                scale_degrees[in_part] = part_degrees
+
+        pitches = {n:pitch.Pitch(n) for n in pd.unique(names)}
+        transposed_df = notes_df.copy()
+        transposed_df['name'] = [pitches[n].name for n in names]
+        transposed_df['nameWithOctave'] = names
+        transposed_df['pitchClass'] = [pitches[n].pitchClass for n in names]
+        transposed_df['ps'] = [pitches[n].ps for n in names]
+        transposed_df['scaleDegree'] = scale_degrees
+        return MusicUtils.compact_table(transposed_df)
+
+    @staticmethod
+    def transpose_pitch_name(name:str, intval:interval.Interval, preference:object=default_pitch_map) -> str:
+        """Transposes a pitch nameWithOctave and adjusts its accidental as transpose_part() does a Note
+
+        """
+        anote = note.Note(name)
+        if intval.semitones != 0:
+            anote.transpose(intval, inPlace=True)
+        return MusicUtils.adjust_accidental(anote, preference).nameWithOctave
+
+    @staticmethod
+    def map_values(values:np.ndarray, func) -> np.ndarray:
+        """Applies a function to each distinct value of an array, returns an object array of the results
+
+        """
+        codes, uniques = pd.factorize(values)
+        results = np.empty(len(uniques), dtype=object)
+        results[:] = [func(u) for u in uniques]
+        return results[codes]
+
     @staticmethod
     def extend_parts(ascore:Score, padlen:duration.Duration, time_signature = None):
         '''
@@ -16,9 +16,12 @@
 
 from music.musicCollector import MusicCollector
 from music.musicUtils import MusicUtils
+from music.midiReader import MidiReader
 from common.markovChain import MarkovChain
+from common.chainCounts import ChainCounts
 from common.collectorProducer import CollectorProducer
 import pandas as pd
+import os
 from music21 import  converter, corpus, note
 
 class NoteCollector(MusicCollector):
@@ -78,6 +81,9 @@ class NoteCollector(MusicCollector):
         self.number_of_scores = 0                   # can be >1 if searching a corpus
         self.transposed_scores = []                 # if collection mode is diatonic pitch or pitch class
         self.transposed_score = None                # a single score if diatonic collection
+        self.transpose_scores = False               # if True diatonic collection transposes the Scores, otherwise only their notes tables
+        self.streaming = False                      # if True corpus scores are collected one at a time, see collect_streaming()
+        self.save_notes = True                      # if False the notes_df is not written to a _notes_df.csv file
         MusicUtils.verbose = verbose
         
         self.pitch_class_mode = (collection_mode == 'dpc' or collection_mode == 'apc')
@@ -137,42 +143,63 @@ class NoteCollector(MusicCollector):
         --source "composer='bach',title='bwv*'"     # corpus wild card search for composer and title
         --source $CORPUS/haydn/opus74no1            # an individual corpus file
         --source '/data/music/Corpus/dwbzen/Prelude.mxl'    # a single musicXML file. The .mxl may be omitted
+        --source '/data/music/midi/Prelude.mid'     # a single MIDI file, read with MidiReader without parsing a Score
+        --source '/data/music/midi'                 # all the MIDI files in a folder and its subfolders
         --source [filename].json                    # load a serialized notes DataFrame (TODO)
         
         
         """
         result = True
-        title = None
-        composer = None
         range_instruments = None
         if self.enforce_range:
             range_instruments = self.instruments
                
-        if 'composer' in source or 'title' in source:
+        if MidiReader.is_midi_source(source):
+            #
+            # MIDI files are decoded straight into the notes table, so scores and transposed_scores are empty
+            #
+            transposition = 'diatonic' if self.diatonic else None
+            self.notes_df, self.score_partNames, self.score_partNumbers, self.titles = \
+                MidiReader.get_tables(source, note.Note, partnames=self.part_names, partnumbers=self.part_numbers, \
+                                      transposition=transposition, instruments=range_instruments, workers=self.workers)
+            self.number_of_scores = len(self.titles)
+            result = len(self.notes_df) > 0
+        elif NoteCollector.is_corpus_search(source):
             #
             # search the corpus for multiple scores
             # for example: "composer=bach,title=^bwv4+"
             #
-            search_string = source.split(",", maxsplit=1)    # title can be a regular expression with embedded commas
-            for ss in search_string:
-                st = ss.split('=')
-                if st[0] == 'composer':
-                    composer = st[1]
-                elif st[0] == 'title':
-                    title = st[1]
+            composer, title = NoteCollector.get_corpus_search(source)
 
-            self.scores, self.titles = MusicUtils.get_scores_from_corpus(composer=composer, title=title, keypart=self.key_partName, filters=self.score_filters)
-            self.number_of_scores = len(self.scores)
+            if self.workers is not None or self.score_cache is not None:
+                #
+                # parse, transpose and extract the notes of each score in worker processes and/or using the score cache
+                # only the notes are returned, so scores and transposed_scores are empty
+                #
+                transposition = 'diatonic' if self.diatonic else 'accidentals'
+                self.notes_df, self.score_partNames, self.score_partNumbers, self.titles = \
+                    MusicUtils.get_corpus_tables(note.Note, composer=composer, title=title, keypart=self.key_partName, filters=self.score_filters, \
+                                                 partnames=self.part_names, partnumbers=self.part_numbers, \
+                                                 transposition=transposition, instruments=range_instruments, workers=self.workers, cache=self.score_cache, index=self.corpus_index)
+                self.number_of_scores = len(self.titles)
+            else:
+                self.scores, self.titles = MusicUtils.get_scores_from_corpus(composer=composer, title=title, keypart=self.key_partName, filters=self.score_filters, \
+                                                                             index=self.corpus_index)
+                self.number_of_scores = len(self.scores)
                 
+            notes_dfs = [self.notes_df]
             for ascore in self.scores:
                 if self.verbose > 0:
                     print(f"working on {ascore.metadata.title}")
-                if self.diatonic:
+                if self.diatonic and not self.transpose_scores:
                     #
-                    # transpose the score if collection mode is diatonic
+                    # transpose the notes of the score if collection mode is diatonic
                     # default target key of C-Major  or A-minor is used
                     # based on the mode (major or minor) of the original Keys of each part
-                    #                    
+                    #
+                    notesdf, pnames, pnums = \
+                        MusicUtils.get_transposed_notes_for_score(ascore, partnames=self.part_names, partnumbers=self.part_numbers, instruments=range_instruments)
+                elif self.diatonic:
                     transposed_score = MusicUtils.transpose_score(ascore, partnames=self.part_names, instruments=range_instruments)
                     self.transposed_scores.append(transposed_score)
                     notesdf, pnames, pnums = MusicUtils.get_notes_for_score(transposed_score, self.part_names, self.part_numbers)
@@ -185,20 +212,26 @@ class NoteCollector(MusicCollector):
                     notesdf, pnames, pnums = MusicUtils.get_notes_for_score(transposed_score, self.part_names, self.part_numbers)
                 
                 if self.verbose > 2 and len(notesdf)>0 and 3 in notesdf['pitchClass']:  # temporary debugging code
-                    print(notesdf[notesdf['pitchClass']==3][['part_name','pitch']])
+                    print(notesdf[notesdf['pitchClass']==3][['part_name','nameWithOctave']])
                     
-                self.notes_df = pd.concat([self.notes_df, notesdf])  # deprecated:   self.notes_df.append(notesdf)
+                notes_dfs.append(notesdf)
                 if len(pnames) > 0:
                     self.score_partNames = self.score_partNames.union(pnames)
                 if len(pnums) > 0:
                     self.score_partNumbers = self.score_partNumbers.union(pnums)
                 
+            if len(self.scores) > 0:
+                self.notes_df = pd.concat(notes_dfs)     # once, concatenating each score's notes in turn copies all the notes so far
             if self.notes_df is None or len(self.notes_df) == 0:
                 result = False
+            else:
+                self.notes_df = MusicUtils.compact_table(self.notes_df)
         else:
             #
             # a single filename or path - one score
             #
+            if self.score_cache is not None:
+                return self.set_cached_source(source, range_instruments)
             if source.startswith('$CORPUS'):
                 corpus_file = self.corpus_folder + source[6:]
                 self.score = corpus.parse(corpus_file)
@@ -211,10 +244,13 @@ class NoteCollector(MusicCollector):
             if self.score is not None:
                 self.scores.append(self.score)
                 self.number_of_scores = 1
-                if self.diatonic:
-                    # diatonic pitch - transpose the score to C-Major or C-Minor
+                if self.diatonic and not self.transpose_scores:
+                    # diatonic pitch - transpose the notes to C-Major or C-Minor
                     # and enforce instrument ranges if needed (if enforce_range is True)
                     #
+                    self.notes_df, self.score_partNames, self.score_partNumbers = \
+                        MusicUtils.get_transposed_notes_for_score(self.score, partnames=self.part_names, partnumbers=self.part_numbers, instruments=range_instruments)
+                elif self.diatonic:
                     self.transposed_score = MusicUtils.transpose_score(self.score, partnames=self.part_names, instruments=range_instruments)
                     self.transposed_scores.append(self.transposed_score)
                     self.notes_df, self.score_partNames, self.score_partNumbers = \
@@ -227,6 +263,38 @@ class NoteCollector(MusicCollector):
 
         return result
 
+    def set_cached_source(self, source, range_instruments) -> bool:
+        """Sets the notes_df of a single score file using the score_cache
+        
+        The notes are loaded from the cache if the file was collected before with the same settings,
+        otherwise the score is parsed and its notes are added to the cache. The Score itself is not available.
+        """
+        if source.startswith('$CORPUS'):
+            path = self.corpus_folder + source[6:]
+        else:
+            path = MusicUtils.get_file_info(source)['path_text']
+        if not os.path.exists(path):
+            return False
+        transposition = 'diatonic' if self.diatonic else None
+        settings = MusicUtils.get_table_settings(note.Note, partnames=self.part_names, partnumbers=self.part_numbers, \
+                                                 transposition=transposition, instruments=range_instruments)
+        _, self.notes_df, self.score_partNames, self.score_partNumbers = \
+            MusicUtils.get_score_table((path, None, path, settings, range_instruments, self.score_cache))
+        self.number_of_scores = 1
+        return True
+
+    def set_update_source(self, source):
+        """update() collects the new material from a score or corpus search, see set_source()
+        
+        """
+        self.source_path = source
+        self.score = None
+        self.scores = []
+        self.transposed_scores = []
+        self.notes_df = None
+        self.score_partNames = set()
+        self.score_partNumbers = set()
+
     def process(self, key_notes:pd.DataFrame, next_note:pd.Series) -> (pd.DataFrame, pd.Series):
         """Adds key_notes and next_note to counts_df DataFrame
             In pitch mode the Note attribute counted is 'nameWithOctave' as in "C4"
@@ -250,40 +318,63 @@ class NoteCollector(MusicCollector):
         if self.verbose > 1:
             print(f"key_note: {index_str}, next_note: {col_str}")
         
-        if self.counts_df is None:
-            # initialize the counts DataFrame
-            if self.pitch_mode:
-                self.counts_df = pd.DataFrame(data=[1],index=[index_str], columns=[next_note.nameWithOctave])
-            elif self.pitch_class_mode:
-                self.counts_df = pd.DataFrame(data=[1],index=[index_str], columns=[next_note.loc['name']])
-            else:  # self.scale_degree_mode:
-                self.counts_df = pd.DataFrame(data=[1],index=[index_str], columns=[next_note.loc['scaleDegree']])
-        
-        else:
-            if index_str not in self.counts_df.index:   # add a new row
-                self.counts_df.loc[index_str, col_str] = 1
-                # self.counts_df.loc[index_str, col_name] = 1
-            else: # update existing index
-                if col_str in self.counts_df.columns:
-                    self.counts_df.loc[index_str, col_str] = 1 + self.counts_df.loc[index_str, col_str]
-                else:
-                    self.counts_df.loc[index_str, col_str] = 1
-        self.counts_df = self.counts_df.fillna(0)
+        self.add_count(index_str, col_str)
             
+    def get_source_df(self) -> pd.DataFrame:
+        return self.notes_df
+    
+    def get_token_column(self) -> str:
+        if self.pitch_mode:
+            return 'nameWithOctave'
+        elif self.pitch_class_mode:
+            return 'name'
+        else:  # self.scale_degree_mode:
+            return 'scaleDegree'
+    
+    def get_table_tasks(self) -> list:
+        """Returns a (get_table, task) for each score of a corpus search or MIDI file of the source_path, see collect_sharded()
+        
+        The scores are transposed and their ranges enforced as set_source() does.
+        """
+        range_instruments = self.instruments if self.enforce_range else None
+        if MidiReader.is_midi_source(self.source_path):
+            transposition = 'diatonic' if self.diatonic else None
+            return [(MidiReader.get_table, task) for task in MidiReader.get_table_tasks(self.source_path, note.Note, partnames=self.part_names, \
+                                                                 partnumbers=self.part_numbers, transposition=transposition, instruments=range_instruments)]
+        composer, title = NoteCollector.get_corpus_search(self.source_path)
+        transposition = 'diatonic' if self.diatonic else 'accidentals'
+        return [(MusicUtils.get_score_table, task) for task in MusicUtils.get_corpus_tasks(note.Note, composer=composer, title=title, keypart=self.key_partName, \
+                                            filters=self.score_filters, partnames=self.part_names, partnumbers=self.part_numbers, transposition=transposition, \
+                                            instruments=range_instruments, workers=self.workers, cache=self.score_cache, index=self.corpus_index)]
+    
     def collect(self) -> MarkovChain:
         """Run collection on the notes_df DataFrame created from the source score(s)
         
         The collection unit is a score part name. Score part_names are in self.score_partNames set.
         The first MarkovChain key entry will consists of the initial_object + the first order-1 notes.
         The last entry will have the terminal_object as the last note.
+        If workers is set the scores of a corpus search or MIDI source are read and counted in worker processes, see collect_sharded().
         Returns MarkovChain result
         """
+        if self.streaming and self.source_path is not None and \
+                (NoteCollector.is_corpus_search(self.source_path) or MidiReader.is_midi_source(self.source_path)):
+            return self.collect_streaming()
+        
+        if self.workers is not None and self.source_path is not None and \
+                (NoteCollector.is_corpus_search(self.source_path) or MidiReader.is_midi_source(self.source_path)):
+            self.notes_df = None
+            self.table_filename = self.get_notes_df_filename() if self.save_notes else None
+            self.collect_sharded()
+            self.number_of_scores = len(self.titles)
+            return self.markovChain
+        
         if self.source_path is not None:
             self.source = self.set_source(self.source_path)
-            
-        filename = "{}/{}{}.csv".format(self.save_folder, self.name, self.notes_df_fileName)
-        self.notes_df.to_csv(path_or_buf=filename)
-        print(f"notes: {filename}")
+        
+        if self.save_notes:
+            filename = self.get_notes_df_filename()
+            self.notes_df.to_csv(path_or_buf=filename)
+            print(f"notes: {filename}")
         
         for pname in self.score_partNames:
 
@@ -308,40 +399,71 @@ class NoteCollector(MusicCollector):
             next_note = self.terminal_object.iloc[0]
             self.process(key_notes, next_note)
 
-        self.counts_df.rename_axis('KEY', inplace=True)
-        if self.sort_chain:
-            self.counts_df.sort_index('index', ascending=True, inplace=True)
-            self.counts_df.sort_index(axis=1, ascending=True, inplace=True)
-        #
-        # create the MarkovChain from the counts by added probabilities
-        #
-        sums = self.counts_df.sum(axis=1)
-        self.chain_df = self.counts_df.div(sums, axis=0)
-        self.chain_df.rename_axis('KEY', inplace=True)
-        self.chain_df = self.chain_df.map(lambda x: MusicUtils.round_values(x, 6))
+        self.materialize_counts()
+        return self._create_music_chain(self.notes_df)
+
+    def collect_streaming(self) -> MarkovChain:
+        """Collects a corpus search or the MIDI files of a MIDI source one score at a time
         
-        self.markovChain = MarkovChain(self.order, self.counts_df,  chain_df=self.chain_df, myname=self.name)
+        Each score or file is parsed, its notes extracted, and the notes and durations of its parts counted.
+        Then the score and its notes are discarded, so the memory used depends on the largest score
+        and not on the number of scores. The notes of a part continue the part of the same name in the
+        previous score, so the MarkovChains are the same as collect() creates, although the order
+        of the counts_df rows and columns may differ. The notes_df is not kept and, if save_notes is True,
+        is appended to the _notes_df.csv file as each score is collected.
+        If workers is set scores are parsed in worker processes a few scores ahead of the one counted.
+        """
+        range_instruments = self.instruments if self.enforce_range else None
+        if MidiReader.is_midi_source(self.source_path):
+            tables = MidiReader.iter_tables(self.source_path, note.Note, partnames=self.part_names, partnumbers=self.part_numbers, \
+                                            transposition='diatonic' if self.diatonic else None, instruments=range_instruments, workers=self.workers)
+        else:
+            composer, title = NoteCollector.get_corpus_search(self.source_path)
+            transposition = 'diatonic' if self.diatonic else 'accidentals'
+            tables = MusicUtils.iter_corpus_tables(note.Note, composer=composer, title=title, keypart=self.key_partName, filters=self.score_filters, \
+                                                   partnames=self.part_names, partnumbers=self.part_numbers, transposition=transposition, \
+                                                   instruments=range_instruments, workers=self.workers, cache=self.score_cache, index=self.corpus_index)
+        filename = self.get_notes_df_filename() if self.save_notes else None
+        notes_written = False
+        self.notes_df = None
+        self.number_of_scores = 0
+        self.titles = []
+        self._chain_counts = ChainCounts(self.order, self.key_separator)
+        self.start_durations()
+        for result in tables:
+            if result is None:
+                continue
+            score_title, notes_df, pnames, pnums = result
+            self.number_of_scores = self.number_of_scores + 1
+            self.titles.append(score_title)
+            if len(notes_df) == 0:
+                continue
+            self.score_partNames = self.score_partNames.union(pnames)
+            self.score_partNumbers = self.score_partNumbers.union(pnums)
+            for pname in pd.unique(notes_df['part_name']):
+                self._chain_counts.add_sequence(self.get_tokens(notes_df[notes_df['part_name']==pname]), name=pname)
+            self.durationCollector.add_durations(MusicUtils.get_durations_from_notes(notes_df))
+            if filename is not None:
+                notes_df.to_csv(path_or_buf=filename, mode='a' if notes_written else 'w', header=not notes_written)
+                notes_written = True
         
-        if self.verbose > 1:
-            print(f" Counts:\n {self.counts_df}")
-            print(f" MarkovChain:\n {self.markovChain}")
-            if self.verbose > 1:
-                print(self.markovChain.__repr__())
-        #
-        # collect durations from the Score and notes_df DataFrame
-        #
-        self.collect_durations(self.notes_df)
-        return self.markovChain
-
+        if notes_written:
+            print(f"notes: {filename}")
+        self.finish_counts(self._chain_counts)
+        self.materialize_counts()
+        return self._create_music_chain(None)
+    
+    def get_notes_df_filename(self) -> str:
+        return "{}/{}{}.csv".format(self.save_folder, self.name, self.notes_df_fileName)
     
     def save(self):
         """Saves the chain_df, counts_df, and notes_df DataFrames to a file in specified format.
         
         """
         save_result = super().save()
-        if self.notes_df is not None and self.name is not None:
+        if self.notes_df is not None and self.name is not None and self.format != 'npz':
             #
-            # optionally save notes_df as .csv
+            # optionally save notes_df as .csv, the npz format is only the chain file
             #
             filename = "{}/{}_notes.{}".format(self.save_folder, self.name, self.format)
             df = self.notes_df[['name','nameWithOctave','pitchClass','ps','part_name','part_number','quarterLength', 'scaleDegree']]
@@ -14,6 +14,8 @@
 
 from common.collector import Collector
 from music.noteCollector import NoteCollector
+from music.scoreCache import ScoreCache
+from music.corpusIndex import CorpusIndex
 import argparse
 
 class NoteCollectorRunner(Collector):
@@ -24,11 +26,16 @@ class NoteCollectorRunner(Collector):
     if __name__ == '__main__':
         parser = argparse.ArgumentParser()
         parser.add_argument("--order", "-o", help="the order of the Markov Chain", type=int, choices=range(1,5))
-        parser.add_argument("-s", "--source", help="input file (.mxl or .musicxml), folder name, or composer name ('bach' for example)")
+        parser.add_argument("-s", "--source", help="input file (.mxl, .musicxml or .mid), folder of MIDI files, or composer name ('bach' for example)")
         parser.add_argument("-v","--verbose", help="increase output verbosity", action="count", default=0)
         parser.add_argument("-n","--name", help="Name of resulting MarkovChain, used to save to file", type=str)
-        parser.add_argument("-f","--format", help="Save output format. Default is csv", type=str, choices=['csv','json','xlsx'], default='csv' )
+        parser.add_argument("-f","--format", help="Save output format. Default is csv", type=str, choices=['csv','json','xlsx','npz'], default='csv' )
         parser.add_argument("--sort", help="Sort resulting MarkovChain ascending on both axes", action="store_true", default=False)
+        parser.add_argument("--workers", "-w", help="Number of worker processes to parse corpus scores and collect with, default is to work serially", type=int, default=None)
+        parser.add_argument("--cache", help="Cache the notes extracted from each score in the data folder and reuse them in later runs", action="store_true", default=False)
+        parser.add_argument("--index", help="Find corpus scores with the corpus index in the data folder, creating it if needed", action="store_true", default=False)
+        parser.add_argument("--stream", help="Collect corpus scores or MIDI files one at a time without keeping them in memory", action="store_true", default=False)
+        parser.add_argument("--nonotes", help="Do not write the notes DataFrame to a _notes_df.csv file", action="store_true", default=False)
         parser.add_argument("-d","--display", help="display resulting MarkovChain in json or cvs format",type=str, choices=['csv','json','chain'] )
         parser.add_argument("-p","--parts", help="part name(s) or number(s) to include in building the MarkovChain", type=str)
         parser.add_argument("-m", "--mode", \
@@ -50,6 +57,14 @@ class NoteCollectorRunner(Collector):
         collector.name = args.name
         collector.format = args.format
         collector.sort_chain = args.sort
+        collector.workers = args.workers
+        collector.transpose_scores = args.show == 'transposed'     # otherwise only the notes are transposed
+        collector.streaming = args.stream
+        collector.save_notes = not args.nonotes
+        if args.cache and args.show == 'none':     # the Score is not available when it is cached
+            collector.score_cache = ScoreCache()
+        if args.index:
+            collector.corpus_index = CorpusIndex()
         collector.set_score_filter(args.filter)    # could be None
         collector.key_partName = args.keypart      # could be None
         #
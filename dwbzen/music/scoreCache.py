@@ -0,0 +1,146 @@
+# ------------------------------------------------------------------------------
+# Name:          scoreCache.py
+# Purpose:       ScoreCache class.
+#
+#                ScoreCache is a persistent, size-bounded cache of the notes
+#                and intervals DataFrames extracted from scores.
+#
+# Authors:      Donald Bacon
+#
+# Copyright:    Copyright 2026 Donald Bacon
+# License:      BSD, see license.txt
+# ------------------------------------------------------------------------------
+
+from common.environment import Environment
+from common.collectorProducer import CollectorProducer
+import hashlib, json, os, pickle
+
+class ScoreCache(object):
+    """An on-disk cache of what is extracted from a score file so collecting it again skips the parsing.
+
+    An entry is the pickled result of MusicUtils.get_score_table(): the notes or intervals DataFrame
+    and the part names and numbers of a score, or None if the score did not pass the filters.
+    Entries are keyed by the score file path, work number, modification time and content hash (SHA-256)
+    and the extraction settings (table, parts, transposition, filters and so on),
+    so a changed file or different settings are a cache miss.
+    The work number selects one work of a file that has several, for example an ABC tune book.
+
+    The cache is bounded by max_size bytes. When it is exceeded the least recently used entries are removed.
+    The modification time of an entry file is its last use.
+    The default cache folder is score_cache in the Environment music data folder.
+    """
+
+    default_max_size = 512 * 1024 * 1024
+
+    def __init__(self, cache_folder:str=None, max_size:int=default_max_size):
+        if cache_folder is None:
+            cache_folder = os.path.join(Environment.get_environment().get_data_folder('music'), 'score_cache')
+        self.cache_folder = cache_folder
+        self.max_size = max_size
+        self._digests = {}      # (path, mtime, size) : content hash, so a file is read once per process
+
+    def __repr__(self):
+        return f"ScoreCache {self.cache_folder} max_size={self.max_size}"
+
+    def get_content_hash(self, path:str) -> str:
+        stat = os.stat(path)
+        file_key = (path, stat.st_mtime_ns, stat.st_size)
+        digest = self._digests.get(file_key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    sha.update(block)
+            digest = sha.hexdigest()
+            self._digests[file_key] = digest
+        return digest
+
+    def get_key(self, path:str, settings:dict, number:str=None) -> str:
+        """Returns the cache key of a score file and extraction settings
+
+        Parameters:
+            path - the score file path
+            settings - a dict of the settings used to extract the DataFrame. The values must be JSON serializable
+            number - the work number of a score in a file with several works, or None for the whole file
+        """
+        path = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime_ns
+        key = json.dumps([path, number, mtime, self.get_content_hash(path), settings], sort_keys=True)
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def get_filename(self, path:str, settings:dict, number:str=None) -> str:
+        return os.path.join(self.cache_folder, self.get_key(path, settings, number) + '.pkl')
+
+    def get(self, path:str, settings:dict, number:str=None) -> (bool, object):
+        """Gets the cached value for a score file and extraction settings
+
+        Returns:
+            a 2-element tuple, True and the value if it is in the cache, otherwise (False, None)
+        """
+        filename = self.get_filename(path, settings, number)
+        try:
+            with open(filename, 'rb') as f:
+                value = pickle.load(f)
+            os.utime(filename)      # most recently used
+            return True, value
+        except FileNotFoundError:
+            return False, None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            self.remove(filename)   # unreadable, parse the score again
+            return False, None
+
+    def put(self, path:str, settings:dict, value:object, number:str=None):
+        """Adds the value for a score file and extraction settings, then evicts entries if the cache is too large
+
+        """
+        os.makedirs(self.cache_folder, exist_ok=True)
+        with CollectorProducer.atomic_file(self.get_filename(path, settings, number)) as cache_file:
+            with open(cache_file, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.evict()
+
+    def get_entries(self) -> list:
+        """Returns a list of (last use, size, filename) of the cache entries, least recently used first
+
+        """
+        entries = []
+        if os.path.isdir(self.cache_folder):
+            for entry in os.scandir(self.cache_folder):
+                if entry.name.endswith('.pkl') and not entry.name.startswith('.'):
+                    try:
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                    except FileNotFoundError:   # removed by another process
+                        pass
+        entries.sort()
+        return entries
+
+    @property
+    def size(self) -> int:
+        return sum(e[1] for e in self.get_entries())
+
+    def evict(self):
+        """Removes least recently used entries until the cache size is <= max_size
+
+        """
+        entries = self.get_entries()
+        size = sum(e[1] for e in entries)
+        for _, entry_size, filename in entries:
+            if size <= self.max_size:
+                break
+            self.remove(filename)
+            size -= entry_size
+
+    def clear(self):
+        for _, _, filename in self.get_entries():
+            self.remove(filename)
+
+    @staticmethod
+    def remove(filename:str):
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+
+if __name__ == '__main__':
+    print(ScoreCache.__doc__)
@@ -4,6 +4,7 @@ from music.musicScale import MusicScale
 from music.instruments import Instruments
 from music21 import stream, instrument, key, meter
 from music21 import note, tempo, metadata
+import copy
 
 
 class ScoreGen(object):
@@ -33,7 +34,7 @@ class ScoreGen(object):
         self.part.partName = instrument_name
         self.instruments = Instruments()
         self.instrument = self.instruments.instruments_pd.loc[instrument_name]
-        clef = self.instruments.get_instrument_clef(instrument_name)
+        clef = copy.deepcopy(self.instruments.get_instrument_clef(instrument_name))    # the registry Clef is shared
         self.part.insert(clef)
         self.part.insert(self.tempo)
         self.part.insert(instrument.Instrument(instrumentName=instrument_name))
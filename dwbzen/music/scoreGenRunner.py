@@ -4,8 +4,9 @@ from music.scoreGen import ScoreGen
 from music.musicSubstitutionRules import MusicSubstitutionRules
 from music.musicSubstitutionSystem import MusicSubstitutionSystem
 from music.musicUtils import MusicUtils
+from music.midiWriter import MidiWriter
 from music21 import key, note
-import argparse, json
+import argparse, json, os
 from common.environment import Environment
 
 class ScoreGenRunner(object):
@@ -25,7 +26,8 @@ class ScoreGenRunner(object):
         parser.add_argument("--start", help="starting commands", type=str, nargs='*', default=start)
         parser.add_argument("--notes", help="Starting note(s) with octave", type=str, nargs='*', default=["C5"])
         parser.add_argument("--duration", "-d", help="Starting note duration in quarterLengths", type=float, default=4.0)
-        parser.add_argument("--show", help="How to view the resulting score, default is musicxml", type=str, default='musicxml')
+        parser.add_argument("--show", help="How to view the resulting score, default is musicxml. smf writes a MIDI file with MidiWriter", type=str, default='musicxml')
+        parser.add_argument("--name", help="Base name of the smf file written to the music data folder", type=str, default="ScoreGen")
         parser.add_argument("-v","--verbose", help="increase output verbosity", action="count", default=0)
         parser.add_argument("--trace", "-t", help="Trace rule processing", action="store_true", default=False)
         #
@@ -80,6 +82,11 @@ class ScoreGenRunner(object):
                 ascore.append(score_gen.part)
                 
         MusicUtils.extend_parts(ascore, maxpartlen)
-        ascore.show(args.show)
+        if args.show == 'smf':
+            filename = os.path.join(env.get_data_folder('music'), f"{args.name}.mid")
+            MidiWriter.from_score(ascore, score_gen.instruments).write(fp=filename)
+            print(f"MIDI file written to {filename}")
+        else:
+            ascore.show(args.show)
         
         
\ No newline at end of file
@@ -0,0 +1,122 @@
+# ------------------------------------------------------------------------------
+# Name:          scoreWriter.py
+# Purpose:       ScoreWriter class.
+#
+#                ScoreWriter writes Scores to files in a background thread
+#                while more Scores are produced.
+#
+# Authors:      Donald Bacon
+#
+# Copyright:    Copyright 2026 Donald Bacon
+# License:      BSD, see license.txt
+# ------------------------------------------------------------------------------
+
+from common.collectorProducer import CollectorProducer
+from music21 import stream
+import pandas as pd
+import os, queue, threading, time
+
+class ScoreWriter(object):
+    """Writes Scores to MusicXML, MIDI or text files, or event DataFrames to CSV files, in a background thread.
+
+    The smf format writes MidiWriter Standard MIDI Files, see MidiWriter.
+
+    Scores are added with put() as they are produced, and a writer thread exports them in order.
+    The queue holds at most max_pending Scores: put() waits when it is full,
+    so memory is bounded no matter how many Scores are produced.
+    Each file is written to a temporary file and renamed, so a file that exists is complete.
+    An error in the writer thread is raised by the next put() or by close().
+    """
+
+    formats = {'musicxml':'musicxml', 'midi':'mid', 'text':'txt', 'csv':'csv', 'smf':'mid'}
+
+    def __init__(self, folder:str, output_format:str='musicxml', max_pending:int=4, verbose=0):
+        if output_format not in ScoreWriter.formats:
+            raise ValueError(f"Invalid output format '{output_format}', must be one of {list(ScoreWriter.formats)}")
+        self.folder = folder
+        self.output_format = output_format
+        self.verbose = verbose
+        self.files_written = 0
+        self.write_seconds = 0.0        # time spent exporting, in the writer thread
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._error = None
+        self._thread = None
+
+    def __repr__(self):
+        return f"ScoreWriter {self.folder} format={self.output_format} written={self.files_written}"
+
+    def get_filename(self, name:str) -> str:
+        return os.path.join(self.folder, f"{name}.{ScoreWriter.formats[self.output_format]}")
+
+    def start(self) -> 'ScoreWriter':
+        os.makedirs(self.folder, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name='ScoreWriter', daemon=True)
+        self._thread.start()
+        return self
+
+    def put(self, score:stream.Score|pd.DataFrame, name:str):
+        """Adds a Score to write to the file name.extension in the folder, waits if max_pending Scores are queued
+
+        For the csv format, score is a DataFrame, for example MusicProducer.get_events_df(), for smf a MidiWriter
+        """
+        self._check_error()
+        if self._thread is None:
+            self.start()
+        self._queue.put((score, name))
+
+    def close(self) -> int:
+        """Waits for the queued Scores to be written and stops the writer thread
+
+        Returns:
+            the number of files written
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._check_error()
+        return self.files_written
+
+    def _check_error(self):
+        if self._error is not None:
+            error = self._error
+            self._error = None
+            raise error
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is not None:     # discard the rest after an error
+                continue
+            score, name = item
+            try:
+                start_time = time.perf_counter()
+                filename = self.get_filename(name)
+                with CollectorProducer.atomic_file(filename) as temp_file:
+                    if self.output_format == 'csv':
+                        score.to_csv(temp_file, index=False)
+                    else:
+                        score.write(self.output_format, fp=temp_file)
+                self.write_seconds += time.perf_counter() - start_time
+                self.files_written += 1
+                if self.verbose > 0:
+                    print(f"score written to {filename}")
+            except Exception as error:
+                self._error = error
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self._thread is not None:     # stop the thread, but don't hide the original exception
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        return False
+
+if __name__ == '__main__':
+    print(ScoreWriter.__doc__)
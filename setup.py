@@ -10,7 +10,8 @@ with open("README.md", "r", encoding="utf-8") as fh:
 
 requirements = [
     'music21 >=7.1.0',
-    'pandas >=1.4.3'
+    'pandas >=1.4.3',
+    'scipy'
 ]
 
 setup(
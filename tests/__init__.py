@@ -1,6 +1,10 @@
 from __future__ import absolute_import  # multi-line and relative/absolute imports
 
 __all__ = [
+    'collectorTest',
     'environmentTest',
-    'musicScaleTest'
+    'markovChainTest',
+    'musicScaleTest',
+    'musicUtilsTest',
+    'producerTest'
 ]
\ No newline at end of file
@@ -0,0 +1,260 @@
+'''
+Created on Oct 18, 2026
+
+@author: don_bacon
+'''
+
+import unittest
+from unittest import mock
+import os
+import tempfile
+import pandas as pd
+from common.wordCollector import WordCollector
+from common.characterCollector import CharacterCollector
+from common.chainCounts import ChainCounts
+from common.collectorProducer import CollectorProducer
+from common.backoffChain import BackoffChain
+from music.noteCollector import NoteCollector
+from music.intervalCollector import IntervalCollector
+from music.midiWriter import MidiWriter
+from music.midiReader import MidiReader
+from music.musicUtils import MusicUtils
+from music21 import corpus
+
+class CollectorTest(unittest.TestCase):
+
+    text = "The quick brown fox jumps. Over the lazy dog! Is it not so?\nAnother line here. The fox again runs.\n\nThe end of the story.\n"
+
+    def setUp(self):
+        fd, self.source = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w') as f:
+            f.write(CollectorTest.text * 20)
+
+    def tearDown(self):
+        os.remove(self.source)
+
+    def test_word_collector_streaming(self):
+        print(f"\n****** test WordCollector streaming counts match in-memory counts ==========================")
+        for mode in ['words', 'sentences', 'lines']:
+            counts = []
+            for streaming in [False, True]:
+                collector = WordCollector(state_size=2, source=self.source)
+                collector.processing_mode = mode
+                collector.streaming = streaming
+                collector.collect()
+                counts.append(collector.counts_df)
+            self.assertTrue(counts[0].equals(counts[1]), f"mode: {mode}")
+
+    def test_character_collector_streaming(self):
+        print(f"\n****** test CharacterCollector streaming counts match in-memory counts ==========================")
+        counts = []
+        for streaming in [False, True]:
+            collector = CharacterCollector(state_size=2, source=self.source)
+            collector.streaming = streaming
+            collector.collect()
+            counts.append(collector.counts_df)
+        self.assertTrue(counts[0].equals(counts[1]))
+
+    def test_note_collector_streaming(self):
+        print(f"\n****** test NoteCollector streaming a corpus search matches collecting all the scores ==========================")
+        collectors = []
+        for streaming in [False, True]:
+            collector = NoteCollector(state_size=2, source='composer=schumann', parts='MusicXML Part', collection_mode='dp', enforce_range=False)
+            collector.save_folder = tempfile.mkdtemp()
+            collector.name = 'schumann'
+            collector.streaming = streaming
+            collector.save_notes = not streaming
+            collector.collect()
+            collectors.append(collector)
+        self.assertEqual(collectors[0].number_of_scores, collectors[1].number_of_scores)
+        self.assertIsNone(collectors[1].notes_df)
+        self.assertFalse(os.path.exists(collectors[1].get_notes_df_filename()))
+        for attr in ['counts_df', 'chain_df']:
+            expected = getattr(collectors[0], attr)
+            actual = getattr(collectors[1], attr).reindex(index=expected.index, columns=expected.columns)
+            self.assertTrue(expected.equals(actual), attr)
+            expected = getattr(collectors[0].durationCollector, attr)
+            actual = getattr(collectors[1].durationCollector, attr).reindex(index=expected.index, columns=expected.columns)
+            self.assertTrue(expected.equals(actual), f"durations {attr}")
+
+    def test_music_collector_workers(self):
+        print(f"\n****** test NoteCollector and IntervalCollector reading and counting scores in worker processes match serial collection ==========================")
+        collectors = []
+        for workers in [None, 2]:
+            collector = NoteCollector(state_size=2, source='composer=schumann', parts='MusicXML Part', collection_mode='dp', enforce_range=False)
+            collector.save_folder = tempfile.mkdtemp()
+            collector.name = 'schumann'
+            collector.workers = workers
+            collector.collect()
+            collectors.append(collector)
+        self.assertEqual((collectors[0].number_of_scores, collectors[0].score_partNames), (collectors[1].number_of_scores, collectors[1].score_partNames))
+        self.assertIsNone(collectors[1].notes_df)
+        notes = [pd.read_csv(collector.get_notes_df_filename(), index_col=0) for collector in collectors]
+        self.assertEqual(notes[0]['nameWithOctave'].tolist(), notes[1]['nameWithOctave'].tolist())
+        for attr in ['counts_df', 'chain_df']:
+            expected = getattr(collectors[0], attr)
+            actual = getattr(collectors[1], attr).reindex(index=expected.index, columns=expected.columns)
+            self.assertTrue(expected.equals(actual), attr)
+            expected = getattr(collectors[0].durationCollector, attr)
+            actual = getattr(collectors[1].durationCollector, attr).reindex(index=expected.index, columns=expected.columns)
+            self.assertTrue(expected.equals(actual), f"durations {attr}")
+        
+        counts = []
+        for workers in [None, 2]:
+            collector = IntervalCollector(state_size=2, parts='Violino I.,Violino II.')
+            collector.workers = workers
+            self.assertTrue(collector.set_source('composer=corelli'))
+            collector.collect()
+            counts.append(collector.counts_df)
+        self.assertGreater(len(counts[0]), 0)
+        self.assertTrue(counts[0].equals(counts[1].reindex(index=counts[0].index, columns=counts[0].columns)))
+
+    def test_midi_source(self):
+        print(f"\n****** test NoteCollector and IntervalCollector MIDI file source ==========================")
+        ascore = corpus.parse('bach/bwv66.6')
+        folder = tempfile.mkdtemp()
+        MidiWriter.from_score(ascore).write(fp=os.path.join(folder, 'bwv66.6.mid'))
+        collector = NoteCollector(state_size=2, source=folder, collection_mode='dp', enforce_range=False)
+        collector.save_folder = folder
+        collector.name = 'bwv66.6'
+        collector.collect()
+        expected, partnames, _ = MusicUtils.get_transposed_notes_for_score(ascore.stripTies())     # tied notes are one MIDI note
+        self.assertEqual(collector.number_of_scores, 1)
+        self.assertEqual(collector.score_partNames, partnames)
+        self.assertEqual(collector.notes_df['nameWithOctave'].tolist(), expected['nameWithOctave'].tolist())
+        self.assertEqual(collector.notes_df['quarterLength'].tolist(), expected['quarterLength'].tolist())
+        self.assertGreater(len(collector.chain_df), 0)
+        self.assertFalse(MidiReader.is_midi_source(tempfile.mkdtemp()))     # a folder without MIDI files
+        
+        streaming_collector = NoteCollector(state_size=2, source=folder, collection_mode='dp', enforce_range=False)
+        streaming_collector.streaming = True
+        streaming_collector.save_notes = False
+        streaming_collector.collect()
+        self.assertIsNone(streaming_collector.notes_df)
+        self.assertEqual(streaming_collector.number_of_scores, 1)
+        expected = collector.counts_df
+        self.assertTrue(expected.equals(streaming_collector.counts_df.reindex(index=expected.index, columns=expected.columns)))
+        
+        collector = IntervalCollector(state_size=2)
+        self.assertTrue(collector.set_source(os.path.join(folder, 'bwv66.6.mid')))
+        expected = MusicUtils.get_intervals_from_notes(MusicUtils.get_notes_for_score(ascore.stripTies())[0])
+        self.assertEqual(collector.intervals_df['semitones'].tolist(), expected['semitones'].tolist())
+
+    def test_chain_counts_merge(self):
+        print(f"\n****** test merged ChainCounts shards match the whole sequence ==========================")
+        tokens = "a b a c b a a c b c a b".split()
+        whole = ChainCounts(2)
+        whole.add_sequence(tokens)
+        for bounds in [(0, 5, 12), (0, 1, 2, 3, 12), (0, 11, 12)]:
+            shards = []
+            for start, stop in zip(bounds[:-1], bounds[1:]):
+                shard = ChainCounts(2)
+                shard.add_sequence(tokens[start:stop])
+                shards.append(shard)
+            merged = ChainCounts(2)
+            for shard in shards:
+                merged.merge(shard)
+            self.assertEqual(merged.counts, whole.counts, f"bounds: {bounds}")
+            self.assertEqual((shards[0] + shards[1]).counts, ChainCounts(2).merge(shards[0]).merge(shards[1]).counts)
+
+    def test_chain_counts_wide(self):
+        print(f"\n****** test wide ChainCounts match counts added to a DataFrame one at a time ==========================")
+        events = [('0.5,1.0', 1.0), ('1.0,1.0', 0.5), ('0.5,1.0', 2.0), ('1.0,0.5', 1.0), ('0.5,1.0', 1.0)]
+        counts_df = None
+        chainCounts = ChainCounts(2, ',')
+        for key, duration in events:
+            chainCounts.add(key, duration)
+            if counts_df is None:
+                counts_df = pd.DataFrame(data=[1], index=[key], columns=[duration])
+            elif key in counts_df.index and duration in counts_df.columns:
+                counts_df.loc[key, duration] += 1
+            else:
+                counts_df.loc[key, duration] = 1
+            counts_df = counts_df.fillna(0)
+        counts_df.rename_axis('KEY', inplace=True)
+        self.assertTrue(chainCounts.to_dataframe('wide').equals(counts_df))
+        self.assertEqual(chainCounts.to_dataframe('wide').columns.dtype, counts_df.columns.dtype)
+
+    def test_word_collector_sharded(self):
+        print(f"\n****** test WordCollector sharded counts match serial counts ==========================")
+        counts = []
+        for workers in [None, 3]:
+            collector = WordCollector(state_size=2, source=self.source)
+            collector.workers = workers
+            collector.collect()
+            counts.append(collector.markovChain.chain_df)
+        self.assertTrue(counts[0].equals(counts[1]))
+
+    def test_save_chain_and_counts_together(self):
+        print(f"\n****** test an interrupted save leaves both the chain and counts files unchanged ==========================")
+        collector = WordCollector(state_size=2, source=self.source)
+        collector.save_folder = tempfile.mkdtemp()
+        collector.name = 'words'
+        collector.format = 'csv'
+        collector.collect()
+        self.assertTrue(collector.save())
+        files = {f:open(os.path.join(collector.save_folder, f)).read() for f in os.listdir(collector.save_folder)}
+        self.assertEqual(len(files), 2)
+        save_df = CollectorProducer.save_df
+        def fail_counts(df, filename, file_format):     # the chain file is written, the counts file is not
+            return save_df(df, filename, file_format) if df is not collector.counts_df else False
+        collector.chain_df = collector.chain_df.head(1)
+        with mock.patch.object(CollectorProducer, 'save_df', side_effect=fail_counts):
+            self.assertFalse(collector.save())
+        self.assertEqual({f:open(os.path.join(collector.save_folder, f)).read() for f in os.listdir(collector.save_folder)}, files)
+
+    def test_collector_update(self):
+        print(f"\n****** test CharacterCollector update adds new material to saved counts ==========================")
+        save_folder = tempfile.mkdtemp()
+        fd, update_source = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w') as f:
+            f.write("A quick zebra. Another fox.\n")
+        fd, combined_source = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w') as f:
+            f.write(CollectorTest.text * 20 + "A quick zebra. Another fox.\n")
+        collectors = []
+        for source in [self.source, None, combined_source]:
+            collector = CharacterCollector(state_size=2, source=source)
+            collector.name = 'test'
+            collector.format = 'csv'
+            collector.save_folder = save_folder
+            collectors.append(collector)
+        collectors[0].run()
+        saved_counts_df, saved_chain_df = collectors[1].load_counts()
+        self.assertEqual(collectors[1].update(update_source), {'collect_result':True, 'save_result':True})
+        collectors[2].collect()
+        
+        counts_df, chain_df = collectors[1].load_counts()
+        expected_df = collectors[2].counts_df.sort_values(by=['key','word'], ignore_index=True)
+        self.assertTrue(counts_df.sort_values(by=['key','word'], ignore_index=True).equals(expected_df))
+        self.assertEqual(set(chain_df['key']), set(collectors[2].chain_df['key']))
+        for akey in ['in', 'az', 'ry']:     # keys not in the new material retain their saved probabilities
+            saved_df = saved_chain_df[saved_chain_df['key']==akey].reset_index(drop=True)
+            self.assertTrue(len(saved_df) > 0)
+            self.assertTrue(chain_df[chain_df['key']==akey].reset_index(drop=True).equals(saved_df))
+        for filename in [update_source, combined_source] + [os.path.join(save_folder, f) for f in os.listdir(save_folder)]:
+            os.remove(filename)
+
+    def test_backoff_chain(self):
+        print(f"\n****** test BackoffChain counts match the collector counts of each order ==========================")
+        for collector_class in [CharacterCollector, WordCollector]:
+            collector = collector_class(state_size=3, source=self.source)
+            collector.backoff = True
+            collector.collect()
+            backoffChain = collector.backoffChain
+            print(f"{backoffChain} {backoffChain.nbytes} bytes")
+            filename = os.path.join(tempfile.mkdtemp(), 'test_backoff.npz')
+            backoffChain.save(filename)
+            loaded = BackoffChain.load(filename)
+            os.remove(filename)
+            for order in [1, 2, 3]:
+                expected = collector_class(state_size=order, source=self.source)
+                expected.collect()
+                counts_df = loaded.get_counts(order).to_dataframe().sort_values(by=['key','word'], ignore_index=True)
+                self.assertTrue(counts_df.equals(expected.counts_df), f"{collector_class.__name__} order: {order}")
+        sampler = loaded.get_sampler()
+        self.assertEqual(sampler.keys[sampler.get_state('no such words here')], 'here')    # backs off to the longest known suffix
+        self.assertEqual(sampler.sample('xyzzy', 0.5)['order'], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+'''
+Created on Oct 18, 2026
+
+@author: don_bacon
+'''
+
+import unittest
+from unittest import mock
+import random
+import time
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from common.markovChain import MarkovChain
+from common.chainSampler import ChainSampler
+from common.internedChain import InternedChain
+from common.aliasSampler import AliasSampler
+
+class MarkovChainTest(unittest.TestCase):
+
+    @staticmethod
+    def make_counts(nkeys:int, branching:int=5, rand_seed=42) -> pd.DataFrame:
+        """Create a synthetic counts DataFrame with nkeys keys and up to branching next words per key
+
+        """
+        rng = random.Random(rand_seed)
+        rows = []
+        for k in range(nkeys):
+            for w in range(rng.randint(1, branching)):
+                rows.append((f'k{k}', f'w{w}', rng.randint(1, 20)))
+        return pd.DataFrame(data=rows, columns=['key','word','count'])
+
+    def test_create_chain(self):
+        print(f"\n****** test MarkovChain probabilities match the per-key computation ==========================")
+        counts_df = MarkovChainTest.make_counts(200)
+        markovChain = MarkovChain(2, counts_df)
+        self.assertEqual(len(markovChain.chain_df), len(counts_df))
+        for akey in ['k0', 'k17', 'k199']:
+            key_df = counts_df[counts_df['key']==akey]
+            expected = (key_df['count']/key_df['count'].sum()).cumsum().tolist()
+            actual = markovChain.get_rows(akey)['prob'].tolist()
+            self.assertEqual(expected, actual)
+            self.assertAlmostEqual(actual[-1], 1.0)
+
+    def test_create_chain_keys(self):
+        print(f"\n****** test MarkovChain created from a subset of keys ==========================")
+        counts_df = MarkovChainTest.make_counts(50)
+        markovChain = MarkovChain(2, counts_df, keys={'k1', 'k2'})
+        self.assertEqual(set(markovChain.chain_df['key']), {'k1', 'k2'})
+
+    def test_chain_sampler(self):
+        print(f"\n****** test ChainSampler picks the same token as a chain_df scan ==========================")
+        counts_df = MarkovChainTest.make_counts(100)
+        markovChain = MarkovChain(2, counts_df)
+        sampler = ChainSampler.from_markov_chain(markovChain)
+        chain_df = markovChain.chain_df
+        rng = random.Random(1)
+        for n in range(200):
+            akey = f'k{rng.randint(0, 99)}'
+            prob = rng.random()
+            df = chain_df[chain_df['key']==akey]
+            expected = df[df['prob']>prob].iloc[0]['word']
+            self.assertEqual(sampler.sample(akey, prob)['next_token'], expected)
+        self.assertFalse('nokey' in sampler)
+        self.assertIsNone(sampler.sample('nokey', 0.5)['next_token'])
+
+    def test_interned_chain(self):
+        print(f"\n****** test InternedChain round trip, long and wide layouts ==========================")
+        counts_df = MarkovChainTest.make_counts(100)
+        counts_df['key'] = [f' {k} x' for k in counts_df['key']]   # initial word prefix and 2-word keys
+        interned = InternedChain.from_dataframe(counts_df, 2, key_separator=' ')
+        print(interned)
+        self.assertTrue(interned.to_dataframe().equals(counts_df))
+        tokens, counts = interned.get_transitions(' k3 x')
+        key_df = counts_df[counts_df['key']==' k3 x']
+        self.assertEqual(list(tokens), key_df['word'].tolist())
+        self.assertEqual(list(counts), key_df['count'].tolist())
+        
+        wide_df = pd.DataFrame(data=[[1.0, 0.0, 2.0], [0.0, 3.0, 0.0]], index=['A4,G4', 'G4,C5'], columns=['C5', 'A4', 'G4'])
+        wide_df.rename_axis('KEY', inplace=True)
+        interned = InternedChain.from_dataframe(wide_df, 2, key_separator=',')
+        self.assertEqual(interned.layout, 'wide')
+        self.assertTrue(interned.to_dataframe().equals(wide_df))
+        markovChain = MarkovChain.from_interned(interned)
+        self.assertAlmostEqual(markovChain.chain_df.loc['A4,G4', 'G4'], 2.0/3.0)
+
+    def test_interned_chain_row_order(self):
+        print(f"\n****** test InternedChain keeps the row order and duplicate rows of unsorted counts ==========================")
+        counts_df = MarkovChainTest.make_counts(50)
+        counts_df = pd.concat([counts_df, counts_df.iloc[[3, 10, 3]]], ignore_index=True)   # duplicate (key, word) rows
+        counts_df = counts_df.sample(frac=1.0, random_state=7).reset_index(drop=True)
+        interned = InternedChain.from_dataframe(counts_df, 2, key_separator=' ')
+        self.assertTrue(interned.to_dataframe().equals(counts_df))
+        markovChain = MarkovChain(2, counts_df)
+        interned.compute_probabilities()
+        self.assertTrue(MarkovChain.from_interned(interned).chain_df.equals(markovChain.chain_df))
+        filename = os.path.join(tempfile.mkdtemp(), 'test_wordsChain_02.npz')
+        interned.save(filename)
+        loaded = InternedChain.load(filename)
+        self.assertTrue(loaded.to_dataframe().equals(counts_df))
+        sampler = ChainSampler(markovChain.chain_df)
+        loaded_sampler = ChainSampler.from_interned(loaded)
+        self.assertEqual(list(loaded_sampler.tokens), list(sampler.tokens))
+        self.assertEqual(list(loaded_sampler.probs), list(sampler.probs))
+        os.remove(filename)
+
+    def test_interned_chain_file(self):
+        print(f"\n****** test InternedChain save and memory mapped load ==========================")
+        counts_df = MarkovChainTest.make_counts(100)
+        markovChain = MarkovChain(2, counts_df)
+        interned = markovChain.intern(' ')
+        filename = os.path.join(tempfile.mkdtemp(), 'test_wordsChain_02.npz')
+        interned.save(filename)
+        loaded = InternedChain.load(filename)
+        self.assertIsInstance(loaded.states, np.memmap)
+        self.assertTrue(loaded.to_dataframe().equals(interned.to_dataframe()))
+        sampler = ChainSampler.from_markov_chain(MarkovChain.from_interned(loaded))
+        expected = markovChain.get_rows('k5')
+        self.assertEqual(list(sampler.get_tokens('k5')), sorted(expected['word']))
+        #
+        # duration tokens are floats and must load as floats
+        #
+        wide_df = pd.DataFrame(data=[[1.0, 0.0, 2.0], [0.0, 3.0, 0.0]], index=[0.5, 1.0], columns=[0.25, 1.5, 2.0])
+        wide_df.rename_axis('KEY', inplace=True)
+        InternedChain.from_dataframe(wide_df, 1, key_separator=',').save(filename)
+        self.assertTrue(InternedChain.load(filename).to_dataframe().equals(wide_df))
+        os.remove(filename)
+
+    def test_alias_sampler(self):
+        print(f"\n****** test AliasSampler picks tokens with the chain probabilities ==========================")
+        counts_df = MarkovChainTest.make_counts(20, branching=8)
+        markovChain = MarkovChain(2, counts_df)
+        sampler = AliasSampler.from_markov_chain(markovChain)
+        rng = np.random.default_rng(42)
+        for akey in ['k0', 'k7', 'k19']:
+            key_df = counts_df[counts_df['key']==akey]
+            expected = dict(zip(key_df['word'], key_df['count']/key_df['count'].sum()))
+            state = sampler.get_state(akey)
+            probs = rng.random(100000)
+            rows = sampler.sample_rows(np.full(len(probs), state), probs)
+            self.assertEqual([sampler.sample(akey, p)['next_token'] for p in probs[:100]], list(sampler.tokens[rows[:100]]))
+            tokens, counts = np.unique(sampler.tokens[rows], return_counts=True)
+            for token, count in zip(tokens, counts):
+                self.assertAlmostEqual(count/len(probs), expected[token], delta=0.01)
+        
+        wide_df = pd.DataFrame(data=[[0.25, 0.0, 0.75], [0.0, 1.0, 0.0]], index=['A4,G4', 'G4,C5'], columns=['C5', 'A4', 'G4'])
+        sampler = AliasSampler.from_sampler(ChainSampler.from_wide(wide_df))
+        self.assertEqual(list(sampler.get_tokens('A4,G4')), ['C5', 'G4'])
+        self.assertEqual(sampler.sample('G4,C5', 0.9)['next_token'], 'A4')
+
+    def test_alias_sampler_benchmark(self):
+        print(f"\n****** benchmark AliasSampler vs. cumulative ChainSampler by branching factor ==========================")
+        ndraws = 200000
+        rng = np.random.default_rng(42)
+        for branching in [2, 10, 100, 1000, 10000]:
+            weights = rng.integers(1, 100, size=branching)
+            counts_df = pd.DataFrame(data={'key':['k']*branching, 'word':[f'w{i}' for i in range(branching)], 'count':weights})
+            markovChain = MarkovChain(1, counts_df)
+            times = {}
+            for name, sampler in [('cumulative', ChainSampler.from_markov_chain(markovChain)), ('alias', AliasSampler.from_markov_chain(markovChain))]:
+                states = np.zeros(ndraws, dtype=np.int64)
+                probs = rng.random(ndraws)
+                start = time.perf_counter()
+                sampler.sample_rows(states, probs)
+                vectorized = time.perf_counter() - start
+                start = time.perf_counter()
+                for p in probs[:20000]:
+                    sampler.sample('k', p)
+                times[name] = (vectorized, time.perf_counter() - start)
+            print(f"branching: {branching:>5}  sample_rows {ndraws} draws: cumulative {times['cumulative'][0]:.4f} alias {times['alias'][0]:.4f} sec" + \
+                  f"  sample() 20000 draws: cumulative {times['cumulative'][1]:.4f} alias {times['alias'][1]:.4f} sec")
+
+    def test_create_chain_scaling(self):
+        print(f"\n****** test MarkovChain build work does not grow with the number of keys ==========================")
+        #
+        # a per-key build indexes counts_df once per key, so the number of DataFrame indexing calls
+        # is the complexity proxy: it is the same for 4x the keys. The build times are only printed
+        #
+        calls = {}
+        getitem = pd.DataFrame.__getitem__
+        for nkeys in [10000, 40000]:
+            counts_df = MarkovChainTest.make_counts(nkeys)
+            with mock.patch.object(pd.DataFrame, '__getitem__', autospec=True, side_effect=getitem) as counted:
+                start = time.perf_counter()
+                markovChain = MarkovChain(2, counts_df)
+                elapsed = time.perf_counter() - start
+            calls[nkeys] = counted.call_count
+            print(f"keys: {nkeys}, rows: {len(counts_df)}, DataFrame indexing calls: {calls[nkeys]}, build time: {elapsed:.4f} sec")
+            chain_df = markovChain.chain_df
+            self.assertEqual(len(chain_df), len(counts_df))
+            last_probs = chain_df.groupby('key', sort=False)['prob'].last()
+            self.assertEqual(len(last_probs), nkeys)
+            self.assertTrue(np.allclose(last_probs.to_numpy(), 1.0))
+        self.assertEqual(calls[10000], calls[40000])
+
+if __name__ == "__main__":
+    unittest.main()
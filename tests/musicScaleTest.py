@@ -5,6 +5,8 @@ Created on Oct 14, 2025
 '''
 import unittest
 from music.musicScale import MusicScale
+from music.musicSubstitutionRules import MusicSubstitutionRules
+from music.instruments import Instruments
 from music21 import key, note
 
 class MusicScaleTest(unittest.TestCase):
@@ -22,6 +24,35 @@ class MusicScaleTest(unittest.TestCase):
         notes = music_scale.get_scale_notes()
         print(music_scale)
 
+    def testGetNote(self):
+        print(f"\n****** test MusicScale get_note and get_index use the shared scale table ==========================")
+        music_scale = MusicScale(scale_name='Major', root_note=note.Note('D4'), key=key.Key('D'))
+        self.assertIs(MusicScale(scale_name='Major', root_note=note.Note('D4')).range_notes, music_scale.range_notes)
+        self.assertEqual(music_scale.get_note(2, note.Note('E4')).nameWithOctave, 'G4')
+        self.assertEqual(music_scale.get_note(-1, note.Note('E5')).nameWithOctave, 'D5')
+        self.assertEqual(music_scale.get_note(3, note.Note('F4')).nameWithOctave, 'F4')     # not in the scale
+        self.assertEqual(music_scale.get_index(note.Note('F4')), -1)
+        self.assertEqual(music_scale.range_notes_names[music_scale.get_index(note.Note('F#4'))], 'F#4')
+        flat_scale = MusicScale(scale_name='Major', root_note=note.Note('E-4'), key=key.Key('E-'))
+        self.assertEqual(flat_scale.get_note(1, note.Note('D#4')).nameWithOctave, 'D#4')    # enharmonic, not in the scale
+        self.assertEqual(flat_scale.get_note(1, note.Note('E-4')).nameWithOctave, 'F4')
+
+    def testIntervalRule(self):
+        print(f"\n****** test interval_rule moves in the scale table and into the instrument range as get_note and adjust_to_range do ==========================")
+        music_scale = MusicScale(scale_name='Major', root_note=note.Note('E-4'), key=key.Key('E-'))
+        instruments = Instruments()
+        for name in ['E-4', 'B-5', 'C3', 'D#4', 'F#4']:
+            for scale_degrees in [-9, -1, 0, 2, 10]:
+                anote = note.Note(name, quarterLength=1.5)
+                state = {'note':anote, 'musicScale':music_scale, 'instruments':instruments, 'instrument_name':'Soprano'}
+                expected = note.Note(music_scale.get_note(scale_degrees, anote).nameWithOctave)
+                instruments.adjust_to_range('Soprano', expected, inPlace=True)
+                next_note = MusicSubstitutionRules.interval_rule(str(scale_degrees), state)
+                self.assertEqual((next_note.pitch.ps, next_note.quarterLength), (expected.pitch.ps, 1.5), f"{name} {scale_degrees}")
+                if music_scale.get_index(anote) >= 0:      # keeps the scale spelling, transposing A-2 an octave gives G#3
+                    self.assertGreaterEqual(music_scale.get_index(next_note), 0)
+                self.assertIs(state['note'], next_note)
+
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,146 @@
+'''
+Created on Oct 18, 2026
+
+@author: don_bacon
+'''
+import unittest
+import tempfile
+from music.musicUtils import MusicUtils
+from music.scoreCache import ScoreCache
+from music.instruments import Instruments
+from music.corpusIndex import CorpusIndex
+import os
+import numpy as np
+from music21 import note, interval, corpus, stream, key
+
+class MusicUtilsTest(unittest.TestCase):
+
+    def test_corpus_tables_workers(self):
+        print(f"\n****** test corpus notes and intervals parsed in worker processes match serial parsing ==========================")
+        for classinfo in [note.Note, interval.Interval]:
+            serial_df, pnames, pnums, titles = MusicUtils.get_corpus_tables(classinfo, 'corelli', transposition='accidentals')
+            df, wpnames, wpnums, wtitles = MusicUtils.get_corpus_tables(classinfo, 'corelli', transposition='accidentals', workers=2)
+            self.assertGreater(len(serial_df), 0)
+            self.assertEqual((pnames, pnums, titles), (wpnames, wpnums, wtitles))
+            columns = [c for c in serial_df.columns if serial_df[c].dtype != object] + ['part_name']
+            self.assertTrue(serial_df[columns].equals(df[columns]))
+
+    def test_corpus_tables_numbered_work(self):
+        print(f"\n****** test corpus tables of a numbered work in a multi-work ABC file ==========================")
+        title = '^The Lads of the Village'      # airdsAirs/book1.abc work number 3
+        self.assertEqual(MusicUtils.get_corpus_paths(title=title), [('airdsAirs/book1.abc', '3', 'The Lads of the Village.')])
+        for workers in [None, 2]:
+            notes_df, _, _, titles = MusicUtils.get_corpus_tables(note.Note, title=title, workers=workers)
+            self.assertEqual((len(notes_df), titles), (64, ['The Lads of the Village.']))
+
+    def test_notes_table_pitches(self):
+        print(f"\n****** test notes table of microtones and notes not in a Measure ==========================")
+        apart = stream.Part()
+        for n, (name, key_name) in enumerate([('C4', 'F'), ('D`4', 'G'), ('E~4', 'F')]):      # quarter tones
+            ameasure = stream.Measure(number=n+1)
+            ameasure.insert(0, key.Key(key_name))
+            ameasure.append(note.Note(name, quarterLength=4))
+            apart.append(ameasure)
+        apart.insert(0, note.Note('F4'))        # not in a Measure, its measureNumber is None
+        notes_df, _, _ = MusicUtils.get_notes_for_score(stream.Score([apart]))
+        self.assertEqual(notes_df['ps'].tolist(), [60.0, 65.0, 61.5, 64.5])
+        self.assertEqual(notes_df['measure'].tolist(), [1, -1, 2, 3])
+        self.assertEqual(notes_df['scaleDegree'].tolist(), ['5', '1', '`5', '~7'])
+
+    def test_notes_table(self):
+        print(f"\n****** test compact notes and intervals tables match the music21 objects ==========================")
+        ascore = corpus.parse('corelli/opus3no1/1grave.xml')
+        notes_df, pnames, pnums = MusicUtils.get_notes_for_score(ascore)
+        self.assertEqual(notes_df['ps'].dtype, 'float32')
+        self.assertEqual(notes_df['nameWithOctave'].dtype, 'category')
+        apart = ascore.parts[0]
+        notes = list(apart.flatten().getElementsByClass(note.Note))
+        part_df = notes_df[notes_df['part_number']==1]
+        self.assertEqual([n.nameWithOctave for n in notes], list(part_df['nameWithOctave']))
+        self.assertEqual([n.nameWithOctave for n in MusicUtils.get_notes(part_df)], list(part_df['nameWithOctave']))
+        intervals_df = MusicUtils.get_intervals_from_notes(notes_df)
+        self.assertEqual(len(intervals_df), len(notes_df) - len(pnums))
+        part_intervals = [interval.Interval(n1, n2) for n1, n2 in zip(notes[:-1], notes[1:])]
+        part_df = intervals_df[intervals_df['part_number']==1]
+        self.assertEqual([i.semitones for i in part_intervals], list(part_df['semitones']))
+        self.assertEqual([i.directedName for i in part_intervals], list(part_df['directedName']))
+
+    def test_transpose_notes(self):
+        print(f"\n****** test notes transposed numerically match the notes of the transposed score ==========================")
+        instruments = Instruments()
+        for path in ['bach/bwv26.6', 'bach/bwv10.7', 'corelli/opus3no1/1grave.xml']:
+            ascore = corpus.parse(path)
+            range_instruments = instruments if path.startswith('bach') else None
+            notes_df, pnames, pnums = MusicUtils.get_notes_for_score(MusicUtils.transpose_score(ascore, instruments=range_instruments))
+            transposed_df, tpnames, tpnums = MusicUtils.get_transposed_notes_for_score(ascore, instruments=range_instruments)
+            self.assertEqual((pnames, pnums), (tpnames, tpnums))
+            self.assertTrue(notes_df.equals(transposed_df))
+
+    def test_transpose_notes_quarter_tones(self):
+        print(f"\n****** test quarter tones transposed numerically into an instrument range match the transposed score ==========================")
+        instruments = Instruments()
+        apart = stream.Part()
+        apart.partName = 'Soprano'
+        ameasure = stream.Measure(number=1)
+        ameasure.insert(0, key.Key('C'))
+        for name in ['C`4', 'C`3', 'C~6', 'D~7', 'E4']:        # Soprano range is 60 to 84
+            ameasure.append(note.Note(name, quarterLength=1))
+        apart.append(ameasure)
+        ascore = stream.Score([apart])
+        notes_df, _, _ = MusicUtils.get_notes_for_score(MusicUtils.transpose_score(ascore, instruments=instruments))
+        transposed_df, _, _ = MusicUtils.get_transposed_notes_for_score(ascore, instruments=instruments)
+        self.assertEqual(transposed_df['ps'].tolist(), [59.5, 59.5, 84.5, 74.5, 64.0])
+        self.assertTrue(notes_df.equals(transposed_df))
+
+    def test_corpus_index(self):
+        print(f"\n****** test CorpusIndex finds the same scores as a corpus search ==========================")
+        filename = os.path.join(tempfile.mkdtemp(), 'corpus_index.db')
+        index = CorpusIndex(filename)
+        for composer, title in [('schumann', None), ('bee.*n', None), ('palestrina', '^Agnus'), (None, '^The Lads of the Village')]:
+            self.assertEqual(MusicUtils.get_corpus_paths(composer, title), MusicUtils.get_corpus_paths(composer, title, index=index))
+        index = CorpusIndex(filename)     # loaded from the database
+        for mode in ['major', 'minor']:
+            filters = {'mode':mode}
+            self.assertEqual(MusicUtils.get_scores_from_corpus('corelli', keypart='Violino I.', filters=filters)[1], \
+                             MusicUtils.get_scores_from_corpus('corelli', keypart='Violino I.', filters=filters, index=index)[1])
+        self.assertEqual(list(index.get_parts('corelli/opus3no1/1grave.xml')['part_name']), ['Violino I.', 'Violino II.', 'Violone e Organo'])
+        self.assertEqual(CorpusIndex(filename).scores_df['parsed'].sum(), 1)
+        scores, titles = MusicUtils.get_scores_from_corpus(title='^The Lads of the Village', index=index)     # work 3 of an ABC file
+        self.assertEqual((len(scores), len(scores[0].flatten().notes)), (1, 64))
+        os.remove(filename)
+
+    def test_score_cache(self):
+        print(f"\n****** test ScoreCache returns the notes of a parsed score and evicts the least recently used ==========================")
+        cache = ScoreCache(tempfile.mkdtemp())
+        notes_df, pnames, _, _ = MusicUtils.get_corpus_tables(note.Note, 'corelli', transposition='accidentals')
+        for n in range(2):      # a cache miss then a hit
+            cached_df, cached_pnames, _, _ = MusicUtils.get_corpus_tables(note.Note, 'corelli', transposition='accidentals', cache=cache)
+            self.assertEqual(len(cache.get_entries()), 1)
+            columns = [c for c in notes_df.columns if notes_df[c].dtype != object] + ['part_name', 'nameWithOctave']
+            self.assertTrue(notes_df[columns].equals(cached_df[columns]))
+            self.assertEqual(pnames, cached_pnames)
+        MusicUtils.get_corpus_tables(interval.Interval, 'corelli', cache=cache)
+        self.assertEqual(len(cache.get_entries()), 2)
+        cache.max_size = cache.get_entries()[-1][1]
+        cache.evict()
+        self.assertEqual(len(cache.get_entries()), 1)
+        cache.clear()
+        path = str(corpus.getWork('airdsAirs/book1.abc'))     # the works of a multi-work file are separate entries
+        self.assertNotEqual(cache.get_key(path, {}, '3'), cache.get_key(path, {}, '4'))
+        self.assertNotEqual(cache.get_key(path, {}, '3'), cache.get_key(path, {}))
+
+    def test_instruments_ranges(self):
+        print(f"\n****** test Instruments registry is shared and the vectorized ranges match adjust_to_range ==========================")
+        instruments = Instruments()
+        self.assertIs(Instruments(verbose=1).instruments_pd, instruments.instruments_pd)
+        names = ['Soprano', 'Bass', 'Flute', 'Bassoon'] * 10
+        pitches = np.arange(20, 120, 2.5).astype(np.int64)
+        adjusted = instruments.adjust_pitches_to_range(instruments.get_indexes(names), pitches)
+        expected = [instruments.adjust_to_range(name, note.Note(ps=int(ps))).pitch.ps for name, ps in zip(names, pitches)]
+        self.assertEqual(adjusted.tolist(), expected)
+        self.assertTrue(instruments.pitches_in_range(instruments.get_indexes(names), adjusted).all())
+        self.assertEqual(instruments.pitches_in_range('Soprano', pitches).tolist(), \
+                         [instruments.is_in_range('Soprano', note.Note(ps=int(ps))) for ps in pitches])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,265 @@
+'''
+Created on Oct 18, 2026
+
+@author: don_bacon
+'''
+
+import unittest
+import os
+import random
+import tempfile
+import numpy as np
+import pandas as pd
+from common.characterCollector import CharacterCollector
+from common.wordProducer import WordProducer
+from common.wordCollector import WordCollector
+from common.sentenceProducer import SentenceProducer
+from common.markovChain import MarkovChain
+from common.aliasSampler import AliasSampler
+from common.chainSampler import ChainSampler
+from common.internedChain import InternedChain
+from music.musicProducer import MusicProducer
+from music.scoreWriter import ScoreWriter
+from music.midiWriter import MidiWriter
+from music21 import midi, stream, note
+
+class ProducerTest(unittest.TestCase):
+
+    text = "abilify abraxane abrilada abrysvo absorica acanya accolate accupril accuretic aciphex actemra acthar actimmune"
+
+    def test_produce_batch(self):
+        print(f"\n****** test WordProducer produce_batch ==========================")
+        collector = CharacterCollector(state_size=2, text=ProducerTest.text)
+        markovChain = collector.collect()
+        producer = WordProducer(2, markovChain, None, min_size=4, max_size=10, num=10)
+        producer.initial = True
+        words = producer.produce_batch(1000, rand_seed=42)
+        print(f"{words[:10]} {producer.batch_stats}")
+        self.assertEqual(len(words), 1000)
+        self.assertTrue(all([len(w) >= 4 and len(w) <= 10 for w in words]))
+        self.assertTrue(all([w[0] == 'A' for w in words]))      # every word starts with an initial key
+        self.assertEqual(words, producer.produce_batch(1000, rand_seed=42))
+
+    def test_backoff_producer(self):
+        print(f"\n****** test WordProducer with a BackoffChain ==========================")
+        collector = CharacterCollector(state_size=3, text=ProducerTest.text)
+        collector.backoff = True
+        collector.collect()
+        producer = WordProducer(3, collector.backoffChain, None, min_size=4, max_size=10, num=10)
+        producer.initial = True
+        self.assertTrue('zzz' in producer.sampler)
+        self.assertEqual(producer.sampler.sample('zab', 0.5)['order'], 2)
+        words = producer.produce_batch(1000, rand_seed=42)
+        print(f"{words[:10]} {producer.batch_stats}")
+        self.assertEqual(len(words), 1000)
+        self.assertTrue(all([len(w) >= 4 and len(w) <= 10 for w in words]))
+
+    @staticmethod
+    def make_wide_chain(keys:list, tokens:list, rand_seed=42) -> MarkovChain:
+        rng = np.random.default_rng(rand_seed)
+        counts = rng.integers(0, 4, size=(len(keys), len(tokens))).astype(np.float64)
+        counts[:, 0] += 1.0     # every key has a next token
+        chain_df = pd.DataFrame(data=np.round(counts/counts.sum(axis=1, keepdims=True), 6), index=keys, columns=tokens)
+        return MarkovChain(2, None, chain_df=chain_df)
+
+    @staticmethod
+    def make_music_chains(semitones=(-2, -1, 0, 1, 2), quarterLengths=(0.5, 1.0, 2.0)) -> (MarkovChain, MarkovChain):
+        """Returns the intervals and durations MarkovChains of every key of semitones and of quarterLengths"""
+        intervalsChain = ProducerTest.make_wide_chain([f'{a},{b}' for a in semitones for b in semitones], [str(x) for x in semitones])
+        durationsChain = ProducerTest.make_wide_chain([f'{a},{b}' for a in quarterLengths for b in quarterLengths], list(quarterLengths))
+        return intervalsChain, durationsChain
+
+    @staticmethod
+    def make_music_producer(chains:tuple, instrument_names:[str], part_notes:str=None, **kwargs) -> MusicProducer:
+        """Creates a 'dp' intervals MusicProducer of the (intervals, durations) chains.
+        If part_notes is not None, the seed is the intervals 0,1 and part_notes are the start notes of the parts."""
+        producer = MusicProducer(2, chains[0], chains[1], None, None, instrument_names, 'dp', producerType='intervals', **kwargs)
+        if part_notes is not None:
+            producer.set_seed([0, 1], 'intervals')
+            producer.add_part_notes(part_notes)
+        return producer
+
+    @staticmethod
+    def get_score_notes(score:stream.Score) -> list:
+        """Returns the (midi pitch, quarterLength) of the notes of each part of a Score"""
+        return [[(n.pitch.midi, n.quarterLength) for n in part.notes] for part in score.parts]
+
+    def test_music_producer_sampler(self):
+        print(f"\n****** test MusicProducer compiled samplers pick the same tokens as a chain_df row scan ==========================")
+        quarterLengths = [0.5, 1.0, 2.0]
+        intervalsChain, durationsChain = ProducerTest.make_music_chains(quarterLengths=quarterLengths)
+        producer = ProducerTest.make_music_producer((intervalsChain, durationsChain), ['Flute'])
+        for chain, get_next in [(intervalsChain, producer.get_next_object), (durationsChain, producer.get_next_durations_object)]:
+            random.seed(1)
+            seed = chain.chain_df.index[3]
+            tokens = []
+            for n in range(200):
+                next_dict = get_next(seed)
+                tokens.append(next_dict['next_token'])
+                seed = next_dict['new_seed']
+            random.seed(1)
+            key = chain.chain_df.index[3]
+            for token in tokens:
+                row = chain.chain_df.loc[key]
+                row_probs = row[row > 0].cumsum()
+                expected = row_probs[row_probs > random.random()].index[0]
+                self.assertEqual(token, float(expected) if chain is durationsChain else int(expected))
+                key = ','.join(key.split(',')[1:] + [str(expected)])
+        self.assertIsInstance(seed, tuple)
+        self.assertIsNone(producer.get_next_object((7, 7))['next_token'])
+        producer.set_sampling_engine('alias')
+        self.assertIsInstance(producer.sampler, AliasSampler)
+        self.assertIsInstance(producer.durations_sampler, AliasSampler)
+        self.assertTrue(set(producer.get_next_durations_object((0.5, 1.0))['next_token'] for n in range(50)) <= set(quarterLengths))
+        producer.set_sampling_engine('cumulative')
+        self.assertNotIsInstance(producer.durations_sampler, AliasSampler)
+
+    def test_music_producer_parallel(self):
+        print(f"\n****** test MusicProducer parallel part production is the same for any number of workers ==========================")
+        chains = ProducerTest.make_music_chains()
+        scores = []
+        for workers in [1, 2]:
+            producer = ProducerTest.make_music_producer(chains, ['Soprano', 'Alto', 'Tenor'], 'C5,G4,C4', num=20, rand_seed=42)
+            producer.workers = workers
+            scores.append(ProducerTest.get_score_notes(producer.produce()))
+        self.assertEqual(scores[0], scores[1])
+        self.assertEqual([sum(d for _,d in notes) for notes in scores[0]], [80.0] * 3)
+        self.assertNotEqual([d for _,d in scores[0][0]], [d for _,d in scores[0][1]])     # each part has its own random stream
+        batch = [(score_seed, ProducerTest.get_score_notes(score)) for _, score_seed, score in producer.produce_scores(3, rand_seed=42)]      # one pool for the batch
+        self.assertIsNone(producer._executor)
+        for score_seed, notes in batch:
+            producer.rand_seed = score_seed
+            producer.new_score()
+            self.assertEqual(ProducerTest.get_score_notes(producer.produce()), notes)
+
+    def test_music_producer_batch(self):
+        print(f"\n****** test MusicProducer produce_scores and ScoreWriter ==========================")
+        chains = ProducerTest.make_music_chains()
+        make_producer = lambda rand_seed: ProducerTest.make_music_producer(chains, ['Soprano', 'Bass'], 'C5,C3', num=8, rand_seed=rand_seed)
+        folder = tempfile.mkdtemp()
+        producer = make_producer(None)
+        batch = []
+        with ScoreWriter(folder, 'midi', max_pending=2) as writer:
+            for i, score_seed, score in producer.produce_scores(5, rand_seed=42):
+                batch.append((score_seed, ProducerTest.get_score_notes(score)))
+                writer.put(score, f"batch_{i+1:04d}")
+        print(producer.batch_stats)
+        self.assertEqual(writer.files_written, 5)
+        self.assertEqual(sorted(os.listdir(folder)), [f"batch_{i:04d}.mid" for i in range(1, 6)])
+        self.assertEqual(len(set(seed for seed,_ in batch)), 5)
+        self.assertEqual(producer.batch_stats['scores'], 5)
+        self.assertEqual([notes for _,notes in batch], [ProducerTest.get_score_notes(score) for _,_,score in make_producer(None).produce_scores(5, rand_seed=42)])
+        score_seed, notes = batch[3]
+        self.assertEqual(ProducerTest.get_score_notes(make_producer(score_seed).produce()), notes)
+
+    def test_music_producer_events(self):
+        print(f"\n****** test MusicProducer event arrays match the Notes produced ==========================")
+        chains = ProducerTest.make_music_chains(semitones=(-7, -2, -1, 0, 1, 2, 5))
+        results = []
+        for event_mode in [False, True]:
+            producer = ProducerTest.make_music_producer(chains, ['Soprano', 'Bass'], 'C5,C3', num=40, rand_seed=42)
+            producer.enforceRange = True
+            if event_mode:
+                events = producer.produce_events()
+                results.append([list(zip(pitches.tolist(), durations.tolist())) for pitches, durations in events])
+                events_df = producer.get_events_df()
+            else:
+                score = producer.produce()
+                results.append([[(int(n.pitch.ps), float(n.quarterLength)) for n in part.notes] for part in score.parts])
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(list(events_df.columns), ['part', 'offset', 'midi', 'quarterLength'])
+        self.assertEqual(events_df.groupby('part')['quarterLength'].sum().tolist(), [160.0, 160.0])
+        low, high = producer.instruments.instruments_pd.loc['Bass']['range_ps']
+        self.assertTrue(all(low <= p <= high for p,_ in results[1][1]))
+
+    @staticmethod
+    def read_midi_notes(filename:str) -> list:
+        """Returns the (pitch, start tick, end tick) of the notes of each track of a MIDI file"""
+        midiFile = midi.MidiFile()
+        midiFile.open(filename)
+        midiFile.read()
+        midiFile.close()
+        tracks = []
+        for track in midiFile.tracks:
+            tick = 0
+            started = {}
+            track_notes = []
+            for event in track.events:
+                if event.isDeltaTime():
+                    tick += event.time
+                elif event.isNoteOn():
+                    started[event.pitch] = tick
+                elif event.isNoteOff():
+                    track_notes.append((event.pitch, started.pop(event.pitch), tick))
+            tracks.append(sorted(track_notes, key=lambda n: n[1]))
+        return tracks
+
+    def test_midi_writer(self):
+        print(f"\n****** test MidiWriter Standard MIDI File from part events and from a Score ==========================")
+        producer = ProducerTest.make_music_producer(ProducerTest.make_music_chains(), ['Flute', 'Bassoon'], 'C5,C3', num=20, rand_seed=42)
+        events = producer.produce_events()
+        filename = os.path.join(tempfile.mkdtemp(), 'events.mid')
+        producer.get_midi_writer(title='events').write(fp=filename)
+        tracks = ProducerTest.read_midi_notes(filename)
+        self.assertEqual(len(tracks), 3)    # the conductor track and one per part
+        for (pitches, durations), track_notes in zip(events, tracks[1:]):
+            ends = np.cumsum(durations) * 480
+            expected = list(zip(pitches.tolist(), np.rint(ends - durations * 480).astype(int).tolist(), np.rint(ends).astype(int).tolist()))
+            self.assertEqual(track_notes, expected)
+        
+        ascore = stream.Score()
+        apart = stream.Part()
+        apart.partName = 'Bass'
+        apart.append([note.Note('C3', quarterLength=1.5), note.Rest(quarterLength=0.5), note.Note('G2', quarterLength=2.0)])
+        ascore.append(apart)
+        MidiWriter.from_score(ascore, producer.instruments).write(fp=filename)
+        self.assertEqual(ProducerTest.read_midi_notes(filename)[1], [(48, 0, 720), (43, 960, 1920)])
+
+    def test_producers_from_npz(self):
+        print(f"\n****** test producers sample a loaded .npz chain without creating its DataFrames ==========================")
+        folder = tempfile.mkdtemp()
+        collector = CharacterCollector(state_size=2, text=ProducerTest.text)
+        markovChain = collector.collect()
+        filename = os.path.join(folder, 'chars_chain.npz')
+        markovChain.intern('').save(filename)
+        loaded = MarkovChain.from_interned(InternedChain.load(filename))
+        producer = WordProducer(2, loaded, None, min_size=4, max_size=10, num=10)
+        producer.initial = True
+        words = producer.produce_batch(100, rand_seed=42)
+        self.assertTrue(all([w[0] == 'A' for w in words]))
+        self.assertIsNone(loaded._counts_df)
+        self.assertIsNone(loaded._chain_df)
+        sampler = ChainSampler.from_markov_chain(markovChain)
+        self.assertEqual(list(producer.sampler.keys), sampler.keys)
+        self.assertEqual((list(producer.sampler.tokens), list(producer.sampler.probs)), (list(sampler.tokens), list(sampler.probs)))
+        
+        chains = []
+        for n, chain in enumerate(ProducerTest.make_music_chains()):
+            filename = os.path.join(folder, f'chain_{n}.npz')
+            InternedChain.from_dataframe(chain.chain_df, 2, key_separator=',').save(filename)
+            chains.append(MarkovChain.from_interned(InternedChain.load(filename)))
+        scores = []
+        for n in range(2):
+            if n == 1:      # the chain_df of the loaded chains
+                self.assertTrue(all([chain._chain_df is None for chain in chains]))
+                chains = [MarkovChain(2, None, chain_df=chain.chain_df) for chain in chains]
+            producer = ProducerTest.make_music_producer(chains, ['Flute', 'Bassoon'], 'C5,C3', num=20, rand_seed=42)
+            scores.append([(pitches.tolist(), durations.tolist()) for pitches, durations in producer.produce_events()])
+        self.assertEqual(scores[0], scores[1])
+
+    def test_sentence_producer_terminal(self):
+        print(f"\n****** test SentenceProducer ends a sentence only at a terminal word ==========================")
+        fd, source = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w') as f:
+            f.write("The quick brown fox jumps. Over the lazy dog! Is it not so?\nThe end of the story.\n" * 20)
+        collector = WordCollector(state_size=2, source=source)
+        collector.processing_mode = 'sentences'
+        collector.collect()
+        os.remove(source)
+        producer = SentenceProducer(2, collector.markovChain, None, min_size=3, max_size=12, num=5)
+        self.assertEqual([producer.is_terminal(t) for t in ['.', ' ?', '!', '', ' ', '.?', 'fox']], [True, True, True, False, False, False, False])
+        sentences = producer.produce_batch(20, rand_seed=42)
+        self.assertTrue(all([len(s.split()) >= 2 and s[0].isupper() for s in sentences]))
+
+if __name__ == "__main__":
+    unittest.main()